@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BbbConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bbb'
+
+    def ready(self):
+        from . import signals  # noqa: F401
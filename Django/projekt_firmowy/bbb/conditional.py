@@ -0,0 +1,50 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import CollectionVersion
+
+
+def collection_stamp(request, name):
+    """(version, updated_at) kolekcji - jedno zapytanie na request, wspólne dla ETag i Last-Modified."""
+    stamps = getattr(request, '_collection_stamps', None)
+    if stamps is None:
+        stamps = request._collection_stamps = {}
+    if name not in stamps:
+        stamps[name] = CollectionVersion.objects.filter(name=name).values_list('version', 'updated_at').first()
+    return stamps[name]
+
+
+def collection_condition(name):
+    """
+    ETag/Last-Modified dla akcji listującej kolekcję `name` (tasks, users, bills).
+
+    ETag = wersja kolekcji + skrót query stringa (strona, kursor, ordering, stream),
+    więc If-None-Match z aktualną wersją kończy się 304 bez zapytania o listę.
+    Cache-Control: private, no-cache - przeglądarka trzyma odpowiedź, ale zawsze ją rewaliduje.
+    """
+    def etag(request, *args, **kwargs):
+        stamp = collection_stamp(request, name)
+        if stamp is None:
+            return None
+        query = hashlib.sha1(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:12]
+        return f'{name}-{stamp[0]}-{query}'
+
+    def last_modified(request, *args, **kwargs):
+        stamp = collection_stamp(request, name)
+        return stamp[1] if stamp else None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapped
+
+    return method_decorator(decorator)
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+# --- EKSPORT CSV / NDJSON (/api/bills/export/, /api/tasks/export/) ---
+# Krotki wprost z kursora bazy (values_list().iterator() - bez obiektów modeli i serializerów),
+# zamieniane na tekst paczkami po EXPORT_CHUNK_ROWS i wysyłane od razu; przy Accept-Encoding: gzip
+# każda paczka przechodzi przez jeden strumień zlib. Pamięć nie zależy od liczby wierszy.
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+def export_format(request):
+    """?output=csv (domyślnie) albo ?output=ndjson."""
+    fmt = request.query_params.get('output', 'csv')
+    if fmt not in EXPORT_CONTENT_TYPES:
+        raise ValidationError({'output': f"Dozwolone: {', '.join(EXPORT_CONTENT_TYPES)}."})
+    return fmt
+
+
+def _json_value(value):
+    # Jak w API: kwoty jako tekst (DecimalField), daty ISO
+    if isinstance(value, (Decimal, date)):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _id_list(value):
+    return [int(pk) for pk in value.split(',')] if value else []
+
+
+def export_chunks(rows, columns, fmt, id_lists=()):
+    """Tekst CSV/NDJSON paczkami; kolumny z `id_lists` (group_concat id) w NDJSON to listy liczb."""
+    rows = iter(rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    encoder = json.JSONEncoder(ensure_ascii=False, default=_json_value)
+    lists = [columns.index(name) for name in id_lists]
+    while chunk := list(islice(rows, EXPORT_CHUNK_ROWS)):
+        if fmt == 'csv':
+            writer.writerows(chunk)
+        else:
+            for row in chunk:
+                item = dict(zip(columns, row))
+                for index in lists:
+                    item[columns[index]] = _id_list(row[index])
+                buffer.write(encoder.encode(item) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: nagłówek gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(request, rows, columns, fmt, name, id_lists=()):
+    """StreamingHttpResponse z eksportem (plik <name>.csv/.ndjson, gzip przy Accept-Encoding: gzip)."""
+    content = export_chunks(rows, columns, fmt, id_lists)
+    gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = StreamingHttpResponse(_gzip(content) if gzipped else content, content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    response['Vary'] = 'Accept-Encoding'
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    return response
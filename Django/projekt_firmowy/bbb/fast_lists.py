@@ -0,0 +1,53 @@
+import orjson
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer na orjson: te same bajty co JSONRenderer (zapis zwarty, UTF-8 bez escape'owania,
+    U+2028/U+2029 jako \\u2028/\\u2029) dla danych bez liczb zmiennoprzecinkowych - orjson zapisuje
+    wykładnik inaczej niż json (1e16 zamiast 1e+16). Wcięcia i dane, których orjson nie zakoduje
+    (np. niepoprawne surogaty), idą zwykłym JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (data is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastListMixin:
+    """
+    Szybka ścieżka listy (opt-in widoku): strona jako słowniki z values(*fast_list_fields) zamiast
+    obiektów modeli i serializera, kodowana FastJSONRenderer. Widok musi nadpisać fast_list_rows(rows),
+    które uzupełnia słowniki strony - relacje i kolejność kluczy jak w serializerze, więc odpowiedź jest
+    bajt w bajt ta sama (test parytetu w tests.py). ?fields= i renderery inne niż JSON (np. panel
+    DRF w przeglądarce) idą zwykłą ścieżką; FAST_LIST_RESPONSES = False wyłącza ją w całym projekcie.
+    """
+
+    fast_list_fields = ()
+
+    def use_fast_list(self, request):
+        return (getattr(settings, 'FAST_LIST_RESPONSES', True) and type(request.accepted_renderer) is JSONRenderer
+                and 'fields' not in request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*self.fast_list_fields)
+        request.accepted_renderer = FastJSONRenderer()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.fast_list_rows(list(queryset)))
+        return self.get_paginated_response(self.fast_list_rows(page))
+
+    def fast_list_rows(self, rows):
+        raise ImproperlyConfigured(f'{type(self).__name__} używa FastListMixin, ale nie definiuje fast_list_rows(rows).')
@@ -0,0 +1,125 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+def parse_fields(value):
+    """'id,title,assigned_to.first_name' -> {'id': {}, 'title': {}, 'assigned_to': {'first_name': {}}}."""
+    tree = {}
+    for path in filter(None, (part.strip() for part in value.split(','))):
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def restrict_serializer(serializer, tree, prefix=''):
+    """Zostawia w serializerze tylko pola z drzewa (puste poddrzewo = wszystkie pola zagnieżdżone)."""
+    fields = serializer.fields
+    readable = {name for name, field in fields.items() if not field.write_only}
+    unknown = sorted(prefix + name for name in set(tree) - readable)
+    if unknown:
+        raise ValidationError({'fields': f"Nieznane pola: {', '.join(unknown)}."})
+    for name in list(fields):
+        if name not in tree:
+            fields.pop(name)
+        elif tree[name]:
+            nested = getattr(fields[name], 'child', fields[name])
+            if not isinstance(nested, serializers.BaseSerializer):
+                raise ValidationError({'fields': f"Pole {prefix}{name} nie ma pól zagnieżdżonych."})
+            restrict_serializer(nested, tree[name], f'{prefix}{name}.')
+
+
+def prune_queryset(queryset, tree, keep=()):
+    """.only() z kolumnami z drzewa (+ klucz i `keep`) i prefetch tylko tych relacji M2M, o które proszono."""
+    model = queryset.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    columns = {name for name in tree if name in concrete} | {model._meta.pk.name} | (set(keep) & concrete)
+    lookups = []
+    for field in model._meta.many_to_many:
+        if field.name in tree:
+            related = field.related_model.objects.all()
+            if tree[field.name]:
+                related = prune_queryset(related, tree[field.name])
+            lookups.append(Prefetch(field.name, queryset=related))
+    return queryset.only(*columns).prefetch_related(None).prefetch_related(*lookups)
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets dla odczytu: ?fields=id,title,status,assigned_to.first_name
+
+    Odpowiedź zawiera tylko wskazane pola (kropka = pole zagnieżdżonego serializera,
+    samo `assigned_to` = wszystkie jego pola), a zapytanie pobiera tylko potrzebne
+    kolumny (.only()) i pomija prefetch relacji, o które klient nie prosił.
+    Kolumny z `keyset_orderings` zostają, bo paginacja buduje z nich kursor.
+    """
+
+    def sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            value = self.request.query_params.get('fields') if self.request.method == 'GET' else None
+            self._sparse_fields = parse_fields(value) if value else None
+            if self._sparse_fields is not None:
+                # Walidacja przed zapytaniem - nieznane pole to 400, a nie pusta praca bazy
+                restrict_serializer(self.get_serializer_class()(context=self.get_serializer_context()),
+                                    self._sparse_fields)
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        tree = self.sparse_fields()
+        if tree is not None:
+            restrict_serializer(getattr(serializer, 'child', serializer), tree)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tree = self.sparse_fields()
+        if tree is not None:
+            queryset = prune_queryset(queryset, tree, keep=getattr(self, 'keyset_orderings', ()))
+        return queryset
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """
+    Lista id -> obiekty jednym zapytaniem id__in (in_bulk) zamiast queryset.get() dla każdego id,
+    więc koszt walidacji nie rośnie z długością listy. Wszystkie brakujące id w jednym błędzie.
+    """
+    default_error_messages = {'does_not_exist_many': 'Nieistniejące obiekty: {pk_values}.'}
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pks = []
+        for item in data:
+            if child.pk_field is not None:
+                item = child.pk_field.to_internal_value(item)
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(queryset.model._meta.pk.to_python(item))
+            except (TypeError, DjangoValidationError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        found = queryset.in_bulk(pks) if pks else {}
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in found]
+        if missing:
+            self.fail('does_not_exist_many', pk_values=missing)
+        return [found[pk] for pk in pks]
+
+
+class BatchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, który przy many=True rozwiązuje całą listę jednym zapytaniem."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
@@ -0,0 +1,67 @@
+from datetime import date
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Task
+
+# Najwięcej id w jednym ?ids= / ?assigned_to= (lista trafia do SQL jako IN (...))
+MAX_FILTER_IDS = 500
+
+
+def _id_list(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    try:
+        ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ValidationError({name: "Wymagana lista liczb oddzielonych przecinkami."})
+    if len(ids) > MAX_FILTER_IDS:
+        raise ValidationError({name: f"Najwyżej {MAX_FILTER_IDS} id."})
+    return ids
+
+
+def _date(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: "Wymagana data RRRR-MM-DD."})
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """
+    Filtry listy zadań: ?status=done,in_process&assigned_to=3,4&due_after=&due_before=&ids=1,2
+
+    Każdy filtr ma indeks: status i due_date (migracja 0006), przypisania przez indeks
+    bbb_task_assigned_to.user_id (podzapytanie zamiast JOIN - bez duplikatów), ids przez klucz główny.
+    Daty są włącznie; zadania bez terminu odpadają przy filtrze po dacie.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        statuses = request.query_params.get('status')
+        if statuses is not None:
+            statuses = [s for s in statuses.split(',') if s]
+            unknown = sorted(set(statuses) - {value for value, _ in Task.STATUS_CHOICES})
+            if unknown:
+                raise ValidationError({'status': f"Nieznane statusy: {', '.join(unknown)}."})
+            queryset = queryset.filter(status__in=statuses)
+
+        user_ids = _id_list(request, 'assigned_to')
+        if user_ids is not None:
+            assigned = Task.assigned_to.through.objects.filter(user_id__in=user_ids).values('task_id')
+            queryset = queryset.filter(pk__in=assigned)
+
+        due_after, due_before = _date(request, 'due_after'), _date(request, 'due_before')
+        if due_after:
+            queryset = queryset.filter(due_date__gte=due_after)
+        if due_before:
+            queryset = queryset.filter(due_date__lte=due_before)
+
+        ids = _id_list(request, 'ids')
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        return queryset
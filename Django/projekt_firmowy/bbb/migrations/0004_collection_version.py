@@ -0,0 +1,58 @@
+# Generated by Django 4.2.20 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.utils import timezone
+
+COLLECTIONS = ['tasks', 'users', 'bills']
+
+
+def bump(*names):
+    names = ", ".join(f"'{name}'" for name in names)
+    return (f"UPDATE bbb_collectionversion SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE name IN ({names});")
+
+
+# Triggery SQLite podbijające wersje kolekcji. Lista zadań zawiera imiona i nazwiska
+# przypisanych osób, więc zmiana usera unieważnia też 'tasks'.
+TRIGGERS = [
+    (f"CREATE TRIGGER bbb_task_version_{event.lower()} AFTER {event} ON bbb_task BEGIN {bump('tasks')} END",
+     f"DROP TRIGGER IF EXISTS bbb_task_version_{event.lower()}")
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+] + [
+    (f"CREATE TRIGGER bbb_task_assigned_to_version_{event.lower()} AFTER {event} ON bbb_task_assigned_to "
+     f"BEGIN {bump('tasks')} END",
+     f"DROP TRIGGER IF EXISTS bbb_task_assigned_to_version_{event.lower()}")
+    for event in ('INSERT', 'DELETE')
+] + [
+    (f"CREATE TRIGGER auth_user_version_{event.split()[0].lower()} AFTER {event} ON auth_user "
+     f"BEGIN {bump('users', 'tasks')} END",
+     f"DROP TRIGGER IF EXISTS auth_user_version_{event.split()[0].lower()}")
+    # UPDATE tylko pól z UserSerializer - logowanie (last_login) nie unieważnia list
+    for event in ('INSERT', 'UPDATE OF username, first_name, last_name', 'DELETE')
+]
+
+
+def create_versions(apps, schema_editor):
+    CollectionVersion = apps.get_model('bbb', 'CollectionVersion')
+    now = timezone.now()
+    CollectionVersion.objects.bulk_create(CollectionVersion(name=name, updated_at=now) for name in COLLECTIONS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bbb', '0003_task_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ] + [migrations.RunSQL(sql, reverse_sql) for sql, reverse_sql in TRIGGERS]
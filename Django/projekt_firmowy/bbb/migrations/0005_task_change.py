@@ -0,0 +1,56 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+def touch_tasks(select_task_ids):
+    """Upsert nowej wersji dla zadań z podzapytania; deleted = zadanie już nie istnieje (tombstone)."""
+    return f"""
+    INSERT INTO bbb_taskchange (task_id, version, deleted)
+    SELECT changed.task_id, (SELECT COALESCE(MAX(version), 0) + 1 FROM bbb_taskchange),
+           NOT EXISTS (SELECT 1 FROM bbb_task WHERE bbb_task.id = changed.task_id)
+    FROM ({select_task_ids}) AS changed WHERE true
+    ON CONFLICT (task_id) DO UPDATE SET version = excluded.version, deleted = excluded.deleted;"""
+
+
+# Triggery SQLite utrzymujące dziennik zmian zadań (delta sync, /api/tasks/changes/).
+# Lista zadań zawiera przypisanych userów, więc zmiana usera oznacza zmianę jego zadań.
+TRIGGERS = [
+    ('bbb_task_change_insert', 'AFTER INSERT ON bbb_task', 'SELECT NEW.id AS task_id'),
+    ('bbb_task_change_update', 'AFTER UPDATE ON bbb_task', 'SELECT NEW.id AS task_id'),
+    ('bbb_task_change_delete', 'AFTER DELETE ON bbb_task', 'SELECT OLD.id AS task_id'),
+    ('bbb_task_assigned_to_change_insert', 'AFTER INSERT ON bbb_task_assigned_to', 'SELECT NEW.task_id AS task_id'),
+    ('bbb_task_assigned_to_change_delete', 'AFTER DELETE ON bbb_task_assigned_to', 'SELECT OLD.task_id AS task_id'),
+    ('auth_user_task_change_update', 'AFTER UPDATE OF username, first_name, last_name ON auth_user',
+     'SELECT task_id FROM bbb_task_assigned_to WHERE user_id = NEW.id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bbb', '0004_collection_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskChange',
+            fields=[
+                ('task_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['version', 'task_id'], name='task_change_version_idx')],
+            },
+        ),
+        # Istniejące zadania: wersja = id, więc pierwsza synchronizacja (bez since) zwraca wszystkie
+        migrations.RunSQL(
+            "INSERT INTO bbb_taskchange (task_id, version, deleted) SELECT id, id, 0 FROM bbb_task",
+            migrations.RunSQL.noop,
+        ),
+    ] + [
+        migrations.RunSQL(f"CREATE TRIGGER {name} {event} BEGIN {touch_tasks(select)} END",
+                          f"DROP TRIGGER IF EXISTS {name}")
+        for name, event, select in TRIGGERS
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+def fts_operations(table, columns, weights):
+    """Indeks FTS5 (external content) dla tabeli: tabela wirtualna, triggery synchronizujące i wypełnienie."""
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new = ', '.join(f'NEW.{c}' for c in columns)
+    old = ', '.join(f'OLD.{c}' for c in columns)
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.id, {old});"
+    insert_new = f"INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.id, {new});"
+    return [
+        # prefix: indeksy prefiksów 2-4 znaków - zapytania "fakt*" bez przeglądania całego słownika
+        migrations.RunSQL(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')",
+            f"DROP TABLE IF EXISTS {fts}",
+        ),
+        migrations.RunSQL(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25({weights})')", migrations.RunSQL.noop),
+        migrations.RunSQL(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')", migrations.RunSQL.noop),
+        migrations.RunSQL(f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+                          f"DROP TRIGGER IF EXISTS {fts}_insert"),
+        migrations.RunSQL(f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+                          f"DROP TRIGGER IF EXISTS {fts}_delete"),
+        migrations.RunSQL(f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {cols} ON {table} "
+                          f"BEGIN {delete_old} {insert_new} END",
+                          f"DROP TRIGGER IF EXISTS {fts}_update"),
+    ]
+
+
+class Migration(migrations.Migration):
+    # Wyszukiwanie pełnotekstowe (/api/search/, bbb/search.py); tytuł/termin waży 10x więcej niż treść
+
+    dependencies = [
+        ('bbb', '0006_task_filter_indexes'),
+    ]
+
+    operations = [
+        *fts_operations('bbb_task', ('title', 'description'), '10.0, 1.0'),
+        *fts_operations('bbb_businessdefinition', ('term', 'definition'), '10.0, 1.0'),
+    ]
@@ -32,5 +32,36 @@ class Task(models.Model):
     due_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='not_started')
 
+    class Meta:
+        # Filtry listy zadań (bbb/filters.py); przypisania mają indeksy tabeli M2M
+        indexes = [
+            models.Index(fields=['status'], name='task_status_idx'),
+            models.Index(fields=['due_date'], name='task_due_date_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class CollectionVersion(models.Model):
+    # Licznik zmian kolekcji API ('tasks', 'users', 'bills') - źródło ETag/Last-Modified.
+    # Podbijany przez triggery SQLite (migracje bbb 0004, rachunki 0004), więc obejmuje też
+    # panel admina, bulk_create i QuerySet.update().
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class TaskChange(models.Model):
+    # Dziennik zmian zadań dla delta sync (/api/tasks/changes/): ostatnia wersja każdego zadania
+    # i tombstone (deleted) po usunięciu. Bez FK - wpis przeżywa usunięte zadanie.
+    # Utrzymywany przez triggery SQLite (migracja 0005).
+    task_id = models.BigIntegerField(primary_key=True)
+    version = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['version', 'task_id'], name='task_change_version_idx')]
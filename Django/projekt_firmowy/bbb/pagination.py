@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import date
+
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def encode_cursor(ordering, values):
+    raw = json.dumps({"o": ordering, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["o"] != ordering:
+            raise ValueError
+        return data["v"]
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError({"cursor": "Nieprawidłowy kursor."})
+
+
+def decode_changes_token(since):
+    """(wersja, task_id) z tokenu delta sync ?since=; bez tokenu - od początku dziennika."""
+    if not since:
+        return 0, 0
+    values = decode_cursor(since, "changes")
+    if not (isinstance(values, list) and len(values) == 2 and all(type(value) is int for value in values)):
+        raise ValidationError({"since": "Nieprawidłowy token."})
+    return values
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginacja kursorem (keyset) po (id) albo (due_date, id).
+
+    Kolejna strona to WHERE (due_date, id) > (ostatni wiersz) zamiast OFFSET,
+    więc koszt zapytania nie rośnie z numerem strony. Zadania bez terminu są na końcu.
+    Odpowiedź: {"next_cursor": "<token>|null", "results": [...]}.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    orderings = ("id",)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.page_size))
+        except ValueError:
+            raise ValidationError({"limit": "Wymagana liczba całkowita."})
+        return max(1, min(limit, self.max_page_size))
+
+    def get_ordering(self, request, view):
+        orderings = getattr(view, "keyset_orderings", self.orderings)
+        ordering = request.query_params.get("ordering", orderings[0])
+        if ordering not in orderings:
+            raise ValidationError({"ordering": f"Dozwolone: {', '.join(orderings)}."})
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(request, view)
+        limit = self.get_limit(request)
+        cursor = request.query_params.get("cursor")
+
+        if ordering == "due_date":
+            queryset = queryset.order_by(F("due_date").asc(nulls_last=True), "id")
+        else:
+            queryset = queryset.order_by("id")
+        if cursor:
+            values = decode_cursor(cursor, ordering)
+            try:
+                queryset = queryset.filter(self.after(ordering, values))
+            except (ValueError, TypeError):
+                # Kursor da się zdekodować, ale wartości nie pasują (podrobiony albo z innej wersji API)
+                raise ValidationError({"cursor": "Nieprawidłowy kursor."})
+
+        rows = list(queryset[:limit + 1])
+        last = rows[limit - 1] if len(rows) > limit else None
+        self.next_cursor = encode_cursor(ordering, self.position(ordering, last)) if last else None
+        return rows[:limit]
+
+    def after(self, ordering, values):
+        if ordering == "due_date":
+            due_date, last_id = values
+            if due_date is None:
+                return Q(due_date__isnull=True, id__gt=last_id)
+            due_date = date.fromisoformat(due_date)
+            return Q(due_date__gt=due_date) | Q(due_date=due_date, id__gt=last_id) | Q(due_date__isnull=True)
+        (last_id,) = values
+        return Q(id__gt=last_id)
+
+    def position(self, ordering, obj):
+        # obj: instancja modelu albo słownik z values() (FastListMixin)
+        row = obj if isinstance(obj, dict) else obj.__dict__
+        if ordering == "due_date":
+            return [row["due_date"].isoformat() if row["due_date"] else None, row["id"]]
+        return [row["id"]]
+
+    def get_paginated_response(self, data):
+        return Response({"next_cursor": self.next_cursor, "results": data})
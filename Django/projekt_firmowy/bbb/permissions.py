@@ -0,0 +1,16 @@
+MANAGER_GROUP = 'Managerowie'
+
+
+def is_manager(user):
+    """
+    Czy użytkownik należy do grupy 'Managerowie'.
+    Dla requestów API (TokenUser) decyduje claim `groups` z tokena JWT - bez zapytania.
+    Dla zwykłego usera (sesja, panel) wynik jest zapamiętywany na obiekcie,
+    więc w jednym requeście grupy sprawdzamy najwyżej jednym zapytaniem.
+    """
+    token = getattr(user, 'token', None)
+    if token is not None:
+        return MANAGER_GROUP in token.get('groups', ())
+    if not hasattr(user, '_is_manager'):
+        user._is_manager = user.is_authenticated and user.groups.filter(name=MANAGER_GROUP).exists()
+    return user._is_manager
@@ -0,0 +1,81 @@
+import html
+import re
+
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+# --- WYSZUKIWANIE PEŁNOTEKSTOWE (FTS5, migracja 0007) ---
+# (typ wyniku, tabela FTS5); kolumna 0 to tytuł/termin, kolumna 1 to treść
+SEARCH_SOURCES = [
+    ('task', 'bbb_task_fts'),
+    ('definition', 'bbb_businessdefinition_fts'),
+]
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_TERMS = 8
+# bm25 potrzebuje statystyk każdego trafienia - dla słowa z każdego dokumentu to setki ms.
+# Ranking obejmuje więc tylko SEARCH_CANDIDATES najnowszych (najwyższe id) trafień z tabeli;
+# gdy któraś tabela ma ich więcej, odpowiedź ma truncated = true (starsze trafienia pominięte).
+SEARCH_CANDIDATES = 2000
+# Znaczniki trafień w snippetach; podmieniane na <mark> dopiero po escape'owaniu HTML
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+
+
+def match_expression(query):
+    """'fakt klie' -> '"fakt"* "klie"*' - każde słowo jako prefiks, wszystkie wymagane."""
+    terms = re.findall(r'\w+', query or '')[:MAX_QUERY_TERMS]
+    if not terms:
+        raise ValidationError({'q': "Podaj co najmniej jedno słowo."})
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def highlight(text):
+    return html.escape(text or '').replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def _first_skipped(fts):
+    # Najnowsze trafienie spoza SEARCH_CANDIDATES (NULL, gdy ranking obejmuje wszystkie)
+    return f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s ORDER BY rowid DESC LIMIT 1 OFFSET %s"
+
+
+def _source_sql(fts):
+    return f"""
+    SELECT * FROM (
+        SELECT %s AS type, rowid AS id,
+               highlight({fts}, 0, char(2), char(3)) AS title,
+               snippet({fts}, 1, char(2), char(3), '…', 16) AS snippet,
+               rank AS score
+        FROM {fts}
+        WHERE {fts} MATCH %s AND rowid > COALESCE(({_first_skipped(fts)}), 0)
+        ORDER BY rank LIMIT %s)"""
+
+
+def search(query, limit=SEARCH_LIMIT):
+    """
+    Wyniki z zadań i słownika w jednym zapytaniu, od najlepszego dopasowania (bm25),
+    oraz flaga truncated - czy ranking pominął starsze trafienia spoza SEARCH_CANDIDATES.
+    """
+    expression = match_expression(query)
+    sql = (
+        'SELECT hits.*, (' + ' OR '.join(f'({_first_skipped(fts)}) IS NOT NULL' for _, fts in SEARCH_SOURCES)
+        + ') AS truncated FROM (' + ' UNION ALL '.join(_source_sql(fts) for _, fts in SEARCH_SOURCES)
+        + ') AS hits ORDER BY score LIMIT %s'
+    )
+    params = [p for _ in SEARCH_SOURCES for p in (expression, SEARCH_CANDIDATES)]
+    params += [p for kind, _ in SEARCH_SOURCES for p in (kind, expression, expression, SEARCH_CANDIDATES, limit)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        rows = cursor.fetchall()
+    results = [
+        {'type': kind, 'id': pk, 'title': highlight(title), 'snippet': highlight(snippet), 'score': round(score, 4)}
+        for kind, pk, title, snippet, score, _ in rows
+    ]
+    return results, bool(rows and rows[0][-1])
+
+
+def search_limit(request):
+    try:
+        limit = int(request.query_params.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        raise ValidationError({'limit': "Wymagana liczba całkowita."})
+    return max(1, min(limit, MAX_SEARCH_LIMIT))
@@ -1,5 +1,11 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
 from rest_framework import serializers
+from .fields import BatchedPrimaryKeyRelatedField
 from .models import Task
+from .permissions import is_manager
 from django.contrib.auth.models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -7,25 +13,118 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ["id", "username", "first_name", "last_name"]
 
-class TaskSerializer(serializers.ModelSerializer):
+class ManagerAssignmentMixin:
+    """Przypisywać użytkowników (assigned_to_ids) może tylko Manager - TaskSerializer i zmiana zbiorcza."""
+
+    def validate_assigned_to_ids(self, value):
+        if value and not is_manager(self.context['request'].user):
+            raise serializers.ValidationError(
+                "Brak uprawnień. Tylko członkowie grupy 'Managerowie' mogą przydzielać zadania."
+            )
+        return value
+
+
+class TaskSerializer(ManagerAssignmentMixin, serializers.ModelSerializer):
     assigned_to = UserSerializer(many=True, read_only=True)
-    assigned_to_ids = serializers.PrimaryKeyRelatedField(
-        many=True, write_only=True, queryset=User.objects.all(), source="assigned_to", required=False
+    assigned_to_ids = BatchedPrimaryKeyRelatedField(
+        many=True, write_only=True, queryset=User.objects.all(), source="assigned_to", required=False,
+        error_messages={'does_not_exist_many': 'Nieistniejący użytkownicy: {pk_values}.'},
     )
 
     class Meta:
         model = Task
         fields = ["id", "title", "description", "due_date", "assigned_to", "assigned_to_ids", "status"]
 
-    def validate_assigned_to_ids(self, value):
-        user = self.context['request'].user
-        
-        # ZMIANA: Tutaj też wpisujemy 'Managerowie'
-        is_manager = user.groups.filter(name='Managerowie').exists()
 
-        if value and not is_manager:
-            raise serializers.ValidationError(
-                "Brak uprawnień. Tylko członkowie grupy 'Managerowie' mogą przydzielać zadania."
-            )
-            
-        return value
\ No newline at end of file
+# --- ZBIORCZA ZMIANA ZADAŃ (POST /api/tasks/bulk/) ---
+
+class TaskBulkListSerializer(serializers.ListSerializer):
+    """
+    Lista zmian zadań zapisywana w jednej transakcji i stałej liczbie zapytań, niezależnie
+    od liczby pozycji: pola jednym UPDATE ... SET pole = CASE id WHEN ... END, przypisania
+    jako różnica z aktualną zawartością bbb_task_assigned_to (jeden DELETE, jeden INSERT).
+    Jeśli którakolwiek pozycja jest błędna, nic nie jest zapisywane.
+    """
+    max_items = 500
+    fields_to_update = ('title', 'description', 'due_date', 'status')
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', self.max_items)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        # Błędy per pozycja (lista równoległa do żądania), jak przy walidacji pól w ListSerializer
+        items = super().to_internal_value(data)
+        ids = [item['id'] for item in items]
+        user_ids = {pk for item in items for pk in item.get('assigned_to_ids', ())}
+        existing = set(Task.objects.filter(id__in=ids).values_list('id', flat=True))
+        existing_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True)) if user_ids else set()
+        duplicated = {pk for pk, count in Counter(ids).items() if count > 1}
+
+        errors = []
+        for item in items:
+            error = {}
+            if item['id'] not in existing:
+                error['id'] = ["Zadanie nie istnieje."]
+            elif item['id'] in duplicated:
+                error['id'] = ["Zadanie występuje w żądaniu więcej niż raz."]
+            missing = sorted(set(item.get('assigned_to_ids', ())) - existing_users)
+            if missing:
+                error['assigned_to_ids'] = [f"Nieistniejący użytkownicy: {missing}."]
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def save(self, **kwargs):
+        items = self.validated_data
+        with transaction.atomic():
+            updates = {}
+            for field_name in self.fields_to_update:
+                values = {item['id']: item[field_name] for item in items if field_name in item}
+                if values:
+                    output_field = Task._meta.get_field(field_name)
+                    updates[field_name] = Case(
+                        *(When(pk=pk, then=Value(value, output_field=output_field)) for pk, value in values.items()),
+                        default=F(field_name), output_field=output_field,
+                    )
+            changed_ids = [item['id'] for item in items if any(f in item for f in self.fields_to_update)]
+            if updates:
+                Task.objects.filter(id__in=changed_ids).update(**updates)
+            self._apply_assignments({item['id']: set(item['assigned_to_ids']) for item in items
+                                     if 'assigned_to_ids' in item})
+        return {
+            "updated": len(items),
+            "results": [{"id": item['id'], "fields": sorted(k for k in item if k != 'id')} for item in items],
+        }
+
+    def _apply_assignments(self, wanted):
+        if not wanted:
+            return
+        through = Task.assigned_to.through
+        # Aktualne przypisania z id wierszy tabeli pośredniej: usuwane wiersze to jedno płaskie
+        # id IN (...) - OR par (task_id, user_id) przy 500 pozycjach przekracza głębokość wyrażenia SQLite
+        current = {}
+        for row_id, task_id, user_id in (through.objects.filter(task_id__in=wanted)
+                                         .values_list('id', 'task_id', 'user_id')):
+            current.setdefault(task_id, {})[user_id] = row_id
+        removed = [row_id for task_id, users in current.items()
+                   for user_id, row_id in users.items() if user_id not in wanted[task_id]]
+        added = [through(task_id=task_id, user_id=user_id)
+                 for task_id, users in wanted.items() for user_id in users - current.get(task_id, {}).keys()]
+        if removed:
+            through.objects.filter(id__in=removed).delete()
+        if added:
+            through.objects.bulk_create(added)
+
+
+class TaskBulkItemSerializer(ManagerAssignmentMixin, serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(required=False)
+    due_date = serializers.DateField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    assigned_to_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        list_serializer_class = TaskBulkListSerializer
@@ -0,0 +1,51 @@
+from functools import partial
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .tokens import ALL_USERS, mark_roles_changed
+
+
+# --- UNIEWAŻNIANIE CLAIMÓW RÓL W TOKENACH (bbb/tokens.py) ---
+# Znacznik zapisujemy dopiero po commicie (jak after_commit we FastAPI i Flask): logowanie między
+# sygnałem a commitem czyta jeszcze stare grupy, więc jego token musi być starszy niż znacznik.
+# Po rollbacku nic się nie zmieniło i tokeny zostają ważne.
+
+def revoke_on_commit(user_id=ALL_USERS):
+    transaction.on_commit(partial(mark_roles_changed, user_id))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        revoke_on_commit(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...) - zmieniają się grupy wskazanych userów
+        for user_id in pk_set:
+            revoke_on_commit(user_id)
+    else:
+        # group.user_set.clear() - nie wiemy których userów to dotyczyło
+        revoke_on_commit()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if not created and not instance.is_active:
+        revoke_on_commit(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    revoke_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    # Zmiana nazwy lub usunięcie grupy zmienia claimy wszystkich jej członków
+    if not created:
+        revoke_on_commit()
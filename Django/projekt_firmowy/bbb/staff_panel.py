@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Task
+
+# --- PANEL /staff/tasks/ ---
+# Strona userów po id (?after=<id ostatniego usera>), liczniki zadań jednym zapytaniem z agregacją,
+# a lista zadań każdej karty jako fragment HTML w cache. Klucz fragmentu zawiera wersję karty,
+# więc zmiana zadań lub przypisań usera od razu daje nowy klucz (stary wpis wygasa sam).
+STAFF_PAGE_SIZE = 50
+CARD_TASKS = 10
+CARD_CACHE_TIMEOUT = 60 * 60
+
+# Liczniki i wersja karty jako podzapytania skorelowane: liczone tylko dla userów ze strony (LIMIT),
+# a nie GROUP BY po złączeniu wszystkich userów z ich zadaniami. Status w FILTER, a nie w WHERE -
+# inaczej planer SQLite wybiera indeks statusu i dla każdego usera przegląda wszystkie zadania "done".
+# card_version to najnowsza wersja z dziennika zmian (bbb_taskchange, triggery z migracji 0005) wśród
+# zadań usera - rośnie przy każdej zmianie zadania, przypisania i danych usera, także z admina.
+CARD_COLUMNS = {
+    'task_count': """
+        SELECT COUNT(*) FROM bbb_task_assigned_to assignment WHERE assignment.user_id = auth_user.id""",
+    'done_count': """
+        SELECT COUNT(*) FILTER (WHERE task.status = 'done') FROM bbb_task_assigned_to assignment
+        JOIN bbb_task task ON task.id = assignment.task_id
+        WHERE assignment.user_id = auth_user.id""",
+    'card_version': """
+        SELECT MAX(change.version) FROM bbb_task_assigned_to assignment
+        JOIN bbb_taskchange change ON change.task_id = assignment.task_id
+        WHERE assignment.user_id = auth_user.id""",
+}
+
+
+def staff_page(after=0):
+    """(userzy strony z licznikami i wersją karty, id ostatniego usera albo None) - jedno zapytanie."""
+    users = list(
+        User.objects.filter(pk__gt=after).order_by('pk')
+        .only('id', 'username', 'first_name', 'last_name')
+        .annotate(**{name: RawSQL(sql, ()) for name, sql in CARD_COLUMNS.items()})
+        [:STAFF_PAGE_SIZE + 1]
+    )
+    has_more = len(users) > STAFF_PAGE_SIZE
+    users = users[:STAFF_PAGE_SIZE]
+    return users, users[-1].pk if has_more else None
+
+
+def card_key(user):
+    return f'staff-card:{user.pk}:{user.task_count}:{user.card_version or 0}'
+
+
+def _card_tasks(user_ids):
+    """Najbliższe terminem CARD_TASKS zadań każdego usera - jedno zapytanie (ROW_NUMBER per user)."""
+    assignments = (
+        Task.assigned_to.through.objects.filter(user_id__in=user_ids)
+        .annotate(position=Window(RowNumber(), partition_by=F('user_id'),
+                                  order_by=[F('task__due_date').asc(nulls_last=True), F('task_id').asc()]))
+        .filter(position__lte=CARD_TASKS)
+        .select_related('task').only('user_id', 'task__title', 'task__due_date')
+        .order_by('user_id', 'position')
+    )
+    tasks = {}
+    for assignment in assignments:
+        tasks.setdefault(assignment.user_id, []).append(assignment.task)
+    return tasks
+
+
+def attach_cards(users):
+    """Ustawia user.card (HTML listy zadań); zadania czyta z bazy tylko dla kart spoza cache."""
+    cards = cache.get_many([card_key(user) for user in users])
+    missing = [user for user in users if card_key(user) not in cards and user.task_count]
+    tasks = _card_tasks([user.pk for user in missing]) if missing else {}
+    fresh = {}
+    for user in users:
+        key = card_key(user)
+        if key not in cards:
+            user_tasks = tasks.get(user.pk, [])
+            cards[key] = fresh[key] = render_to_string('users_tasks_card.html', {
+                'tasks': user_tasks, 'more': user.task_count - len(user_tasks),
+            })
+        user.card = mark_safe(cards[key])
+    cache.set_many(fresh, CARD_CACHE_TIMEOUT)
+    return users
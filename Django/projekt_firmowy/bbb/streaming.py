@@ -0,0 +1,55 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+class StreamingListMixin:
+    """
+    Opcjonalny tryb strumieniowy dla list: ?stream=ndjson albo ?stream=json.
+
+    Wiersze są pobierane z bazy paczkami po `stream_batch_size` (WHERE id > ostatnie id)
+    i wysyłane od razu po serializacji, więc pamięć nie rośnie z rozmiarem tabeli.
+    Bez parametru `stream` lista działa jak dotąd (paginacja).
+    """
+
+    stream_batch_size = 500
+
+    def list(self, request, *args, **kwargs):
+        fmt = request.query_params.get("stream")
+        if fmt is None:
+            return super().list(request, *args, **kwargs)
+        if fmt not in STREAM_CONTENT_TYPES:
+            raise ValidationError({"stream": f"Dozwolone: {', '.join(STREAM_CONTENT_TYPES)}."})
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_rows(queryset, fmt), content_type=STREAM_CONTENT_TYPES[fmt])
+
+    def iter_batches(self, queryset):
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by("id")[:self.stream_batch_size])
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].id
+
+    def stream_rows(self, queryset, fmt):
+        encoder = JSONEncoder(ensure_ascii=False)
+        first = True
+        if fmt == "json":
+            yield "["
+        for batch in self.iter_batches(queryset):
+            items = [encoder.encode(item) for item in self.get_serializer(batch, many=True).data]
+            if fmt == "ndjson":
+                yield "".join(item + "\n" for item in items)
+            else:
+                yield ("" if first else ",") + ",".join(items)
+            first = False
+        if fmt == "json":
+            yield "]"
@@ -1,3 +1,777 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from projekt_firmowy.query_budget import budget_for
+from . import export, staff_panel
+from .fast_lists import FastJSONRenderer, FastListMixin
+from .models import BusinessDefinition, Task, TaskChange
+from .pagination import KeysetPagination, encode_cursor
+from .tokens import RoleClaimsTokenObtainPairSerializer
+from .serializers import TaskBulkListSerializer
+from .streaming import STREAM_CONTENT_TYPES
+from .views import TaskViewSet
+
+BUDGETS = TaskViewSet.query_budgets
+
+
+def iter_views(patterns=None):
+    """Wszystkie widoki z URLconf razem z ich klasą/funkcją (do sprawdzania limitów zapytań)."""
+    for entry in patterns if patterns is not None else get_resolver().url_patterns:
+        if isinstance(entry, URLResolver):
+            yield from iter_views(entry.url_patterns)
+        elif isinstance(entry, URLPattern):
+            callback = entry.callback
+            yield callback, getattr(callback, 'cls', None) or callback
+
+
+class ApiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        managers = Group.objects.create(name='Managerowie')
+        cls.manager = User.objects.create_user('admin', password='adminpassword')
+        cls.manager.groups.add(managers)
+        cls.employee = User.objects.create_user('adam', password='password')
+        cls.workers = [User.objects.create_user(f'worker{i}') for i in range(5)]
+        cls.tasks = []
+        for i in range(20):
+            task = Task.objects.create(title=f'Zadanie {i}', description='Opis')
+            task.assigned_to.set(cls.workers[:3])
+            cls.tasks.append(task)
+
+    def token_for(self, user):
+        return RoleClaimsTokenObtainPairSerializer.get_token(user)
+
+    def client_for(self, user, token=None):
+        client = APIClient()
+        access = token or self.token_for(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(ApiTestCase):
+    """Każdy endpoint bbb mieści się w zadeklarowanym limicie zapytań (inaczej middleware rzuca wyjątek)."""
+
+    def assertWithinBudget(self, response, budget):
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertLessEqual(int(response['X-Query-Count']), budget)
+
+    def test_task_list(self):
+        response = self.client_for(self.manager).get('/api/tasks/')
+        self.assertWithinBudget(response, BUDGETS['list'])
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_task_retrieve(self):
+        response = self.client_for(self.employee).get(f'/api/tasks/{self.tasks[0].id}/')
+        self.assertWithinBudget(response, BUDGETS['retrieve'])
+
+    def test_task_create_with_assignees(self):
+        payload = {
+            'title': 'Nowe', 'description': 'Opis',
+            'assigned_to_ids': [u.id for u in self.workers[:2]],
+        }
+        response = self.client_for(self.manager).post('/api/tasks/', payload, format='json')
+        self.assertWithinBudget(response, BUDGETS['create'])
+        self.assertEqual(len(response.json()['assigned_to']), 2)
+
+    def test_task_partial_update_status(self):
+        response = self.client_for(self.employee).patch(
+            f'/api/tasks/{self.tasks[0].id}/', {'status': 'done'}, format='json'
+        )
+        self.assertWithinBudget(response, BUDGETS['partial_update'])
+
+    def test_task_partial_update_assignees(self):
+        response = self.client_for(self.manager).patch(
+            f'/api/tasks/{self.tasks[0].id}/', {'assigned_to_ids': [self.workers[4].id]}, format='json'
+        )
+        self.assertWithinBudget(response, BUDGETS['partial_update'])
+
+    def test_task_destroy(self):
+        response = self.client_for(self.manager).delete(f'/api/tasks/{self.tasks[0].id}/')
+        self.assertWithinBudget(response, BUDGETS['destroy'])
+
+    def test_user_list(self):
+        response = self.client_for(self.employee).get('/api/users/')
+        self.assertWithinBudget(response, 2)
+
+    def test_me(self):
+        response = self.client_for(self.manager).get('/api/me/')
+        self.assertWithinBudget(response, 0)
+        self.assertTrue(response.json()['is_admin'])
+
+    def test_staff_panel(self):
+        response = self.client.get('/staff/tasks/')
+        self.assertWithinBudget(response, 2)
+
+    def test_every_endpoint_declares_budget(self):
+        for callback, view in iter_views():
+            if not view.__module__.startswith(('bbb.', 'rachunki.')):
+                continue
+            actions = getattr(callback, 'actions', None) or {'get': 'get'}
+            for method in actions:
+                with self.subTest(view=view.__name__, method=method):
+                    self.assertIsNotNone(budget_for(callback, method))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class AssigneeResolutionTests(ApiTestCase):
+    """assigned_to_ids: cała lista jednym zapytaniem, więc liczba zapytań nie zależy od liczby przypisanych."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.team = [User.objects.create_user(f'team{i}') for i in range(60)]
+
+    def setUp(self):
+        self.client = self.client_for(self.manager)
+
+    def create(self, assigned_to_ids):
+        return self.client.post('/api/tasks/', {'title': 'Nowe', 'description': 'Opis',
+                                                'assigned_to_ids': assigned_to_ids}, format='json')
+
+    def test_query_count_is_flat(self):
+        small, large = self.create([self.team[0].pk]), self.create([u.pk for u in self.team])
+        self.assertEqual((small.status_code, large.status_code), (201, 201))
+        self.assertEqual(small['X-Query-Count'], large['X-Query-Count'])
+        self.assertEqual(len(large.json()['assigned_to']), 60)
+        task_id = large.json()['id']
+        counts = set()
+        # Każdy PUT usuwa i dodaje przypisania (jeden DELETE i jeden INSERT) - różni się tylko liczbą id
+        for ids in ([self.workers[0].pk], [u.pk for u in self.team[10:]]):
+            response = self.client.put(f'/api/tasks/{task_id}/', {'title': 'Nowe', 'description': 'Opis',
+                                                                  'assigned_to_ids': ids}, format='json')
+            self.assertEqual(response.status_code, 200)
+            counts.add(response['X-Query-Count'])
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(set(Task.objects.get(pk=task_id).assigned_to.values_list('pk', flat=True)),
+                         {u.pk for u in self.team[10:]})
+
+    def test_missing_ids_in_one_error(self):
+        response = self.create([self.team[0].pk, 999999, 999998, 999999])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'assigned_to_ids': ['Nieistniejący użytkownicy: [999999, 999998].']})
+        self.assertFalse(Task.objects.filter(title='Nowe').exists())
+
+    def test_invalid_values(self):
+        for value in (['abc'], [True], [{'id': 1}], 5):
+            with self.subTest(value=value):
+                self.assertEqual(self.create(value).status_code, 400)
+        self.assertEqual(self.create(['%d' % self.team[0].pk]).json()['assigned_to'][0]['id'], self.team[0].pk)
+
+
+class RoleClaimsTests(ApiTestCase):
+    """Grupy w tokenie JWT: uprawnienia bez zapytań i unieważnianie po zmianie ról."""
+
+    def test_login_embeds_groups(self):
+        response = self.client.post('/api/token/', {'username': 'admin', 'password': 'adminpassword'})
+        access = RefreshToken(response.json()['refresh']).access_token
+        self.assertEqual(access['groups'], ['Managerowie'])
+        self.assertEqual(access['username'], 'admin')
+
+    def test_employee_cannot_assign(self):
+        response = self.client_for(self.employee).post(
+            '/api/tasks/', {'title': 'X', 'description': 'Y', 'assigned_to_ids': [self.workers[0].id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_group_removal_revokes_token(self):
+        client = self.client_for(self.manager)
+        self.assertEqual(client.get('/api/me/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.groups.clear()
+        self.assertEqual(client.get('/api/me/').status_code, 401)
+
+    def test_token_issued_before_commit_is_revoked(self):
+        # Logowanie między sygnałem a commitem dostaje późniejszy roles_at - znacznik zapisuje dopiero commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.groups.clear()
+            client = self.client_for(self.manager)
+        self.assertEqual(client.get('/api/me/').status_code, 401)
+
+    def test_rolled_back_change_keeps_token(self):
+        client = self.client_for(self.manager)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                self.manager.groups.clear()
+                raise DatabaseError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(client.get('/api/me/').status_code, 200)
+
+    def test_group_add_from_group_side_revokes_token(self):
+        client = self.client_for(self.employee)
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.get(name='Managerowie').user_set.add(self.employee)
+        self.assertEqual(client.get('/api/me/').status_code, 401)
+        self.assertEqual(self.client_for(self.manager).get('/api/me/').status_code, 200)
+
+    def test_refresh_reissues_current_groups(self):
+        refresh = self.token_for(self.manager)
+        self.manager.groups.clear()
+        response = self.client.post('/api/token/refresh/', {'refresh': str(refresh)})
+        client = self.client_for(self.manager, token=response.json()['access'])
+        response = client.get('/api/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['is_admin'])
+
+    def test_deactivated_user_is_revoked(self):
+        client = self.client_for(self.employee)
+        self.employee.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employee.save()
+        self.assertEqual(client.get('/api/tasks/').status_code, 401)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ConditionalGetTests(ApiTestCase):
+    """ETag kolekcji: 304 bez zapytania o listę, nowy ETag po każdej zmianie widocznej w liście."""
+
+    def setUp(self):
+        self.client = self.client_for(self.employee)
+
+    def etag(self, path='/api/tasks/'):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        return response['ETag']
+
+    def test_not_modified(self):
+        etag = self.etag()
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(int(response['X-Query-Count']), 1)
+
+    def test_query_string_is_part_of_etag(self):
+        self.assertNotEqual(self.etag('/api/tasks/'), self.etag('/api/tasks/?ordering=due_date'))
+
+    def test_task_write_changes_etag(self):
+        etag = self.etag()
+        self.client.patch(f'/api/tasks/{self.tasks[0].id}/', {'status': 'done'}, format='json')
+        self.assertEqual(self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_assignment_and_user_changes_change_task_etag(self):
+        etag = self.etag()
+        self.tasks[0].assigned_to.add(self.workers[4])
+        self.assertNotEqual(self.etag(), etag)
+        etag = self.etag()
+        User.objects.filter(pk=self.workers[0].pk).update(first_name='Nowe')
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_user_collection(self):
+        etag = self.etag('/api/users/')
+        self.assertEqual(self.client.get('/api/users/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        User.objects.create_user('nowy')
+        self.assertEqual(self.client.get('/api/users/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class TaskChangesTests(ApiTestCase):
+    """Delta sync: /api/tasks/changes/ zwraca tylko zmiany od tokenu, z tombstone'ami usuniętych."""
+
+    def setUp(self):
+        self.client = self.client_for(self.manager)
+
+    def sync(self, token=None, **params):
+        if token:
+            params['since'] = token
+        response = self.client.get('/api/tasks/changes/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertLessEqual(int(response['X-Query-Count']), BUDGETS['changes'])
+        return response.json()
+
+    def test_full_sync_pages_through_all_tasks(self):
+        first = self.sync(limit=15)
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['next_token'], limit=15)
+        self.assertFalse(second['has_more'])
+        ids = [t['id'] for t in first['upserted'] + second['upserted']]
+        self.assertEqual(sorted(ids), sorted(t.id for t in self.tasks))
+
+    def test_only_changes_since_token(self):
+        token = self.sync()['next_token']
+        self.assertEqual(self.sync(token)['upserted'], [])
+
+        self.client.patch(f'/api/tasks/{self.tasks[3].id}/', {'status': 'done'}, format='json')
+        self.tasks[5].assigned_to.add(self.workers[4])
+        User.objects.filter(pk=self.workers[3].pk).update(first_name='Nowe')  # przypisany tylko do tasks[5]
+        deleted_id = self.tasks[7].id
+        self.tasks[7].delete()
+
+        delta = self.sync(token)
+        self.assertEqual(sorted(t['id'] for t in delta['upserted']), [self.tasks[3].id, self.tasks[5].id])
+        self.assertEqual(delta['deleted'], [deleted_id])
+        self.assertEqual(self.sync(delta['next_token'])['upserted'], [])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/tasks/changes/', {'since': 'zly-token'})
+        self.assertEqual(response.status_code, 400)
+        for values in ([1], ['1', 2], None, [1, 2, 3]):
+            response = self.client.get('/api/tasks/changes/', {'since': encode_cursor('changes', values)})
+            self.assertEqual(response.status_code, 400, values)
+
+    def test_future_token(self):
+        latest = self.sync()['next_token']
+        self.assertEqual(self.sync(latest)['upserted'], [])
+        future = encode_cursor('changes', [TaskChange.objects.latest('version').version + 1, 0])
+        response = self.client.get('/api/tasks/changes/', {'since': future})
+        self.assertEqual(response.status_code, 400)
+        self.assertLessEqual(int(response['X-Query-Count']), BUDGETS['changes'])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class TaskBulkTests(ApiTestCase):
+    """POST /api/tasks/bulk/: wiele zmian w jednej transakcji i stałej liczbie zapytań."""
+
+    def bulk(self, user, items):
+        return self.client_for(user).post('/api/tasks/bulk/', items, format='json')
+
+    def test_status_fields_and_assignments_in_one_request(self):
+        items = [{'id': task.id, 'status': 'done'} for task in self.tasks[:10]]
+        items[0].update(title='Nowy tytuł', due_date='2026-12-01')
+        items += [
+            {'id': self.tasks[10].id, 'assigned_to_ids': [self.workers[0].id, self.workers[4].id]},
+            {'id': self.tasks[11].id, 'assigned_to_ids': []},
+        ]
+        response = self.bulk(self.manager, items)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertLessEqual(int(response['X-Query-Count']), BUDGETS['bulk'])
+        self.assertEqual(response.json()['updated'], 12)
+        self.assertEqual(response.json()['results'][0], {'id': self.tasks[0].id, 'fields': ['due_date', 'status', 'title']})
+
+        self.assertEqual(Task.objects.filter(status='done').count(), 10)
+        first = Task.objects.get(pk=self.tasks[0].id)
+        self.assertEqual((first.title, str(first.due_date)), ('Nowy tytuł', '2026-12-01'))
+        self.assertEqual(Task.objects.get(pk=self.tasks[1].id).title, 'Zadanie 1')
+        self.assertEqual(set(self.tasks[10].assigned_to.values_list('id', flat=True)),
+                         {self.workers[0].id, self.workers[4].id})
+        self.assertFalse(self.tasks[11].assigned_to.exists())
+        self.assertEqual(self.tasks[12].assigned_to.count(), 3)
+
+    def test_invalid_item_rejects_whole_batch(self):
+        response = self.bulk(self.manager, [
+            {'id': self.tasks[0].id, 'status': 'done'},
+            {'id': 999999, 'status': 'done'},
+            {'id': self.tasks[1].id, 'assigned_to_ids': [999999]},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn('id', errors[1])
+        self.assertIn('assigned_to_ids', errors[2])
+        self.assertFalse(Task.objects.filter(status='done').exists())
+
+    def test_clear_assignments_at_max_items(self):
+        # Regresja: usuwanie 1500 przypisań jako OR par (task, user) przekraczało głębokość wyrażenia SQLite
+        max_items = TaskBulkListSerializer.max_items
+        tasks = Task.objects.bulk_create(Task(title=f'Masowe {i}', description='Opis') for i in range(max_items))
+        through = Task.assigned_to.through
+        through.objects.bulk_create(through(task_id=task.id, user_id=worker.id)
+                                    for task in tasks for worker in self.workers[:3])
+        response = self.bulk(self.manager, [{'id': task.id, 'assigned_to_ids': []} for task in tasks])
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        self.assertLessEqual(int(response['X-Query-Count']), BUDGETS['bulk'])
+        self.assertFalse(through.objects.filter(task_id__in=[task.id for task in tasks]).exists())
+        self.assertEqual(self.tasks[0].assigned_to.count(), 3)
+
+        too_many = [{'id': task.id, 'status': 'done'} for task in tasks] + [{'id': self.tasks[0].id, 'status': 'done'}]
+        self.assertEqual(self.bulk(self.manager, too_many).status_code, 400)
+
+    def test_employee_cannot_assign(self):
+        response = self.bulk(self.employee, [
+            {'id': self.tasks[0].id, 'status': 'done'},
+            {'id': self.tasks[1].id, 'assigned_to_ids': [self.employee.id]},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.filter(status='done').exists())
+        self.assertEqual(self.bulk(self.employee, [{'id': self.tasks[0].id, 'status': 'done'}]).status_code, 200)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class KeysetPaginationTests(ApiTestCase):
+    """KeysetPagination: kursor, limit i przejście przez granicę zadań bez terminu (NULL) przy ordering=due_date."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i, day in enumerate((5, 1, 3, 3, 1, 2, 3)):
+            Task.objects.filter(pk=cls.tasks[i].pk).update(due_date=date(2026, 4, day))
+
+    def setUp(self):
+        self.client = self.client_for(self.employee)
+
+    def page(self, **params):
+        response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, **params):
+        ids, cursor = [], None
+        while True:
+            page = self.page(**params, **({'cursor': cursor} if cursor else {}))
+            ids += [task['id'] for task in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_due_date_crosses_null_boundary(self):
+        expected = list(Task.objects.order_by(F('due_date').asc(nulls_last=True), 'id').values_list('id', flat=True))
+        for limit in (1, 3, 7, 8):
+            with self.subTest(limit=limit):
+                ids = self.walk(ordering='due_date', limit=limit)
+                self.assertEqual(ids, expected)
+        self.assertEqual(self.walk(limit=6), sorted(expected))
+
+    def test_invalid_cursor(self):
+        # Niezdekodowalny albo zdekodowalny, ale z wartościami niepasującymi do sortowania
+        forged = [
+            ('nie-kursor', 'id'), (encode_cursor('id', []), 'id'), (encode_cursor('id', ['x']), 'id'),
+            (encode_cursor('due_date', [1]), 'due_date'), (encode_cursor('due_date', ['jutro', 1]), 'due_date'),
+            (encode_cursor('due_date', [None, 'x']), 'due_date'),
+        ]
+        for cursor, ordering in forged:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/tasks/', {'cursor': cursor, 'ordering': ordering})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json())
+
+    def test_cursor_bound_to_ordering(self):
+        cursor = self.page(limit=2)['next_cursor']
+        response = self.client.get('/api/tasks/', {'cursor': cursor, 'ordering': 'due_date'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/', {'ordering': 'title'}).status_code, 400)
+
+    def test_limit_clamped(self):
+        Task.objects.bulk_create(Task(title=f'Limit {i}', description='Opis') for i in range(200))
+        self.assertEqual(len(self.page(limit=1000)['results']), KeysetPagination.max_page_size)
+        self.assertEqual(len(self.page(limit=0)['results']), 1)
+        self.assertEqual(len(self.page()['results']), KeysetPagination.page_size)
+        self.assertEqual(self.client.get('/api/tasks/', {'limit': 'dużo'}).status_code, 400)
+
+
+class StreamingListTests(ApiTestCase):
+    """?stream=ndjson|json: wszystkie wiersze, paczkami po stream_batch_size (WHERE id > ostatnie id)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Task.objects.bulk_create(Task(title=f'Strumień {i}', description='Opis')
+                                 for i in range(TaskViewSet.stream_batch_size * 2))
+        cls.all_ids = list(Task.objects.order_by('id').values_list('id', flat=True))
+
+    def stream(self, fmt):
+        response = self.client_for(self.employee).get('/api/tasks/', {'stream': fmt})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], STREAM_CONTENT_TYPES[fmt])
+        return [chunk.decode() for chunk in response.streaming_content]
+
+    def test_ndjson(self):
+        chunks = self.stream('ndjson')
+        # Jedna porcja na paczkę: 500 + 500 + 20
+        self.assertEqual(len(chunks), 3)
+        items = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual([item['id'] for item in items], self.all_ids)
+        self.assertEqual(len(items[0]['assigned_to']), 3)
+
+    def test_json(self):
+        chunks = self.stream('json')
+        self.assertEqual((len(chunks), chunks[0], chunks[-1]), (5, '[', ']'))
+        items = json.loads(''.join(chunks))
+        self.assertEqual([item['id'] for item in items], self.all_ids)
+
+    def test_unknown_format(self):
+        response = self.client_for(self.employee).get('/api/tasks/', {'stream': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stream', response.json())
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class SparseFieldsTests(ApiTestCase):
+    """?fields= zawęża odpowiedź, kolumny w SELECT i pomija niepotrzebne prefetch."""
+
+    def setUp(self):
+        self.client = self.client_for(self.manager)
+
+    def get(self, path, fields, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, {'fields': fields, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [q['sql'] for q in queries]
+
+    def test_task_list_with_assignee_names(self):
+        data, queries = self.get('/api/tasks/', 'id,title,status,assigned_to.first_name,assigned_to.last_name')
+        task = data['results'][0]
+        self.assertEqual(set(task), {'id', 'title', 'status', 'assigned_to'})
+        self.assertEqual(set(task['assigned_to'][0]), {'first_name', 'last_name'})
+        task_query = next(q for q in queries if 'FROM "bbb_task"' in q)
+        user_query = next(q for q in queries if 'FROM "auth_user"' in q)
+        self.assertNotIn('"description"', task_query)
+        self.assertNotIn('"username"', user_query)
+
+    def test_task_list_without_relations_skips_prefetch(self):
+        data, queries = self.get('/api/tasks/', 'id,title')
+        self.assertEqual(set(data['results'][0]), {'id', 'title'})
+        self.assertFalse(any('auth_user' in q for q in queries))
+
+    def test_due_date_ordering_keeps_cursor_column(self):
+        data, queries = self.get('/api/tasks/', 'title', ordering='due_date', limit=5)
+        self.assertEqual(set(data['results'][0]), {'title'})
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertEqual(len([q for q in queries if 'FROM "bbb_task"' in q]), 1)
+
+    def test_user_list_and_retrieve(self):
+        data, _ = self.get('/api/users/', 'username')
+        self.assertEqual(set(data['results'][0]), {'username'})
+        data, _ = self.get(f'/api/tasks/{self.tasks[0].id}/', 'id,assigned_to')
+        self.assertEqual(set(data['assigned_to'][0]), {'id', 'username', 'first_name', 'last_name'})
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get('/api/tasks/', {'fields': 'id,secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/', {'fields': 'title.x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/', {'fields': 'assigned_to_ids'}).status_code, 400)
+
+
+class TaskFilterTests(ApiTestCase):
+    """Filtry listy zadań i plan zapytania (EXPLAIN QUERY PLAN) - każdy filtr korzysta z indeksu."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Task.objects.filter(pk__in=[t.pk for t in cls.tasks[:5]]).update(status='done')
+        for i, task in enumerate(cls.tasks[:10]):
+            Task.objects.filter(pk=task.pk).update(due_date=f'2025-03-{i + 1:02d}')
+        cls.tasks[0].assigned_to.set([cls.employee])
+
+    def list_ids(self, **params):
+        response = self.client_for(self.manager).get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [t['id'] for t in response.json()['results']]
+
+    def plan(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            self.list_ids(**params)
+        sql = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "bbb_task"."id"'))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def test_filters(self):
+        ids = [t.pk for t in self.tasks]
+        self.assertEqual(self.list_ids(status='done'), ids[:5])
+        self.assertEqual(self.list_ids(status='done,in_process'), ids[:5])
+        self.assertEqual(self.list_ids(assigned_to=str(self.employee.pk)), ids[:1])
+        self.assertEqual(self.list_ids(assigned_to=f'{self.employee.pk},{self.workers[0].pk}'), ids)
+        self.assertEqual(self.list_ids(due_after='2025-03-03', due_before='2025-03-05'), ids[2:5])
+        self.assertEqual(self.list_ids(ids=f'{ids[3]},{ids[7]}', status='done'), [ids[3]])
+
+    def test_invalid_filters(self):
+        client = self.client_for(self.manager)
+        for params in ({'status': 'lost'}, {'assigned_to': 'x'}, {'due_after': '03/2025'}, {'ids': '1,a'}):
+            self.assertEqual(client.get('/api/tasks/', params).status_code, 400, params)
+
+    def test_filters_use_indexes(self):
+        self.assertIn('USING INDEX task_status_idx', self.plan(status='done'))
+        self.assertIn('USING INDEX task_status_idx', self.plan(status='done,in_process'))
+        # Zakres jednostronny przy sortowaniu po id: SQLite woli przejść tabelę w kolejności id (LIMIT)
+        self.assertIn('USING INDEX task_due_date_idx', self.plan(due_after='2025-03-03', due_before='2025-03-05'))
+        self.assertIn('USING INDEX task_due_date_idx', self.plan(due_before='2025-03-05', ordering='due_date'))
+        self.assertRegex(self.plan(assigned_to=str(self.employee.pk)), 'USING INDEX bbb_task_assigned_to_user_id')
+        self.assertIn('USING INTEGER PRIMARY KEY', self.plan(ids='1,2,3'))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class SearchTests(ApiTestCase):
+    """/api/search/ - FTS5 po zadaniach i słowniku, indeks aktualizowany triggerami."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.invoice = Task.objects.create(title='Faktura za serwery', description='Zapłacić <do> piątku dostawcy')
+        cls.kpi = BusinessDefinition.objects.create(term='KPI', definition='Kluczowy wskaźnik efektywności faktur')
+
+    def search(self, q, **params):
+        response = self.client_for(self.employee).get('/api/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def test_ranked_prefix_search(self):
+        results = self.search('faktu')
+        self.assertEqual([(r['type'], r['id']) for r in results],
+                         [('task', self.invoice.pk), ('definition', self.kpi.pk)])
+        self.assertEqual(results[0]['title'], '<mark>Faktura</mark> za serwery')
+        self.assertIn('<mark>faktur</mark>', results[1]['snippet'])
+        self.assertEqual([r['id'] for r in self.search('faktura dostaw')], [self.invoice.pk])
+        # remove_diacritics: "piatku" bez polskich znaków też trafia
+        self.assertIn('&lt;do&gt; <mark>piątku</mark>', self.search('piatku')[0]['snippet'])
+
+    def test_index_follows_changes(self):
+        Task.objects.filter(pk=self.invoice.pk).update(title='Rachunek za serwery')
+        self.assertEqual(self.search('faktura'), [])
+        self.assertEqual([r['id'] for r in self.search('rachunek')], [self.invoice.pk])
+        self.invoice.delete()
+        self.assertEqual(self.search('rachunek'), [])
+
+    def test_invalid_and_unauthenticated(self):
+        self.assertEqual(self.client_for(self.employee).get('/api/search/', {'q': '"*'}).status_code, 400)
+        self.assertEqual(APIClient().get('/api/search/', {'q': 'faktura'}).status_code, 401)
+        self.assertEqual(len(self.search('zadanie', limit=3)), 3)
+
+    def test_candidates_cap_is_reported(self):
+        old = Task.objects.create(title='Rozliczenie kwartalne', description='')
+        newer = [Task.objects.create(title=f'Spotkanie {i}', description='Omówić rozliczenie').pk for i in range(3)]
+
+        def search(q):
+            response = self.client_for(self.employee).get('/api/search/', {'q': q})
+            self.assertEqual(int(response['X-Query-Count']), 1)
+            return [r['id'] for r in response.json()['results']], response.json()['truncated']
+
+        ids, truncated = search('rozliczenie')
+        self.assertEqual((ids[0], sorted(ids[1:]), truncated), (old.pk, newer, False))
+        # Stary, najlepiej pasujący dokument spoza kandydatów wypada z rankingu - odpowiedź to zgłasza
+        with mock.patch('bbb.search.SEARCH_CANDIDATES', 2):
+            ids, truncated = search('rozliczenie')
+        self.assertEqual((sorted(ids), truncated), (newer[1:], True))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class StaffPanelTests(ApiTestCase):
+    """/staff/tasks/ - strony userów, liczniki z agregacji i karty z cache (nowy klucz po zmianie)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def panel(self, **params):
+        response = self.client.get('/staff/tasks/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_counts_and_cached_cards(self):
+        Task.objects.filter(pk=self.tasks[0].pk).update(status='done')
+        self.assertEqual(int(self.panel()['X-Query-Count']), 2)
+        response = self.panel()
+        self.assertEqual(int(response['X-Query-Count']), 1)
+        self.assertContains(response, 'Zadania: 20 · zrobione: 1', count=3)
+        self.assertContains(response, '…i 10 więcej', count=3)
+
+        # Zmiana przypisań i tytułu - karta renderuje się od nowa, pozostałe z cache
+        self.tasks[0].assigned_to.remove(self.workers[0])
+        Task.objects.filter(pk=self.tasks[1].pk).update(title='Pilne zadanie')
+        response = self.panel()
+        self.assertEqual(int(response['X-Query-Count']), 2)
+        self.assertContains(response, 'Zadania: 19 · zrobione: 0')
+        self.assertContains(response, 'Pilne zadanie', count=3)
+
+    def test_pages_by_user(self):
+        with mock.patch.object(staff_panel, 'STAFF_PAGE_SIZE', 3):
+            first = self.panel()
+            self.assertContains(first, 'class="card user-card"', count=3)
+            self.assertContains(first, f'?after={self.workers[0].pk}')
+            last = self.panel(after=self.workers[2].pk)
+            self.assertContains(last, 'class="card user-card"', count=2)
+            self.assertNotContains(last, 'Następna strona')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class TaskExportTests(ApiTestCase):
+    """/api/tasks/export/ - CSV/NDJSON z kursora, filtry listy zadań i gzip w trakcie wysyłania."""
+
+    def export(self, headers=None, **params):
+        response = self.client_for(self.employee).get('/api/tasks/export/', params, **(headers or {}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_csv_with_filters(self):
+        Task.objects.filter(pk__in=[t.pk for t in self.tasks[:4]]).update(status='done', due_date='2025-05-01')
+        with mock.patch.object(export, 'EXPORT_CHUNK_ROWS', 3):
+            response = self.export(status='done', due_after='2025-01-01')
+            chunks = list(response.streaming_content)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        self.assertEqual(len(chunks), 2)
+        rows = list(csv.reader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'title', 'description', 'status', 'due_date', 'assigned_to_ids'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [t.pk for t in self.tasks[:4]])
+        self.assertEqual(rows[1][3:5], ['done', '2025-05-01'])
+        self.assertEqual(sorted(map(int, rows[1][5].split(','))), [w.pk for w in self.workers[:3]])
+
+    def test_ndjson_gzip(self):
+        self.tasks[1].assigned_to.clear()
+        response = self.export(headers={'HTTP_ACCEPT_ENCODING': 'gzip, deflate'}, output='ndjson')
+        self.assertEqual((response['Content-Encoding'], response['Content-Type']), ('gzip', 'application/x-ndjson'))
+        items = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual(len(items), len(self.tasks))
+        self.assertEqual(sorted(items[0]['assigned_to_ids']), [w.pk for w in self.workers[:3]])
+        self.assertEqual((items[1]['assigned_to_ids'], items[1]['due_date']), ([], None))
+
+    def test_invalid_params(self):
+        client = self.client_for(self.employee)
+        for params in ({'output': 'xml'}, {'status': 'lost'}):
+            self.assertEqual(client.get('/api/tasks/export/', params).status_code, 400, params)
+        self.assertEqual(APIClient().get('/api/tasks/export/').status_code, 401)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class FastListParityTests(ApiTestCase):
+    """Szybka ścieżka /api/tasks/ (values() + orjson) - bajt w bajt to samo co TaskSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        titles = ['Cytat "x" i \\ukośnik', 'Zażółć gęślą jaźń 🚀', 'Linia\u2028separator\u2029\x01\n\t', '</script>']
+        for i, title in enumerate(titles):
+            task = Task.objects.create(title=title, description=title[::-1], due_date=date(2030, 1, i + 1) if i % 2 else None)
+            task.assigned_to.set([cls.workers[4], cls.employee, cls.workers[1]][:i + 1])
+            cls.tasks.append(task)
+
+    def both(self, **params):
+        client = self.client_for(self.employee)
+        fast = client.get('/api/tasks/', params)
+        with override_settings(FAST_LIST_RESPONSES=False):
+            slow = client.get('/api/tasks/', params)
+        self.assertEqual(fast.status_code, 200, fast.content)
+        return fast, slow
+
+    def test_same_bytes(self):
+        for params in ({}, {'limit': 7}, {'ordering': 'due_date', 'limit': 5}, {'status': 'not_started'}):
+            fast, slow = self.both(**params)
+            self.assertEqual(fast.content, slow.content, params)
+            self.assertEqual(fast['ETag'], slow['ETag'])
+            cursor = fast.json()['next_cursor']
+            if cursor:
+                fast, slow = self.both(**params, cursor=cursor)
+                self.assertEqual(fast.content, slow.content, params)
+        self.assertIn(b'Linia\\u2028separator\\u2029\\u0001', fast.content)
+
+    def test_sparse_fields_use_serializer(self):
+        response = self.client_for(self.employee).get('/api/tasks/', {'fields': 'id,assigned_to.username'})
+        self.assertEqual(list(response.json()['results'][0]['assigned_to'][0]), ['username'])
+
+    def test_renderer_matches_json_renderer(self):
+        data = {'kwota': Decimal('12.50'), 'dzień': date(2030, 1, 2), 'lista': [None, True, 2**70, '\u2029']}
+        for media_type in ('application/json', 'application/json; indent=2'):
+            self.assertEqual(FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+        for renderer in (FastJSONRenderer(), JSONRenderer()):
+            self.assertRaises(UnicodeEncodeError, renderer.render, {'surogat': '\ud800'})
+
+    def test_missing_fast_list_rows(self):
+        class Lista(FastListMixin):
+            pass
+
+        with self.assertRaisesMessage(ImproperlyConfigured, 'Lista'):
+            Lista().fast_list_rows([])
 
-# Create your tests here.
@@ -0,0 +1,79 @@
+"""
+Claimy ról w tokenach JWT.
+
+Przy logowaniu (i odświeżaniu) do tokena trafiają `username`, `groups` i `roles_at`
+(znacznik czasu wydania claimów), więc RoleClaimsJWTAuthentication nie pobiera
+usera z bazy, a uprawnienia (is_manager) wynikają z samego tokena.
+
+Unieważnianie: zmiana grup usera, jego usunięcie/dezaktywacja albo zmiana
+samej grupy zapisuje po commicie w cache znacznik czasu (bbb/signals.py). Token z
+`roles_at` starszym niż ten znacznik jest odrzucany (401) - klient odświeża
+token i dostaje aktualne grupy. Przy kilku procesach cache musi być wspólny
+(CACHES, np. Redis); domyślny LocMemCache działa w obrębie jednego procesu.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+ALL_USERS = '*'
+
+
+def _roles_key(user_id):
+    return f'roles_changed:{user_id}'
+
+
+def role_claims(user):
+    return {
+        'username': user.username,
+        'groups': sorted(user.groups.values_list('name', flat=True)),
+        'roles_at': time.time(),
+    }
+
+
+def mark_roles_changed(user_id=ALL_USERS):
+    """Unieważnia claimy wydane do tej chwili (jednemu userowi albo wszystkim)."""
+    # Znacznik musi przeżyć najdłużej ważny token, z którego można wyprowadzić access
+    timeout = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    cache.set(_roles_key(user_id), time.time(), timeout)
+
+
+def roles_changed_at(user_id):
+    stamps = cache.get_many([_roles_key(ALL_USERS), _roles_key(user_id)])
+    return max(stamps.values(), default=0.0)
+
+
+class RoleClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token.payload.update(role_claims(user))
+        return token
+
+
+class RoleClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Nowy access token dostaje aktualne grupy, a nie kopię claimów z refresh tokena."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+        access.payload.update(role_claims(user))
+        data['access'] = str(access)
+        return data
+
+
+class RoleClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """Uwierzytelnienie bez zapytań do bazy: request.user to TokenUser z claimami z tokena."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        roles_at = token.get('roles_at')
+        if roles_at is None or roles_at < roles_changed_at(token.get(api_settings.USER_ID_CLAIM)):
+            raise InvalidToken('Uprawnienia użytkownika zmieniły się, odśwież token.')
+        return token
@@ -1,36 +1,174 @@
+from collections import defaultdict
+
+from django.db.models import Max, Q
+from django.db.models.expressions import RawSQL
 from rest_framework import viewsets, permissions
-from .models import Task, User
-from .serializers import TaskSerializer, UserSerializer
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from .models import Task, TaskChange, User
+from .serializers import TaskBulkItemSerializer, TaskSerializer, UserSerializer
+from .pagination import KeysetPagination, decode_changes_token, encode_cursor
+from .streaming import StreamingListMixin
+from .export import EXPORT_CHUNK_ROWS, export_format, export_response
+from .fast_lists import FastListMixin
+from .fields import SparseFieldsMixin
+from .filters import TaskFilterBackend
+from .search import search, search_limit
+from .staff_panel import attach_cards, staff_page
+from .permissions import is_manager
+from .conditional import collection_condition
+from projekt_firmowy.query_budget import query_budget
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import render
 from django.contrib.auth.models import User
 
 
-class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.all()
+USER_FIELDS = UserSerializer.Meta.fields
+TASK_EXPORT_COLUMNS = ['id', 'title', 'description', 'status', 'due_date', 'assigned_to_ids']
+TASK_ASSIGNEES = """
+    SELECT group_concat(assignment.user_id) FROM bbb_task_assigned_to assignment
+    WHERE assignment.task_id = bbb_task.id"""
+
+
+class TaskViewSet(SparseFieldsMixin, StreamingListMixin, FastListMixin, viewsets.ModelViewSet):
+    # prefetch_related: przypisani użytkownicy jednym zapytaniem zamiast jednego na zadanie
+    queryset = Task.objects.prefetch_related('assigned_to')
+    # Lista bez ?fields= - słowniki z values() i orjson zamiast TaskSerializer (bbb/fast_lists.py)
+    fast_list_fields = ('id', 'title', 'description', 'due_date', 'status')
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [TaskFilterBackend]
+    keyset_orderings = ("id", "due_date")
+    # Limity zapytań SQL, sprawdzane przez QueryBudgetMiddleware
+    # (uwierzytelnienie JWT i sprawdzenie grupy nie pytają bazy - claimy z tokena, bbb/tokens.py)
+    # list: +1 zapytanie o wersję kolekcji (ETag); odpowiedź 304 to tylko to jedno zapytanie
+    # create/update: przypisani (assigned_to_ids) jednym zapytaniem id__in, niezależnie od ich liczby
+    # bulk: stała liczba zapytań niezależnie od liczby pozycji (z SAVEPOINT/RELEASE transakcji)
+    # export: jedno zapytanie czytane dopiero podczas wysyłania odpowiedzi (poza limitem)
+    query_budgets = {
+        'list': 3, 'retrieve': 2, 'create': 5, 'update': 7, 'partial_update': 7, 'destroy': 3,
+        'changes': 3, 'bulk': 8, 'export': 0,
+    }
+
+    def get_queryset(self):
+        # Zapis i usuwanie: prefetch przypisanych przy get_object() to zmarnowane zapytanie -
+        # UpdateModelMixin czyści cache prefetch po zapisie, a odpowiedź czyta przypisanych od nowa
+        if self.action in ('update', 'partial_update', 'destroy'):
+            return super().get_queryset().prefetch_related(None)
+        return super().get_queryset()
+
+    @collection_condition('tasks')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def fast_list_rows(self, rows):
+        # Przypisani userzy jednym zapytaniem tego samego kształtu co prefetch_related('assigned_to')
+        # (ta sama kolejność), klucze w kolejności pól TaskSerializer/UserSerializer
+        assigned = defaultdict(list)
+        if rows:
+            users = User.objects.filter(tasks__in=[row['id'] for row in rows]).values_list('tasks', *USER_FIELDS)
+            for task_id, *user in users:
+                assigned[task_id].append(dict(zip(USER_FIELDS, user)))
+        return [{'id': row['id'], 'title': row['title'], 'description': row['description'],
+                 'due_date': row['due_date'], 'assigned_to': assigned[row['id']], 'status': row['status']}
+                for row in rows]
+
+    @action(detail=False, url_path='changes')
+    def changes(self, request):
+        # Delta sync: tylko zadania zmienione/usunięte od tokenu `since` (dziennik bbb_taskchange),
+        # więc koszt zależy od liczby zmian, a nie od rozmiaru tabeli. Bez `since` - wszystkie zadania.
+        since = request.query_params.get('since')
+        version, task_id = decode_changes_token(since)
+        limit = self.paginator.get_limit(request)
+        changes = list(
+            TaskChange.objects.filter(Q(version__gt=version) | Q(version=version, task_id__gt=task_id))
+            .order_by('version', 'task_id')[:limit + 1]
+        )
+        if not changes and version > (TaskChange.objects.aggregate(Max('version'))['version__max'] or 0):
+            # Token spoza dziennika (np. z odtworzonej bazy) - bez błędu klient nie dostałby już żadnych zmian
+            raise ValidationError({'since': 'Token nowszy niż dziennik zmian - zsynchronizuj od nowa bez since.'})
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        live_ids = [c.task_id for c in changes if not c.deleted]
+        tasks = self.get_queryset().in_bulk(live_ids)
+        upserted = [tasks[pk] for pk in live_ids if pk in tasks]
+        last = changes[-1] if changes else None
+        return Response({
+            'upserted': self.get_serializer(upserted, many=True).data,
+            'deleted': [c.task_id for c in changes if c.deleted],
+            'next_token': encode_cursor('changes', [last.version, last.task_id]) if last else
+                          since or encode_cursor('changes', [0, 0]),
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        # Wiele zmian (status, pola, przypisania) w jednym żądaniu i jednej transakcji;
+        # odpowiedź to tylko id i zmienione pola, bez ponownej serializacji zadań
+        serializer = TaskBulkItemSerializer(data=request.data, many=True, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+    @action(detail=False, url_path='export')
+    def export(self, request):
+        # ?output=csv|ndjson + filtry listy (?status=done&due_after=2026-01-01...) - bbb/export.py;
+        # przypisania jako group_concat id userów zamiast prefetch
+        rows = (
+            self.filter_queryset(Task.objects.order_by('id'))
+            .annotate(assigned_to_ids=RawSQL(TASK_ASSIGNEES, ()))
+            .values_list(*TASK_EXPORT_COLUMNS)
+            .iterator(chunk_size=EXPORT_CHUNK_ROWS)
+        )
+        return export_response(request, rows, TASK_EXPORT_COLUMNS, export_format(request), 'tasks',
+                               id_lists=['assigned_to_ids'])
 
 class CurrentUserView(APIView):
+    # username i grupy pochodzą z claimów tokena
+    query_budgets = {'get': 0}
+
     def get(self, request):
         return Response({
             "username": request.user.username,
-            "is_admin": request.user.groups.filter(name='Managerowie').exists()
+            "is_admin": is_manager(request.user)
         })
     
+class SearchView(APIView):
+    # Wyszukiwanie w zadaniach i słowniku (FTS5): ?q=fakt klie&limit=20
+    # Jedno zapytanie UNION ALL; tytuł i snippet to HTML z trafieniami w <mark>
+    permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'get': 1}
+
+    def get(self, request):
+        results, truncated = search(request.query_params.get('q'), search_limit(request))
+        return Response({'results': results, 'truncated': truncated})
+
 # fetch users
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(SparseFieldsMixin, StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    query_budgets = {'list': 2, 'retrieve': 1}
 
+    @collection_condition('users')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+@query_budget(get=2)
 def users_tasks_view(request):
-    # Pobieramy wszystkich userów
-    # Używamy prefetch_related('tasks'), żeby Django nie robiło 100 zapytań do bazy (optymalizacja)
-    users = User.objects.prefetch_related('tasks').all()
-    
+    # Strona userów (?after=<id>) z licznikami zadań z jednego zapytania z agregacją;
+    # listy zadań kart z cache, z bazy (jedno zapytanie) tylko dla kart, które się zmieniły
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    users, next_after = staff_page(after)
     context = {
-        'users': users
+        'users': attach_cards(users),
+        'after': after,
+        'next_after': next_after,
     }
     return render(request, 'users_tasks.html', context)
\ No newline at end of file
@@ -26,30 +26,26 @@ function BillsChart() {
 
   useEffect(() => {
     const token = localStorage.getItem("token");
-    fetch("http://127.0.0.1:8002/api/bills/", {
+    fetch("http://127.0.0.1:8002/api/bills/summary/", {
         headers: { Authorization: `Bearer ${token}` }
     })
       .then((res) => res.json())
-      .then((data) => {
-        if (!data || data.length === 0) {
+      .then((rows) => {
+        if (!rows || rows.length === 0) {
             console.log("Brak danych rachunków");
             return;
         }
 
         // Unikalne kategorie (np. Prąd, Woda)
-        const categories = [...new Set(data.map((b) => b.category))];
-        
-        // Sumowanie kwot dla 2025
-        const data2025 = categories.map(cat => 
-            data.filter(b => b.category === cat && b.year === 2025)
-                .reduce((sum, b) => sum + parseFloat(b.amount), 0)
-        );
+        const categories = [...new Set(rows.map((r) => r.category))];
 
-        // Sumowanie kwot dla 2026
-        const data2026 = categories.map(cat => 
-            data.filter(b => b.category === cat && b.year === 2026)
-                .reduce((sum, b) => sum + parseFloat(b.amount), 0)
-        );
+        // Backend zwraca już sumy per kategoria/rok/miesiąc - składamy tylko miesiące w lata
+        const totalFor = (cat, year) =>
+            rows.filter(r => r.category === cat && r.year === year)
+                .reduce((sum, r) => sum + r.total, 0);
+
+        const data2025 = categories.map(cat => totalFor(cat, 2025));
+        const data2026 = categories.map(cat => totalFor(cat, 2026));
 
         setChartData({
           labels: categories,
@@ -1,6 +1,19 @@
 import { useEffect, useState } from "react";
 import "./App.css"; 
 
+// API zwraca strony {next_cursor, results} - pobieramy kolejne strony aż do końca
+async function fetchAllPages(url, headers) {
+  let items = [];
+  let cursor = null;
+  do {
+    const pageUrl = cursor ? `${url}?cursor=${encodeURIComponent(cursor)}` : url;
+    const page = await fetch(pageUrl, { headers }).then((res) => res.json());
+    items = items.concat(page.results);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
+}
+
 function TasksBoard() {
   const [tasks, setTasks] = useState([]);
   const [allUsers, setAllUsers] = useState([]); // List of all employees
@@ -12,13 +25,11 @@ function TasksBoard() {
     const headers = { Authorization: `Bearer ${token}` };
 
     // 1. Get Tasks
-    fetch("http://127.0.0.1:8002/api/tasks/", { headers })
-      .then((res) => res.json())
+    fetchAllPages("http://127.0.0.1:8002/api/tasks/", headers)
       .then((data) => setTasks(data));
 
     // 2. Get Users (NEW)
-    fetch("http://127.0.0.1:8002/api/users/", { headers })
-      .then((res) => res.json())
+    fetchAllPages("http://127.0.0.1:8002/api/users/", headers)
       .then((data) => setAllUsers(data));
     
     // 3. Get Current User info
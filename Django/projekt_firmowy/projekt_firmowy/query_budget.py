@@ -0,0 +1,103 @@
+"""
+Liczenie zapytań SQL per request i limity zapytań (query budget) per endpoint.
+
+Widoki deklarują limity atrybutem `query_budgets`:
+    - ViewSet:  {"list": 3, "retrieve": 3, "partial_update": 6, ...}  (klucz = akcja)
+    - APIView:  {"get": 2}                                          (klucz = metoda HTTP)
+    - funkcja:  dekorator @query_budget(get=2)
+
+Endpoint, którego praca rośnie z danymi wejściowymi (np. import paczkami), podnosi limit
+bieżącego requestu przez extend_query_budget(request, n) - o zapytania na paczkę, nie na wiersz.
+
+QueryBudgetMiddleware dopisuje do odpowiedzi nagłówki X-Query-Count i X-Query-Time-Ms,
+loguje przekroczenia, a przy QUERY_BUDGET_STRICT = True rzuca QueryBudgetExceeded
+(tak działają testy, więc przekroczony limit wywraca CI).
+Zapytania wykonane podczas iterowania StreamingHttpResponse nie są liczone.
+"""
+import logging
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger("projekt_firmowy.queries")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """execute_wrapper zliczający zapytania i ich łączny czas; działa też jako context manager."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+            self.statements.append(sql)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+
+def query_budget(**budgets):
+    """Dekorator limitu zapytań dla widoków funkcyjnych, np. @query_budget(get=2)."""
+    def decorator(view):
+        view.query_budgets = budgets
+        return view
+    return decorator
+
+
+def extend_query_budget(request, queries):
+    """Podnosi limit zapytań bieżącego requestu (HttpRequest albo Request DRF) o `queries`."""
+    request = getattr(request, '_request', request)
+    if getattr(request, 'query_budget', None) is not None:
+        request.query_budget += queries
+
+
+def budget_for(view_func, method):
+    """Limit zapytań dla danego widoku i metody HTTP albo None, gdy widok go nie deklaruje."""
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    budgets = getattr(view_class or view_func, "query_budgets", None)
+    if budgets is None:
+        return None
+    actions = getattr(view_func, "actions", None)
+    key = actions.get(method.lower()) if actions else method.lower()
+    return budgets.get(key)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response["X-Query-Count"] = str(recorder.count)
+        response["X-Query-Time-Ms"] = f"{recorder.duration * 1000:.2f}"
+        budget = request.query_budget
+        if budget is not None and recorder.count > budget:
+            message = f"{request.method} {request.path}: {recorder.count} zapytań SQL, limit {budget}"
+            logger.warning(message)
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(message + "\n" + "\n".join(recorder.statements))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = budget_for(view_func, request.method)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,11 +47,18 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'bbb.tokens.RoleClaimsJWTAuthentication',
     ),
 }
 
+# Grupy usera podpisane w tokenie (claim `groups`) - uprawnienia bez zapytań do bazy
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'bbb.tokens.RoleClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'bbb.tokens.RoleClaimsTokenRefreshSerializer',
+}
+
 MIDDLEWARE = [
+    'projekt_firmowy.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,6 +69,14 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
 ]
 
+# Przekroczenie limitu zapytań SQL (query_budgets w widokach) - w testach rzuca wyjątek,
+# w pozostałych przypadkach tylko loguje ostrzeżenie (logger 'projekt_firmowy.queries')
+QUERY_BUDGET_STRICT = False
+
+# Lista zadań ze słowników values() i orjson zamiast TaskSerializer (bbb/fast_lists.py),
+# te same bajty odpowiedzi; False wraca do serializera
+FAST_LIST_RESPONSES = os.environ.get('DJANGO_FAST_LISTS', '1') == '1'
+
 # Zezwól na Twoje frontendy (Vite dev servers)
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Django React
@@ -96,7 +112,7 @@ WSGI_APPLICATION = 'projekt_firmowy.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
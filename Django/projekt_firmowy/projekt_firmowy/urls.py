@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rachunki.views import BillViewSet
-from bbb.views import TaskViewSet, CurrentUserView, UserViewSet
+from bbb.views import TaskViewSet, CurrentUserView, UserViewSet, SearchView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -36,6 +36,7 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/me/', CurrentUserView.as_view(), name='current_user'),
+    path('api/search/', SearchView.as_view(), name='search'),
     path('', include('bbb.urls')),
 ]
 
@@ -0,0 +1,182 @@
+import re
+import threading
+
+import numpy as np
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from .models import Bill
+
+# --- ANALITYKA RACHUNKÓW (/api/bills/analytics/) ---
+# Rachunki jako kolumny NumPy (kod kategorii, miesiąc, kwota), wczytywane raz na wersję kolekcji
+# bills (CollectionVersion, triggery) - kolejne żądania dla dowolnego zakresu liczą się w pamięci.
+# Sumy miesięczne, YoY, średnie kroczące i percentyle to operacje na całych tablicach
+# (bincount, cumsum, searchsorted), bez pętli po rachunkach.
+DEFAULT_WINDOW = 3
+MAX_WINDOW = 24
+DEFAULT_PERCENTILES = '50,90,99'
+MAX_PERCENTILES = 10
+MAX_MONTHS = 240
+LOAD_BATCH = 100_000
+MONTH_RE = re.compile(r'^(\d{4})-(\d{2})$')
+
+
+class BillFrame:
+    """Rachunki posortowane po (kategoria, kwota); month = rok * 12 + miesiąc - 1."""
+
+    def __init__(self, categories, category, month, amount):
+        order = np.lexsort((amount, category))
+        self.categories = categories
+        self.category = category[order]
+        self.month = month[order]
+        self.amount = amount[order]
+
+    def __len__(self):
+        return len(self.amount)
+
+
+def load_frame():
+    """Wszystkie rachunki w kolumnach NumPy - dwa zapytania, wiersze czytane paczkami po LOAD_BATCH."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT DISTINCT category FROM {Bill._meta.db_table} ORDER BY category')
+        categories = [row[0] for row in cursor.fetchall()]
+        chunks = [np.empty((0, 3))]
+        if categories:
+            # Kategoria jako kod liczbowy już w SQL - do Pythona trafiają tylko liczby
+            codes = ' '.join(f'WHEN %s THEN {code}' for code in range(len(categories)))
+            cursor.execute(
+                f'SELECT CASE category {codes} END, year * 12 + month - 1, amount FROM {Bill._meta.db_table}',
+                categories,
+            )
+            for rows in iter(lambda: cursor.fetchmany(LOAD_BATCH), []):
+                chunks.append(np.array(rows, dtype=np.float64))
+    data = np.concatenate(chunks)
+    return BillFrame(categories, data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2])
+
+
+_frame_lock = threading.Lock()
+_cached_frame = None
+
+
+def bill_frame(stamp):
+    """BillFrame dla wersji kolekcji `stamp`; nowa wersja (albo brak wersji) = ponowne wczytanie."""
+    global _cached_frame
+    with _frame_lock:
+        if stamp is None or _cached_frame is None or _cached_frame[0] != stamp:
+            frame = load_frame()
+            _cached_frame = (stamp, frame) if stamp is not None else None
+            return frame
+        return _cached_frame[1]
+
+
+def parse_month(value, name):
+    """'RRRR-MM' -> rok * 12 + miesiąc - 1 (ValidationError dla pola `name`)."""
+    match = MONTH_RE.match(value)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValidationError({name: 'Oczekiwany miesiąc w formacie RRRR-MM.'})
+    return int(match.group(1)) * 12 + int(match.group(2)) - 1
+
+
+def _label(month):
+    return f'{month // 12:04d}-{month % 12 + 1:02d}'
+
+
+def analytics_params(params):
+    """start/end (RRRR-MM, włącznie), window (miesiące średniej kroczącej), percentiles (0-100)."""
+    start = parse_month(params['start'], 'start') if params.get('start') else None
+    end = parse_month(params['end'], 'end') if params.get('end') else None
+    if start is not None and end is not None and not 0 <= end - start < MAX_MONTHS:
+        raise ValidationError({'end': f'Zakres od 1 do {MAX_MONTHS} miesięcy.'})
+    try:
+        window = int(params.get('window', DEFAULT_WINDOW))
+        percentiles = [float(p) for p in params.get('percentiles', DEFAULT_PERCENTILES).split(',')]
+    except ValueError:
+        raise ValidationError({'detail': 'window to liczba całkowita, percentiles - lista liczb.'})
+    if not 1 <= window <= MAX_WINDOW:
+        raise ValidationError({'window': f'Od 1 do {MAX_WINDOW} miesięcy.'})
+    if not 0 < len(percentiles) <= MAX_PERCENTILES or not all(0 <= p <= 100 for p in percentiles):
+        raise ValidationError({'percentiles': f'Od 1 do {MAX_PERCENTILES} wartości z zakresu 0-100.'})
+    return {'start': start, 'end': end, 'window': window, 'percentiles': percentiles}
+
+
+def _group_percentiles(category, amount, groups, quantiles):
+    """Percentyle (interpolacja liniowa jak np.percentile) każdej grupy posortowanych kwot naraz."""
+    starts = np.searchsorted(category, np.arange(groups))
+    sizes = np.searchsorted(category, np.arange(groups), side='right') - starts
+    if not len(amount):
+        return np.full((groups, len(quantiles)), np.nan)
+    last = np.maximum(starts + sizes - 1, 0)
+    position = starts[:, None] + quantiles[None, :] * np.maximum(sizes - 1, 0)[:, None]
+    lower = np.minimum(np.floor(position).astype(np.int64), len(amount) - 1)
+    upper = np.minimum(lower + 1, last[:, None])
+    values = amount[lower] + (amount[upper] - amount[lower]) * (position - lower)
+    return np.where(sizes[:, None] > 0, values, np.nan)
+
+
+def _clean(values):
+    """Tablica -> lista z zaokrągleniem do groszy i None zamiast NaN."""
+    return [None if np.isnan(v) else v for v in np.round(values, 2).tolist()]
+
+
+def analyze(frame, start=None, end=None, window=DEFAULT_WINDOW, percentiles=()):
+    """Sumy i liczby rachunków per (kategoria, miesiąc), zmiana rok do roku, średnia krocząca
+    sum z `window` miesięcy i percentyle kwot per kategoria w zakresie [start, end]."""
+    if start is None and end is None and not len(frame):
+        return {'start': None, 'end': None, 'window': window, 'percentiles': percentiles,
+                'count': 0, 'total': 0, 'categories': []}
+    # Brakujący koniec zakresu = pierwszy/ostatni miesiąc z danymi, najwyżej MAX_MONTHS miesięcy
+    if len(frame):
+        first, last = int(frame.month.min()), int(frame.month.max())
+    else:
+        first = last = start if start is not None else end
+    if start is None and end is None:
+        start, end = max(first, last - MAX_MONTHS + 1), last
+    elif end is None:
+        end = min(max(last, start), start + MAX_MONTHS - 1)
+    elif start is None:
+        start = max(min(first, end), end - MAX_MONTHS + 1)
+    groups, months = len(frame.categories), end - start + 1
+    # Seria zaczyna się wcześniej, żeby YoY i średnia krocząca miały dane sprzed początku zakresu
+    lead = max(12, window - 1)
+    span = months + lead
+    in_span = (frame.month >= start - lead) & (frame.month <= end)
+    bins = frame.category[in_span] * span + (frame.month[in_span] - (start - lead))
+    totals = np.bincount(bins, weights=frame.amount[in_span], minlength=groups * span).reshape(groups, span)
+    counts = np.bincount(bins, minlength=groups * span).reshape(groups, span)
+
+    current, previous = totals[:, lead:], totals[:, lead - 12:span - 12]
+    had_previous = counts[:, lead - 12:span - 12] > 0
+    yoy_delta = np.where(had_previous, current - previous, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        yoy_pct = np.where(had_previous & (previous != 0), (current - previous) / previous * 100, np.nan)
+    cumulative = np.concatenate([np.zeros((groups, 1)), np.cumsum(totals, axis=1)], axis=1)
+    rolling = (cumulative[:, lead + 1:] - cumulative[:, lead + 1 - window:span + 1 - window]) / window
+
+    in_range = (frame.month >= start) & (frame.month <= end)
+    category, amount = frame.category[in_range], frame.amount[in_range]
+    group_counts = np.bincount(category, minlength=groups)
+    group_totals = np.bincount(category, weights=amount, minlength=groups)
+    quantiles = np.asarray(percentiles, dtype=np.float64) / 100
+    group_percentiles = _group_percentiles(category, amount, groups, quantiles)
+
+    labels = [_label(month) for month in range(start, end + 1)]
+    keys = [f'p{p:g}' for p in percentiles]
+    result = []
+    for code in np.flatnonzero(group_counts):
+        result.append({
+            'category': frame.categories[code],
+            'count': int(group_counts[code]),
+            'total': round(float(group_totals[code]), 2),
+            'percentiles': dict(zip(keys, _clean(group_percentiles[code]))),
+            'months': [
+                {'month': label, 'count': count, 'total': total, 'rolling_mean': mean,
+                 'yoy_delta': delta, 'yoy_pct': pct}
+                for label, count, total, mean, delta, pct in zip(
+                    labels, counts[code, lead:].tolist(), _clean(current[code]), _clean(rolling[code]),
+                    _clean(yoy_delta[code]), _clean(yoy_pct[code]))
+            ],
+        })
+    return {
+        'start': _label(start), 'end': _label(end), 'window': window, 'percentiles': percentiles,
+        'count': int(group_counts.sum()), 'total': round(float(group_totals.sum()), 2), 'categories': result,
+    }
@@ -0,0 +1,99 @@
+import codecs
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Bill
+
+# --- IMPORT RACHUNKÓW (CSV / NDJSON) ---
+# Plik czytany strumieniowo, linia po linii; poprawne wiersze trafiają do bazy paczkami po
+# IMPORT_BATCH (jedno executemany i jedna transakcja na paczkę), więc pamięć nie rośnie
+# z rozmiarem pliku. Błędny wiersz jest odrzucany i raportowany (numer linii + powód),
+# a import trwa dalej. Kolumny: category, amount, date (RRRR-MM-DD).
+IMPORT_BATCH = 5000
+MAX_REPORTED_ERRORS = 100
+IMPORT_COLUMNS = ('category', 'amount', 'date')
+IMPORT_FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson',
+                  'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}
+MAX_CATEGORY_LENGTH = Bill._meta.get_field('category').max_length
+MAX_AMOUNT = Decimal(10) ** (Bill._meta.get_field('amount').max_digits - 2)
+
+
+def import_format(name, content_type=''):
+    """csv/ndjson z rozszerzenia pliku albo typu treści."""
+    extension = name[name.rfind('.'):].lower() if '.' in name else ''
+    fmt = IMPORT_FORMATS.get(extension) or IMPORT_FORMATS.get(content_type.split(';')[0].strip())
+    if fmt is None:
+        raise ValidationError({'file': 'Oczekiwany plik .csv albo .ndjson.'})
+    return fmt
+
+
+def _records(lines, fmt):
+    """(numer linii, słownik pól) - dla linii NDJSON, która nie jest obiektem JSON, słownik to None."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        missing = [column for column in IMPORT_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValidationError({'file': f"Brak kolumn: {', '.join(missing)}."})
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+
+def _clean(record):
+    """(rok, miesiąc, kategoria, kwota) albo ValueError z powodem odrzucenia wiersza."""
+    if record is None:
+        raise ValueError('Linia nie jest obiektem JSON.')
+    category = str(record.get('category') or '').strip()
+    if not category or len(category) > MAX_CATEGORY_LENGTH:
+        raise ValueError(f'category: wymagane, najwyżej {MAX_CATEGORY_LENGTH} znaków.')
+    try:
+        amount = Decimal(str(record.get('amount')).strip())
+    except InvalidOperation:
+        raise ValueError('amount: oczekiwana liczba.')
+    if not amount.is_finite() or amount.as_tuple().exponent < -2 or abs(amount) >= MAX_AMOUNT:
+        raise ValueError(f'amount: liczba mniejsza niż {MAX_AMOUNT}, najwyżej 2 miejsca po przecinku.')
+    try:
+        day = date.fromisoformat(str(record.get('date')).strip())
+    except ValueError:
+        raise ValueError('date: oczekiwana data RRRR-MM-DD.')
+    return day.year, day.month, category, amount
+
+
+def _insert(rows, report):
+    table = Bill._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {table} (year, month, category, amount) VALUES (%s, %s, %s, %s)', rows)
+    report['imported'] += len(rows)
+    report['batches'] += 1
+
+
+def import_bills(stream, fmt):
+    """Importuje rachunki z binarnego strumienia (plik, upload) i zwraca raport importu."""
+    report = {'imported': 0, 'rejected': 0, 'batches': 0, 'errors': []}
+    batch = []
+    for number, record in _records(codecs.iterdecode(stream, 'utf-8-sig', errors='replace'), fmt):
+        try:
+            batch.append(_clean(record))
+        except ValueError as error:
+            report['rejected'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': number, 'error': str(error)})
+            continue
+        if len(batch) == IMPORT_BATCH:
+            _insert(batch, report)
+            batch = []
+    if batch:
+        _insert(batch, report)
+    return report
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rachunki.rollup import check_rollup, rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Przelicza (rebuild) lub weryfikuje (check) tabelę BillMonthlyRollup."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['rebuild', 'check'])
+
+    def handle(self, *args, **options):
+        if options['action'] == 'rebuild':
+            rebuild_rollup()
+            self.stdout.write(self.style.SUCCESS("Rollup rachunków przeliczony."))
+            return
+
+        mismatches = check_rollup()
+        for item in mismatches:
+            self.stdout.write(f"{item['key']}: oczekiwano={item['expected']} jest={item['stored']}")
+        if mismatches:
+            raise CommandError(f"Niespójne grupy: {len(mismatches)}")
+        self.stdout.write(self.style.SUCCESS("Rollup rachunków jest spójny."))
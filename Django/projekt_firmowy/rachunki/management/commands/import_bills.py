@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from rachunki.importer import IMPORT_BATCH, import_bills, import_format
+
+
+class Command(BaseCommand):
+    help = "Importuje rachunki z pliku CSV lub NDJSON (kolumny category, amount, date) paczkami po %d wierszy." % IMPORT_BATCH
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="domyślnie z rozszerzenia pliku")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = options['format'] or import_format(path.name)
+            with path.open('rb') as stream:
+                report = import_bills(stream, fmt)
+        except ValidationError as error:
+            raise CommandError(' '.join(str(message) for message in error.detail.values()))
+        except OSError as error:
+            raise CommandError(error)
+        for item in report['errors']:
+            self.stdout.write(f"linia {item['line']}: {item['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Zaimportowano: {report['imported']}, odrzucono: {report['rejected']}."))
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.20 on 2026-10-18 06:28
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+# Triggery SQLite utrzymujące rachunki_billmonthlyrollup.
+# Przy usunięciu/zmianie min/max liczymy od nowa tylko dla jednej grupy (bill_category_period_idx).
+def rollup_add(row):
+    return f"""
+    INSERT INTO rachunki_billmonthlyrollup (year, month, category, total, count, min_amount, max_amount)
+    VALUES ({row}.year, {row}.month, {row}.category, {row}.amount, 1, {row}.amount, {row}.amount)
+    ON CONFLICT (year, month, category) DO UPDATE SET
+        total = total + excluded.total,
+        count = count + 1,
+        min_amount = MIN(min_amount, excluded.min_amount),
+        max_amount = MAX(max_amount, excluded.max_amount);"""
+
+
+def rollup_remove(row):
+    group = f"category = {row}.category AND year = {row}.year AND month = {row}.month"
+    return f"""
+    UPDATE rachunki_billmonthlyrollup SET
+        total = total - {row}.amount,
+        count = count - 1,
+        min_amount = CASE WHEN {row}.amount > min_amount THEN min_amount
+                          ELSE (SELECT MIN(amount) FROM rachunki_bill WHERE {group}) END,
+        max_amount = CASE WHEN {row}.amount < max_amount THEN max_amount
+                          ELSE (SELECT MAX(amount) FROM rachunki_bill WHERE {group}) END
+    WHERE {group};
+    DELETE FROM rachunki_billmonthlyrollup WHERE {group} AND count <= 0;"""
+
+
+TRIGGERS = [
+    (
+        f"CREATE TRIGGER rachunki_bill_rollup_insert AFTER INSERT ON rachunki_bill BEGIN {rollup_add('NEW')} END",
+        "DROP TRIGGER IF EXISTS rachunki_bill_rollup_insert",
+    ),
+    (
+        f"CREATE TRIGGER rachunki_bill_rollup_delete AFTER DELETE ON rachunki_bill BEGIN {rollup_remove('OLD')} END",
+        "DROP TRIGGER IF EXISTS rachunki_bill_rollup_delete",
+    ),
+    (
+        "CREATE TRIGGER rachunki_bill_rollup_update AFTER UPDATE OF year, month, category, amount ON rachunki_bill "
+        f"BEGIN {rollup_remove('OLD')} {rollup_add('NEW')} END",
+        "DROP TRIGGER IF EXISTS rachunki_bill_rollup_update",
+    ),
+]
+
+
+def populate_rollup(apps, schema_editor):
+    Bill = apps.get_model('rachunki', 'Bill')
+    BillMonthlyRollup = apps.get_model('rachunki', 'BillMonthlyRollup')
+    groups = Bill.objects.values('year', 'month', 'category').annotate(
+        total=Sum('amount'), count=Count('id'), min_amount=Min('amount'), max_amount=Max('amount')
+    ).order_by()
+    BillMonthlyRollup.objects.bulk_create(BillMonthlyRollup(**group) for group in groups)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rachunki', '0002_alter_bill_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('category', models.CharField(max_length=100)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('min_amount', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['category', 'year', 'month'], name='bill_category_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='billmonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'category'), name='bill_rollup_period_category_uniq'),
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ] + [migrations.RunSQL(sql, reverse_sql) for sql, reverse_sql in TRIGGERS]
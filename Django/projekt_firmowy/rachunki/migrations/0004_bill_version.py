@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# Trigger SQLite podbijający wersję kolekcji 'bills' (bbb.CollectionVersion)
+BUMP = ("UPDATE bbb_collectionversion SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+        "WHERE name = 'bills';")
+
+TRIGGERS = [
+    (f"CREATE TRIGGER rachunki_bill_version_{event.lower()} AFTER {event} ON rachunki_bill BEGIN {BUMP} END",
+     f"DROP TRIGGER IF EXISTS rachunki_bill_version_{event.lower()}")
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bbb', '0004_collection_version'),
+        ('rachunki', '0003_bill_rollup'),
+    ]
+
+    operations = [migrations.RunSQL(sql, reverse_sql) for sql, reverse_sql in TRIGGERS]
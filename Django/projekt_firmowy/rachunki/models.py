@@ -9,6 +9,29 @@ class Bill(models.Model):
     category = models.CharField(max_length=100)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [models.Index(fields=['category', 'year', 'month'], name='bill_category_period_idx')]
+
     def __str__(self):
         return f"{self.category} - {self.month}/{self.year}"
-    
\ No newline at end of file
+
+
+class BillMonthlyRollup(models.Model):
+    # Sumy rachunków per (rok, miesiąc, kategoria).
+    # Aktualizowane przez triggery SQLite na rachunki_bill (migracja 0003),
+    # więc obejmują API, panel admina, bulk_create i QuerySet.update().
+    year = models.IntegerField()
+    month = models.IntegerField()
+    category = models.CharField(max_length=100)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'category'], name='bill_rollup_period_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} - {self.month}/{self.year}: {self.total}"
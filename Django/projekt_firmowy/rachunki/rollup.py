@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .models import Bill, BillMonthlyRollup
+
+
+def _bill_groups():
+    return Bill.objects.values('year', 'month', 'category').annotate(
+        total=Sum('amount'), count=Count('id'), min_amount=Min('amount'), max_amount=Max('amount')
+    ).order_by()
+
+
+@transaction.atomic
+def rebuild_rollup():
+    """Przelicza całą tabelę BillMonthlyRollup z tabeli rachunków."""
+    BillMonthlyRollup.objects.all().delete()
+    BillMonthlyRollup.objects.bulk_create(BillMonthlyRollup(**group) for group in _bill_groups())
+
+
+def check_rollup():
+    """Zwraca grupy (rok, miesiąc, kategoria), w których rollup różni się od GROUP BY na rachunkach."""
+    fields = ('total', 'count', 'min_amount', 'max_amount')
+    expected = {(g['year'], g['month'], g['category']): tuple(g[f] for f in fields) for g in _bill_groups()}
+    stored = {
+        (r['year'], r['month'], r['category']): tuple(r[f] for f in fields)
+        for r in BillMonthlyRollup.objects.values('year', 'month', 'category', *fields)
+    }
+    return [
+        {'key': key, 'expected': expected.get(key), 'stored': stored.get(key)}
+        for key in sorted(expected.keys() | stored.keys())
+        if expected.get(key) != stored.get(key)
+    ]
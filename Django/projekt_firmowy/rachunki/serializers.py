@@ -1,7 +1,16 @@
 from rest_framework import serializers
-from .models import Bill
+from .models import Bill, BillMonthlyRollup
 
 class BillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bill
         fields = '__all__'
+
+class BillSummarySerializer(serializers.ModelSerializer):
+    total = serializers.FloatField()
+    min_amount = serializers.FloatField()
+    max_amount = serializers.FloatField()
+
+    class Meta:
+        model = BillMonthlyRollup
+        fields = ['category', 'year', 'month', 'total', 'count', 'min_amount', 'max_amount']
@@ -1,3 +1,257 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count, Max, Min, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from bbb.tokens import RoleClaimsTokenObtainPairSerializer
+from . import importer
+from .models import Bill, BillMonthlyRollup
+from .views import BillViewSet
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('adam', password='password')
+        Bill.objects.bulk_create(
+            Bill(year=2025 + i % 2, month=i % 12 + 1, category=f'Kategoria {i % 4}', amount=100 + i)
+            for i in range(48)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleClaimsTokenObtainPairSerializer.get_token(self.user).access_token}')
+
+    def assertWithinBudget(self, response, budget):
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertLessEqual(int(response['X-Query-Count']), budget)
+
+    def test_bill_list(self):
+        response = self.client.get('/api/bills/')
+        self.assertWithinBudget(response, BillViewSet.query_budgets['list'])
+        self.assertEqual(len(response.json()), 48)
+
+    def test_bill_retrieve(self):
+        response = self.client.get(f'/api/bills/{Bill.objects.first().id}/')
+        self.assertWithinBudget(response, BillViewSet.query_budgets['retrieve'])
+
+    def test_bill_summary(self):
+        response = self.client.get('/api/bills/summary/')
+        self.assertWithinBudget(response, BillViewSet.query_budgets['summary'])
+        groups = {}
+        for i in range(48):
+            groups.setdefault((f'Kategoria {i % 4}', 2025 + i % 2, i % 12 + 1), []).append(100 + i)
+        self.assertEqual(response.json(), [
+            {'category': category, 'year': year, 'month': month, 'total': sum(amounts), 'count': len(amounts),
+             'min_amount': min(amounts), 'max_amount': max(amounts)}
+            for (category, year, month), amounts in sorted(groups.items())
+        ])
+
+    def test_bill_list_not_modified(self):
+        etag = self.client.get('/api/bills/')['ETag']
+        response = self.client.get('/api/bills/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(int(response['X-Query-Count']), 1)
+        Bill.objects.filter(month=1).update(amount=1)
+        self.assertEqual(self.client.get('/api/bills/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bill_list_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/bills/', {'fields': 'id,amount'})
+        self.assertEqual(set(response.json()[0]), {'id', 'amount'})
+        bill_query = next(q['sql'] for q in queries if 'FROM "rachunki_bill"' in q['sql'])
+        self.assertNotIn('"category"', bill_query)
+
+
+class BillRollupTriggerTests(TestCase):
+    """Triggery z migracji 0003 - BillMonthlyRollup po każdym zapisie równy GROUP BY na Bill."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Bill.objects.bulk_create(
+            Bill(year=2025, month=i % 2 + 1, category=f'Kategoria {i % 3}', amount=10 + i * 7 % 20)
+            for i in range(24)
+        )
+
+    def assertRollupMatches(self):
+        expected = Bill.objects.values('year', 'month', 'category').annotate(
+            total=Sum('amount'), count=Count('id'), min_amount=Min('amount'), max_amount=Max('amount')
+        ).order_by('year', 'month', 'category')
+        stored = BillMonthlyRollup.objects.values(
+            'year', 'month', 'category', 'total', 'count', 'min_amount', 'max_amount'
+        ).order_by('year', 'month', 'category')
+        self.assertEqual(list(stored), list(expected))
+
+    def test_insert(self):
+        self.assertRollupMatches()
+        Bill.objects.create(year=2025, month=1, category='Kategoria 0', amount=1)
+        Bill.objects.create(year=2026, month=3, category='Nowa', amount=5)
+        self.assertRollupMatches()
+
+    def test_update_amount_and_period(self):
+        group = Bill.objects.filter(year=2025, month=1, category='Kategoria 0')
+        group.filter(amount=group.aggregate(Max('amount'))['amount__max']).update(amount=0)
+        self.assertRollupMatches()
+        bill = group.order_by('amount').first()
+        bill.month, bill.category = 12, 'Kategoria 2'
+        bill.save()
+        self.assertRollupMatches()
+
+    def test_delete_current_min_and_max(self):
+        group = Bill.objects.filter(year=2025, month=2, category='Kategoria 1')
+        group.order_by('-amount', 'id').first().delete()
+        self.assertRollupMatches()
+        group.order_by('amount', 'id').first().delete()
+        self.assertRollupMatches()
+        group.delete()
+        self.assertFalse(BillMonthlyRollup.objects.filter(year=2025, month=2, category='Kategoria 1').exists())
+        self.assertRollupMatches()
+
+
+class BillAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('adam', password='password')
+        Bill.objects.bulk_create(
+            Bill(year=2024 + i % 3, month=i % 12 + 1, category=f'Kategoria {i % 2}', amount=10 + i * 7 % 50)
+            for i in range(144)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleClaimsTokenObtainPairSerializer.get_token(self.user).access_token}')
+
+    def analytics(self, **params):
+        response = self.client.get('/api/bills/analytics/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_matches_plain_computation(self):
+        data = self.analytics(start='2025-01', end='2026-12', window=3, percentiles='0,50,90,100').json()
+        bills = list(Bill.objects.values_list('category', 'year', 'month', 'amount'))
+        monthly = {}
+        for category, year, month, amount in bills:
+            monthly[category, year * 12 + month - 1] = monthly.get((category, year * 12 + month - 1), 0) + float(amount)
+        self.assertEqual([c['category'] for c in data['categories']], ['Kategoria 0', 'Kategoria 1'])
+        for row in data['categories']:
+            amounts = [float(a) for c, y, m, a in bills if c == row['category'] and 2025 <= y <= 2026]
+            self.assertEqual(row['count'], len(amounts))
+            self.assertEqual(list(row['percentiles'].values()),
+                             [round(float(np.percentile(amounts, q)), 2) for q in (0, 50, 90, 100)])
+            for month in row['months']:
+                key = int(month['month'][:4]) * 12 + int(month['month'][5:]) - 1
+                total = monthly.get((row['category'], key), 0)
+                self.assertAlmostEqual(month['total'], total, places=2)
+                self.assertAlmostEqual(month['rolling_mean'],
+                                       sum(monthly.get((row['category'], key - i), 0) for i in range(3)) / 3, places=2)
+                previous = monthly.get((row['category'], key - 12))
+                self.assertEqual(month['yoy_delta'], None if previous is None else round(total - previous, 2))
+
+    def test_cached_per_collection_version(self):
+        response = self.analytics()
+        self.assertEqual((response.json()['start'], response.json()['end']), ('2024-01', '2026-12'))
+        self.assertEqual(int(self.analytics()['X-Query-Count']), 1)
+        Bill.objects.create(year=2030, month=5, category='Nowa', amount=5)
+        response = self.analytics()
+        self.assertEqual(int(response['X-Query-Count']), 3)
+        self.assertEqual(response.json()['categories'][-1]['category'], 'Nowa')
+        self.assertEqual(self.client.get('/api/bills/analytics/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_invalid_params(self):
+        for params in ({'start': '2025-13'}, {'window': '0'}, {'percentiles': '50,x'}, {'start': '2026-01', 'end': '2025-01'}):
+            self.assertEqual(self.client.get('/api/bills/analytics/', params).status_code, 400, params)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class BillImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='password')
+        Group.objects.create(name='Managerowie').user_set.add(cls.manager)
+        cls.employee = User.objects.create_user('adam', password='password')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleClaimsTokenObtainPairSerializer.get_token(user).access_token}')
+        return client
+
+    def upload(self, name, content, user=None):
+        return self.client_for(user or self.manager).post(
+            '/api/bills/import/', {'file': SimpleUploadedFile(name, content.encode())}, format='multipart')
+
+    def test_csv_in_batches_with_rejected_rows(self):
+        rows = ''.join(f'Prąd,{i}.50,2024-{i % 12 + 1:02d}-01\n' for i in range(7))
+        content = ('\ufeffcategory,amount,date\n' + rows + 'Woda,abc,2024-01-01\n"Biuro, papier",1.234,2024-01-01\n'
+                   'Gaz,5,2024-02-30\n,5,2024-01-01\n')
+        with mock.patch.object(importer, 'IMPORT_BATCH', 3), CaptureQueriesContext(connection) as queries:
+            response = self.upload('rachunki.csv', content)
+        self.assertEqual(response.status_code, 200, response.content)
+        report = response.json()
+        self.assertEqual((report['imported'], report['rejected']), (7, 4))
+        self.assertEqual([e['line'] for e in report['errors']], [9, 10, 11, 12])
+        self.assertEqual(sum(1 for q in queries if 'INSERT INTO rachunki_bill' in q['sql']), 3)
+        self.assertEqual(Bill.objects.filter(category='Prąd').count(), 7)
+        self.assertEqual(BillMonthlyRollup.objects.get(category='Prąd', year=2024, month=1).count, 1)
+
+    def test_ndjson(self):
+        content = '{"category": "Prąd", "amount": 10, "date": "2027-05-01"}\nnot json\n\n[1]\n'
+        report = self.upload('rachunki.ndjson', content).json()
+        self.assertEqual((report['imported'], report['rejected']), (1, 2))
+        self.assertEqual(Bill.objects.get().year, 2027)
+
+    def test_rejected_requests(self):
+        self.assertEqual(self.upload('rachunki.csv', 'category,amount,date\n', self.employee).status_code, 403)
+        self.assertEqual(self.upload('rachunki.txt', 'x').status_code, 400)
+        self.assertEqual(self.upload('rachunki.csv', 'category,amount\nPrąd,1\n').status_code, 400)
+        self.assertFalse(Bill.objects.exists())
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class BillExportTests(TestCase):
+    """/api/bills/export/ - CSV/NDJSON z kursora, zakres miesięcy i gzip w trakcie wysyłania."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Bill.objects.bulk_create(Bill(year=2025 + i // 12, month=i % 12 + 1, category='Prąd', amount=f'{i}.50')
+                                 for i in range(24))
+        cls.user = User.objects.create_user('adam', password='password')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RoleClaimsTokenObtainPairSerializer.get_token(self.user).access_token}')
+
+    def export(self, headers=None, **params):
+        response = self.client.get('/api/bills/export/', params, **(headers or {}))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content), response
+
+    def test_csv_month_range(self):
+        content, _ = self.export(start='2025-11', end='2026-02')
+        rows = list(csv.reader(content.decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'year', 'month', 'category', 'amount'])
+        self.assertEqual([row[1:] for row in rows[1:]], [['2025', '11', 'Prąd', '10.50'], ['2025', '12', 'Prąd', '11.50'],
+                                                         ['2026', '1', 'Prąd', '12.50'], ['2026', '2', 'Prąd', '13.50']])
+
+    def test_ndjson_gzip(self):
+        content, response = self.export(headers={'HTTP_ACCEPT_ENCODING': 'gzip'}, output='ndjson', start='2026-12')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        item = json.loads(gzip.decompress(content))
+        self.assertEqual({k: v for k, v in item.items() if k != 'id'},
+                         {'year': 2026, 'month': 12, 'category': 'Prąd', 'amount': '23.50'})
+
+    def test_invalid_params(self):
+        for params in ({'output': 'xml'}, {'start': '2025-13'}, {'end': '2025'}):
+            self.assertEqual(self.client.get('/api/bills/export/', params).status_code, 400, params)
+        self.assertEqual(APIClient().get('/api/bills/export/').status_code, 401)
 
-# Create your tests here.
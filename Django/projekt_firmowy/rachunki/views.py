@@ -1,7 +1,76 @@
-from rest_framework import viewsets
-from .models import Bill
-from .serializers import BillSerializer
+from django.db.models import F
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from bbb.conditional import collection_condition, collection_stamp
+from bbb.export import EXPORT_CHUNK_ROWS, export_format, export_response
+from bbb.permissions import is_manager
+from projekt_firmowy.query_budget import extend_query_budget
+from bbb.fields import SparseFieldsMixin
+from bbb.streaming import StreamingListMixin
+from .analytics import analytics_params, analyze, bill_frame, parse_month
+from .importer import import_bills, import_format
+from .models import Bill, BillMonthlyRollup
+from .serializers import BillSerializer, BillSummarySerializer
 
-class BillViewSet(viewsets.ReadOnlyModelViewSet):
+BILL_EXPORT_COLUMNS = ['id', 'year', 'month', 'category', 'amount']
+
+
+class BillViewSet(SparseFieldsMixin, StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
+    # list/summary/analytics: +1 zapytanie o wersję kolekcji (ETag);
+    # analytics czyta rachunki (2 zapytania) tylko po zmianie wersji kolekcji;
+    # import_file: limit na paczkę IMPORT_BATCH wierszy (executemany + BEGIN albo SAVEPOINT/RELEASE),
+    # podnoszony o kolejne paczki; export: jedno zapytanie czytane dopiero podczas wysyłania odpowiedzi
+    query_budgets = {'list': 2, 'retrieve': 1, 'summary': 2, 'analytics': 3, 'import_file': 3, 'export': 0}
+
+    @collection_condition('bills')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, url_path='summary')
+    @collection_condition('bills')
+    def summary(self, request):
+        # Gotowe sumy per kategoria/rok/miesiąc z tabeli rollup (utrzymywanej przez triggery),
+        # więc rozmiar odpowiedzi zależy od liczby kategorii i miesięcy, nie rachunków
+        rows = BillMonthlyRollup.objects.order_by('category', 'year', 'month')
+        return Response(BillSummarySerializer(rows, many=True).data)
+
+    @action(detail=False, url_path='analytics')
+    @collection_condition('bills')
+    def analytics(self, request):
+        # ?start=2025-01&end=2026-12&window=3&percentiles=50,90,99 - liczone w NumPy na rachunkach
+        # wczytanych raz na wersję kolekcji (rachunki/analytics.py)
+        params = analytics_params(request.query_params)
+        return Response(analyze(bill_frame(collection_stamp(request, 'bills')), **params))
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser],
+            permission_classes=[permissions.IsAuthenticated])
+    def import_file(self, request):
+        # Plik .csv / .ndjson w polu `file` (multipart; duży upload Django trzyma na dysku),
+        # wiersze zapisywane paczkami - rachunki/importer.py
+        if not is_manager(request.user):
+            raise PermissionDenied("Tylko członkowie grupy 'Managerowie' mogą importować rachunki.")
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'Brak pliku.'})
+        report = import_bills(upload, import_format(upload.name, upload.content_type or ''))
+        extend_query_budget(request, (report['batches'] - 1) * self.query_budgets['import_file'])
+        return Response(report)
+
+    @action(detail=False, url_path='export', permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        # ?output=csv|ndjson&start=2025-01&end=2026-12 (miesiące włącznie) - bbb/export.py
+        fmt = export_format(request)
+        rows = Bill.objects.order_by('id')
+        if request.query_params.get('start') or request.query_params.get('end'):
+            rows = rows.alias(period=F('year') * 12 + F('month') - 1)
+        if request.query_params.get('start'):
+            rows = rows.filter(period__gte=parse_month(request.query_params['start'], 'start'))
+        if request.query_params.get('end'):
+            rows = rows.filter(period__lte=parse_month(request.query_params['end'], 'end'))
+        rows = rows.values_list(*BILL_EXPORT_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_ROWS)
+        return export_response(request, rows, BILL_EXPORT_COLUMNS, fmt, 'bills')
@@ -0,0 +1,33 @@
+"""Import bills from a CSV or NDJSON file (columns: category, amount, date, optional description).
+
+    python bill_import.py bills.csv
+    python bill_import.py bills.txt --format ndjson
+"""
+import argparse
+import asyncio
+import sys
+
+from fastapi import HTTPException
+
+from main import AsyncSessionLocal, import_bills, import_format
+
+
+async def run(path, fmt):
+    async with AsyncSessionLocal() as session:
+        with open(path, "rb") as stream:
+            report = await import_bills(session, stream, fmt)
+    for item in report["errors"]:
+        print(f"line {item['line']}: {item['error']}")
+    print(f"--- Imported: {report['imported']}, rejected: {report['rejected']} ---")
+    return 1 if report["rejected"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "ndjson"))
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(run(args.path, args.format or import_format(args.path))))
+    except (HTTPException, OSError) as error:
+        sys.exit(getattr(error, "detail", None) or str(error))
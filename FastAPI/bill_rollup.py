@@ -0,0 +1,28 @@
+"""Rebuild or verify the bill_monthly_rollup table.
+
+    python bill_rollup.py rebuild
+    python bill_rollup.py check
+"""
+import asyncio
+import sys
+
+from main import AsyncSessionLocal, check_bill_rollup, rebuild_bill_rollup
+
+
+async def run(command):
+    async with AsyncSessionLocal() as session:
+        if command == "rebuild":
+            await rebuild_bill_rollup(session)
+            print("--- Bill rollup rebuilt ---")
+            return 0
+        mismatches = await check_bill_rollup(session)
+        for item in mismatches:
+            print(f"{item['key']}: expected={item['expected']} stored={item['stored']}")
+        print(f"--- {len(mismatches)} inconsistent group(s) ---")
+        return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("rebuild", "check"):
+        sys.exit(__doc__)
+    sys.exit(asyncio.run(run(sys.argv[1])))
@@ -5,17 +5,39 @@ export default function TasksBoard(){
   const [loading,setLoading]=useState(true)
 
   useEffect(()=>{
+    let socket = null
     const load = async ()=>{
       try{
         const token = localStorage.getItem('token')
-        const res = await fetch('http://127.0.0.1:8001/api/tasks/', { headers: { Authorization: `Bearer ${token}` } })
-        if(!res.ok){ setTasks([]); setLoading(false); return }
-        const data = await res.json()
-        setTasks(data)
+        // API zwraca strony {next_cursor, results} - pobieramy kolejne aż do końca
+        let items = [], cursor = null
+        do {
+          const url = 'http://127.0.0.1:8001/api/tasks/' + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : '')
+          const res = await fetch(url, { headers: { Authorization: `Bearer ${token}` } })
+          if(!res.ok){ setTasks([]); setLoading(false); return }
+          const page = await res.json()
+          items = items.concat(page.results)
+          cursor = page.next_cursor
+        } while (cursor)
+        setTasks(items)
       }catch(e){ setTasks([]) }
       setLoading(false)
     }
-    load()
+    // Zmiany zadań na żywo: pojedyncze zadania z WebSocket zamiast ponownego pobierania listy
+    const subscribe = ()=>{
+      const token = localStorage.getItem('token')
+      socket = new WebSocket(`ws://127.0.0.1:8001/api/tasks/ws/?token=${encodeURIComponent(token)}`)
+      socket.onmessage = (msg)=>{
+        const event = JSON.parse(msg.data)
+        if(event.type === 'resync'){ load().then(subscribe); return }
+        if(!event.task) return
+        setTasks(prev => prev.some(t => t.id === event.task.id)
+          ? prev.map(t => t.id === event.task.id ? event.task : t)
+          : prev.concat(event.task))
+      }
+    }
+    load().then(subscribe)
+    return ()=>{ if(socket){ socket.onmessage = null; socket.close() } }
   },[])
 
   if(loading) return <div>Ładowanie...</div>
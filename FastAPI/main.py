@@ -1,25 +1,49 @@
+import os
+import csv
+import json
+import codecs
+import io
+import zlib
+import time
+import asyncio
+import threading
+import base64
+import hashlib
+import html
+import re
+import numpy as np
+import orjson
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, UploadFile, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship, selectinload
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, Table, Float, select
+from sqlalchemy.orm import Session, sessionmaker, declarative_base, relationship, selectinload, load_only
+from sqlalchemy.orm.attributes import PASSIVE_NO_INITIALIZE, get_history
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Boolean, ForeignKey, Table, Float, Index, DDL, event, text, select, insert, update, func, extract, delete, or_, and_, case, tuple_
 from sqladmin import Admin, ModelView
 from sqladmin.authentication import AuthenticationBackend
 from starlette.requests import Request
 from starlette.middleware.sessions import SessionMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import date, datetime, timedelta
+from typing import Dict, List, Literal, Optional, Tuple, get_args
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from email.utils import format_datetime
 from jose import JWTError, jwt
+from markupsafe import Markup
 from passlib.context import CryptContext
 
 # --- CONFIGURATION ---
-DATABASE_URL = "sqlite+aiosqlite:///./projekt_firmowy.db"
+DATABASE_URL = os.environ.get("FASTAPI_DATABASE_URL", "sqlite+aiosqlite:///./projekt_firmowy.db")
 SECRET_KEY = "twoj-sekretny-klucz-zmien-go"
 ALGORITHM = "HS256"
 
@@ -42,7 +66,9 @@ user_roles = Table(
 task_assignments = Table(
     'task_assignments', Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('task_id', Integer, ForeignKey('tasks.id'), primary_key=True)
+    Column('task_id', Integer, ForeignKey('tasks.id'), primary_key=True),
+    # Klucz główny (user_id, task_id) obsługuje "zadania usera"; ten indeks - "userzy zadania"
+    Index("ix_task_assignments_task_user", "task_id", "user_id"),
 )
 
 class Role(Base):
@@ -59,8 +85,9 @@ class User(Base):
     first_name = Column(String)
     last_name = Column(String)
     hashed_password = Column(String)
-    roles = relationship("Role", secondary=user_roles, backref="users", lazy="selectin")
-    tasks = relationship("Task", secondary=task_assignments, back_populates="assigned_to", lazy="selectin")
+    # raise_on_sql: relacje ładuje tylko jawny profil endpointu (LOADING PROFILES), nigdy "przy okazji"
+    roles = relationship("Role", secondary=user_roles, backref="users", lazy="raise_on_sql")
+    tasks = relationship("Task", secondary=task_assignments, back_populates="assigned_to", lazy="raise_on_sql")
     
     def has_role(self, role_name: str) -> bool:
         return any(r.name == role_name for r in self.roles)
@@ -68,22 +95,54 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    # Filtry listy zadań (TASK FILTERS)
+    __table_args__ = (Index("ix_tasks_status", "status"), Index("ix_tasks_due_date", "due_date"))
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     description = Column(Text)
     due_date = Column(Date, nullable=True)
     status = Column(String, default="not_started")
-    assigned_to = relationship("User", secondary=task_assignments, back_populates="tasks", lazy="selectin")
+    assigned_to = relationship("User", secondary=task_assignments, back_populates="tasks", lazy="raise_on_sql")
     def __str__(self): return self.title
 
 class Bill(Base):
     __tablename__ = "bills"
+    __table_args__ = (Index("ix_bills_category_date", "category", "date"),)
     id = Column(Integer, primary_key=True, index=True)
     category = Column(String)
     amount = Column(Float)
     date = Column(Date)
     description = Column(String, nullable=True)
 
+class BillMonthlyRollup(Base):
+    """Sumy rachunków per (rok, miesiąc, kategoria), utrzymywane przez triggery na tabeli bills."""
+    __tablename__ = "bill_monthly_rollup"
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    category = Column(String, primary_key=True)
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    min_amount = Column(Float)
+    max_amount = Column(Float)
+
+class CollectionVersion(Base):
+    """Licznik zmian kolekcji API (tasks, users, bills) - źródło ETag/Last-Modified, podbijany triggerami."""
+    __tablename__ = "collection_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+class TaskChange(Base):
+    """Dziennik zmian zadań dla delta sync: ostatnia wersja każdego zadania i tombstone po usunięciu.
+
+    Bez FK do tasks - wpis przeżywa usunięte zadanie. Utrzymywany triggerami (TASK CHANGE LOG TRIGGERS).
+    """
+    __tablename__ = "task_changes"
+    __table_args__ = (Index("ix_task_changes_version", "version", "task_id"),)
+    task_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+
 class BusinessDefinition(Base):
     __tablename__ = "definitions"
     id = Column(Integer, primary_key=True, index=True)
@@ -97,15 +156,283 @@ class Employee(Base):
     last_name = Column(String)
     email = Column(String)
 
+# --- BILL ROLLUP TRIGGERS ---
+# Triggery działają na poziomie SQLite, więc obejmują API, sqladmin i masowe importy.
+# Przy usunięciu/zmianie min/max są przeliczane tylko dla jednej grupy (indeks category+date).
+def _rollup_key(row):
+    # %% - DDL() formatuje treść operatorem %
+    return f"CAST(strftime('%%Y', {row}.date) AS INTEGER), CAST(strftime('%%m', {row}.date) AS INTEGER), {row}.category"
+
+def _rollup_add(row):
+    return f"""
+    INSERT INTO bill_monthly_rollup (year, month, category, total, count, min_amount, max_amount)
+    VALUES ({_rollup_key(row)}, {row}.amount, 1, {row}.amount, {row}.amount)
+    ON CONFLICT (year, month, category) DO UPDATE SET
+        total = total + excluded.total,
+        count = count + 1,
+        min_amount = MIN(min_amount, excluded.min_amount),
+        max_amount = MAX(max_amount, excluded.max_amount);"""
+
+def _rollup_remove(row):
+    group = (f"category = {row}.category AND date >= date({row}.date, 'start of month') "
+             f"AND date < date({row}.date, 'start of month', '+1 month')")
+    key = f"(year, month, category) = ({_rollup_key(row)})"
+    return f"""
+    UPDATE bill_monthly_rollup SET
+        total = total - {row}.amount,
+        count = count - 1,
+        min_amount = CASE WHEN {row}.amount > min_amount THEN min_amount
+                          ELSE (SELECT MIN(amount) FROM bills WHERE {group}) END,
+        max_amount = CASE WHEN {row}.amount < max_amount THEN max_amount
+                          ELSE (SELECT MAX(amount) FROM bills WHERE {group}) END
+    WHERE {key};
+    DELETE FROM bill_monthly_rollup WHERE {key} AND count <= 0;"""
+
+for _trigger in (
+    f"CREATE TRIGGER bills_rollup_insert AFTER INSERT ON bills BEGIN {_rollup_add('NEW')} END",
+    f"CREATE TRIGGER bills_rollup_delete AFTER DELETE ON bills BEGIN {_rollup_remove('OLD')} END",
+    f"CREATE TRIGGER bills_rollup_update AFTER UPDATE OF category, amount, date ON bills "
+    f"BEGIN {_rollup_remove('OLD')} {_rollup_add('NEW')} END",
+):
+    event.listen(BillMonthlyRollup.__table__, "after_create", DDL(_trigger))
+
+async def rebuild_bill_rollup(db: AsyncSession):
+    """Przelicza całą tabelę bill_monthly_rollup z tabeli bills."""
+    year = extract("year", Bill.date)
+    month = extract("month", Bill.date)
+    await db.execute(delete(BillMonthlyRollup))
+    await db.execute(BillMonthlyRollup.__table__.insert().from_select(
+        ["year", "month", "category", "total", "count", "min_amount", "max_amount"],
+        select(year, month, Bill.category, func.sum(Bill.amount), func.count(Bill.id),
+               func.min(Bill.amount), func.max(Bill.amount)).group_by(year, month, Bill.category),
+    ))
+    await db.commit()
+
+async def check_bill_rollup(db: AsyncSession):
+    """Zwraca listę grup, w których rollup różni się od GROUP BY na tabeli bills."""
+    year = extract("year", Bill.date)
+    month = extract("month", Bill.date)
+    expected = await db.execute(
+        select(year, month, Bill.category, func.sum(Bill.amount), func.count(Bill.id),
+               func.min(Bill.amount), func.max(Bill.amount)).group_by(year, month, Bill.category)
+    )
+    expected = {tuple(row[:3]): tuple(row[3:]) for row in expected}
+    stored = await db.execute(select(
+        BillMonthlyRollup.year, BillMonthlyRollup.month, BillMonthlyRollup.category, BillMonthlyRollup.total,
+        BillMonthlyRollup.count, BillMonthlyRollup.min_amount, BillMonthlyRollup.max_amount,
+    ))
+    stored = {tuple(row[:3]): tuple(row[3:]) for row in stored}
+    return [
+        {"key": key, "expected": expected.get(key), "stored": stored.get(key)}
+        for key in sorted(expected.keys() | stored.keys())
+        if _rollup_differs(expected.get(key), stored.get(key))
+    ]
+
+def _rollup_differs(expected, stored):
+    if expected is None or stored is None:
+        return True
+    (total, count, low, high), (s_total, s_count, s_low, s_high) = expected, stored
+    return count != s_count or any(abs(a - b) > 0.005 for a, b in ((total, s_total), (low, s_low), (high, s_high)))
+
+# --- COLLECTION VERSION TRIGGERS ---
+# Każdy zapis widoczny w liście podbija wersję kolekcji - także z sqladmin i masowych importów.
+# TaskRead zawiera przypisanych userów (z rolami), więc zmiany users/user_roles/roles unieważniają też 'tasks'.
+COLLECTIONS = ("tasks", "users", "bills")
+
+def _bump_versions(*names):
+    names = ", ".join(f"'{name}'" for name in names)
+    return (f"UPDATE collection_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE name IN ({names});")
+
+_VERSION_TRIGGERS = [
+    ("tasks", ("INSERT", "UPDATE", "DELETE"), ("tasks",)),
+    ("task_assignments", ("INSERT", "DELETE"), ("tasks",)),
+    ("users", ("INSERT", "UPDATE OF username, first_name, last_name", "DELETE"), ("users", "tasks")),
+    ("user_roles", ("INSERT", "DELETE"), ("users", "tasks")),
+    ("roles", ("UPDATE OF name", "DELETE"), ("users", "tasks")),
+    ("bills", ("INSERT", "UPDATE", "DELETE"), ("bills",)),
+]
+
+# Na metadata (po utworzeniu wszystkich tabel) i idempotentnie - create_all działa przy każdym starcie
+event.listen(Base.metadata, "after_create", DDL(
+    "INSERT OR IGNORE INTO collection_versions (name, version, updated_at) VALUES "
+    + ", ".join(f"('{name}', 0, CURRENT_TIMESTAMP)" for name in COLLECTIONS)
+))
+for _table, _events, _names in _VERSION_TRIGGERS:
+    for _event in _events:
+        event.listen(Base.metadata, "after_create", DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {_table}_version_{_event.split()[0].lower()} AFTER {_event} ON {_table} "
+            f"BEGIN {_bump_versions(*_names)} END"
+        ))
+
+# create_all pomija istniejące tabele razem z ich indeksami - dokładamy nowe indeksy do starych baz
+LATE_INDEXES = (*Task.__table__.indexes, *task_assignments.indexes, *Bill.__table__.indexes)
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_late_indexes(target, connection, **kw):
+    for index in LATE_INDEXES:
+        index.create(connection, checkfirst=True)
+
+# --- TASK CHANGE LOG TRIGGERS ---
+# Każda zmiana zadania (także przypisań, userów i ról widocznych w TaskRead) dostaje nową,
+# rosnącą wersję w task_changes; usunięcie zostawia tombstone (deleted = 1).
+def _touch_tasks(select_task_ids):
+    return f"""
+    INSERT INTO task_changes (task_id, version, deleted)
+    SELECT changed.task_id, (SELECT COALESCE(MAX(version), 0) + 1 FROM task_changes),
+           NOT EXISTS (SELECT 1 FROM tasks WHERE tasks.id = changed.task_id)
+    FROM ({select_task_ids}) AS changed WHERE true
+    ON CONFLICT (task_id) DO UPDATE SET version = excluded.version, deleted = excluded.deleted;"""
+
+_USER_TASKS = "SELECT task_id FROM task_assignments WHERE user_id = {user}"
+_TASK_CHANGE_TRIGGERS = [
+    ("tasks_change_insert", "AFTER INSERT ON tasks", "SELECT NEW.id AS task_id"),
+    ("tasks_change_update", "AFTER UPDATE ON tasks", "SELECT NEW.id AS task_id"),
+    ("tasks_change_delete", "AFTER DELETE ON tasks", "SELECT OLD.id AS task_id"),
+    ("task_assignments_change_insert", "AFTER INSERT ON task_assignments", "SELECT NEW.task_id AS task_id"),
+    ("task_assignments_change_delete", "AFTER DELETE ON task_assignments", "SELECT OLD.task_id AS task_id"),
+    ("users_task_change_update", "AFTER UPDATE OF username, first_name, last_name ON users",
+     _USER_TASKS.format(user="NEW.id")),
+    ("user_roles_task_change_insert", "AFTER INSERT ON user_roles", _USER_TASKS.format(user="NEW.user_id")),
+    ("user_roles_task_change_delete", "AFTER DELETE ON user_roles", _USER_TASKS.format(user="OLD.user_id")),
+    ("roles_task_change_update", "AFTER UPDATE OF name ON roles",
+     "SELECT task_id FROM task_assignments WHERE user_id IN (SELECT user_id FROM user_roles WHERE role_id = NEW.id)"),
+]
+
+# Istniejące zadania przy pierwszym starcie: wersja = id, więc sync bez `since` zwraca wszystkie
+event.listen(Base.metadata, "after_create", DDL(
+    "INSERT INTO task_changes (task_id, version, deleted) SELECT id, id, 0 FROM tasks "
+    "WHERE NOT EXISTS (SELECT 1 FROM task_changes)"
+))
+for _name, _event, _select in _TASK_CHANGE_TRIGGERS:
+    event.listen(Base.metadata, "after_create", DDL(
+        f"CREATE TRIGGER IF NOT EXISTS {_name} {_event} BEGIN {_touch_tasks(_select)} END"
+    ))
+
+# --- FULL-TEXT SEARCH (FTS5) ---
+# Indeksy FTS5 (external content) dla zadań i słownika, synchronizowane triggerami; /api/search/.
+# (typ wyniku, tabela, kolumny) - pierwsza kolumna to tytuł/termin, druga to treść
+SEARCH_SOURCES = [
+    ("task", "tasks", ("title", "description")),
+    ("definition", "definitions", ("term", "definition")),
+]
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_TERMS = 8
+# bm25 potrzebuje statystyk każdego trafienia - dla słowa z każdego dokumentu to setki ms.
+# Ranking obejmuje więc tylko SEARCH_CANDIDATES najnowszych (najwyższe id) trafień z tabeli;
+# gdy któraś tabela ma ich więcej, odpowiedź ma truncated = true (starsze trafienia pominięte).
+SEARCH_CANDIDATES = 2000
+
+def _fts_triggers(table, columns):
+    fts, cols = f"{table}_fts", ", ".join(columns)
+    delete_old = (f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES "
+                  f"('delete', OLD.id, {', '.join(f'OLD.{c}' for c in columns)});")
+    insert_new = f"INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.id, {', '.join(f'NEW.{c}' for c in columns)});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN {delete_old} {insert_new} END",
+    ]
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_indexes(target, connection, **kw):
+    for _, table, columns in SEARCH_SOURCES:
+        fts = f"{table}_fts"
+        # Wypełnienie (rebuild) tylko przy tworzeniu indeksu - potem dbają o niego triggery
+        if connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).first() is None:
+            # prefix: indeksy prefiksów 2-4 znaków - zapytania "fakt*" bez przeglądania całego słownika
+            connection.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')")
+            connection.exec_driver_sql(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+            connection.exec_driver_sql(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        for statement in _fts_triggers(table, columns):
+            connection.exec_driver_sql(statement)
+
+def match_expression(query: str) -> str:
+    """'fakt klie' -> '"fakt"* "klie"*' - każde słowo jako prefiks, wszystkie wymagane."""
+    terms = re.findall(r"\w+", query)[:MAX_QUERY_TERMS]
+    if not terms:
+        raise HTTPException(status_code=400, detail="Query must contain at least one word")
+    return " ".join(f'"{term}"*' for term in terms)
+
+def highlight(value: Optional[str]) -> str:
+    # Znaczniki \x02/\x03 z snippet()/highlight() zamieniamy na <mark> dopiero po escape'owaniu HTML
+    return html.escape(value or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+def _first_skipped(table):
+    # Najnowsze trafienie spoza SEARCH_CANDIDATES (NULL, gdy ranking obejmuje wszystkie)
+    return (f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :query "
+            f"ORDER BY rowid DESC LIMIT 1 OFFSET :candidates")
+
+SEARCH_SQL = text(
+    "SELECT hits.*, (" + " OR ".join(f"({_first_skipped(table)}) IS NOT NULL" for _, table, _ in SEARCH_SOURCES)
+    + ") AS truncated FROM (" + " UNION ALL ".join(f"""
+    SELECT * FROM (
+        SELECT '{kind}' AS type, rowid AS id,
+               highlight({table}_fts, 0, char(2), char(3)) AS title,
+               snippet({table}_fts, 1, char(2), char(3), '…', 16) AS snippet,
+               rank AS score
+        FROM {table}_fts
+        WHERE {table}_fts MATCH :query AND rowid > COALESCE(({_first_skipped(table)}), 0)
+        ORDER BY rank LIMIT :limit)""" for kind, table, _ in SEARCH_SOURCES) + ") AS hits ORDER BY score LIMIT :limit")
+
 # --- AUTH UTILS ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# --- PASSWORD HASHING ---
+# bcrypt trwa dziesiątki ms; wywołany w handlerze async blokowałby pętlę zdarzeń, czyli wszystkie
+# inne requesty. Hashujemy w osobnej puli wątków (bcrypt zwalnia GIL) o rozmiarze HASH_CONCURRENCY -
+# nadmiarowe logowania czekają w kolejce puli, a czas czekania trafia do hash_metrics.
+# FASTAPI_HASH_CONCURRENCY=0 hashuje bezpośrednio na pętli (punkt odniesienia w benchmark.login_storm).
+HASH_CONCURRENCY = int(os.environ.get("FASTAPI_HASH_CONCURRENCY", 2))
+hash_executor = ThreadPoolExecutor(max_workers=max(HASH_CONCURRENCY, 1), thread_name_prefix="bcrypt")
+
+class HashMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    def record_start(self, queued: float):
+        with self.lock:
+            self.started += 1
+            self.queue_time_total += queued
+            self.queue_time_max = max(self.queue_time_max, queued)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "concurrency": HASH_CONCURRENCY,
+                "hashes": self.started,
+                "queued_now": self.submitted - self.started,
+                "queue_ms_avg": round(self.queue_time_total / self.started * 1000, 3) if self.started else 0.0,
+                "queue_ms_max": round(self.queue_time_max * 1000, 3),
+            }
+
+hash_metrics = HashMetrics()
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def run_hash(fn, *args):
+    if HASH_CONCURRENCY == 0:
+        return fn(*args)
+    submitted = time.perf_counter()
+    with hash_metrics.lock:
+        hash_metrics.submitted += 1
+
+    def job():
+        hash_metrics.record_start(time.perf_counter() - submitted)
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(hash_executor, job)
+
+async def verify_password(plain_password, hashed_password):
+    return await run_hash(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await run_hash(pwd_context.hash, password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -113,18 +440,812 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+def role_claims(user: User) -> dict:
+    # Role podpisane w tokenie - uprawnienia sprawdzamy bez zapytań do bazy
+    return {"sub": user.username, "uid": user.id, "roles": [r.name for r in user.roles], "roles_at": time.time()}
+
+class Principal(BaseModel):
+    """Zalogowany użytkownik odtworzony z claimów tokena (bez wiersza z bazy)."""
+    id: int
+    username: str
+    roles: List[str] = []
+
+    def has_role(self, role_name: str) -> bool:
+        return role_name in self.roles
+
+def decode_principal(token: str) -> Principal:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None: raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError: raise HTTPException(status_code=401, detail="Invalid token")
-    
-    result = await db.execute(select(User).where(User.username == username).options(selectinload(User.roles)))
-    user = result.scalars().first()
+    username, user_id, roles_at = payload.get("sub"), payload.get("uid"), payload.get("roles_at")
+    if username is None or user_id is None or roles_at is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if roles_at < roles_changed_since(user_id):
+        raise HTTPException(status_code=401, detail="Roles changed, log in again")
+    return Principal(id=user_id, username=username, roles=payload.get("roles", []))
+
+async def get_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    return decode_principal(token)
+
+# --- IDENTITY CACHE ---
+# get_current_user (profil zalogowanego usera) nie pyta bazy przy każdym requeście: profile są
+# w LRU z TTL w pamięci procesu. Zapis User/Role (API, sqladmin) czyści wpisy po commicie;
+# TTL ogranicza nieaktualność po zapisach z innych procesów (CLI, kolejne workery).
+IDENTITY_CACHE_SIZE = int(os.environ.get("FASTAPI_IDENTITY_CACHE_SIZE", 1024))
+IDENTITY_CACHE_TTL = float(os.environ.get("FASTAPI_IDENTITY_CACHE_TTL", 60))
+
+class UserIdentity(BaseModel):
+    id: int
+    username: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    roles: Tuple[str, ...] = ()
+    class Config: frozen = True
+
+    def has_role(self, role_name: str) -> bool:
+        return role_name in self.roles
+
+class IdentityCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+
+    async def get(self, username: str, loader):
+        entry = self.entries.get(username)
+        if entry is not None and entry[0] > time.monotonic():
+            self.entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        generation = self.generation
+        identity = await loader(username)
+        # Jeśli w trakcie ładowania był zapis (invalidate), nie zapamiętujemy być może starej wersji
+        if identity is not None and generation == self.generation:
+            self.entries[username] = (time.monotonic() + self.ttl, identity)
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, username: Optional[str] = None):
+        self.generation += 1
+        if username is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(username, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self.entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
+
+identity_cache = IdentityCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
+
+async def load_identity(username: str) -> Optional[UserIdentity]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(User).where(User.username == username).options(selectinload(User.roles)))
+        user = result.scalars().first()
+        if user is None: return None
+        return UserIdentity(id=user.id, username=user.username, first_name=user.first_name,
+                            last_name=user.last_name, roles=tuple(r.name for r in user.roles))
+
+async def get_current_user(principal: Principal = Depends(get_principal)) -> UserIdentity:
+    # Profil zalogowanego usera (np. /api/me/) - z identity_cache, bez sesji bazy przy trafieniu
+    user = await identity_cache.get(principal.username, load_identity)
     if user is None: raise HTTPException(status_code=401, detail="User not found")
     return user
 
+# --- ROLE CLAIMS REVOCATION ---
+# Token niesie role z chwili logowania (roles_at), więc zmiana ról usera, jego usunięcie albo
+# zmiana samej roli zapisuje czas zmiany, a get_principal odrzuca tokeny wydane wcześniej.
+# Stan jest w pamięci procesu - przy kilku workerach uvicorna potrzebny byłby wspólny magazyn.
+ALL_USERS = None
+roles_changed_at: dict = {}
+
+def mark_roles_changed(user_id: Optional[int] = ALL_USERS):
+    roles_changed_at[user_id] = time.time()
+
+def roles_changed_since(user_id: int) -> float:
+    return max(roles_changed_at.get(user_id, 0.0), roles_changed_at.get(ALL_USERS, 0.0))
+
+@event.listens_for(Session, "after_flush")
+def _collect_auth_changes(session, flush_context):
+    # after_flush widzi jeszcze historię atrybutów sprzed flush; PASSIVE_NO_INITIALIZE - bez doczytywania kolekcji
+    changed = session.info.setdefault("roles_changed", set())
+    identities = session.info.setdefault("identities_changed", set())
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            if get_history(obj, "roles", PASSIVE_NO_INITIALIZE).has_changes():
+                changed.add(obj.id)
+            identities.update([obj.username, *get_history(obj, "username").deleted])
+        elif isinstance(obj, Role):
+            if get_history(obj, "name").has_changes():
+                changed.add(ALL_USERS)
+            history = get_history(obj, "users", PASSIVE_NO_INITIALIZE)
+            changed.update(u.id for u in history.added + history.deleted)
+            identities.add(ALL_USERS)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+            identities.add(obj.username)
+        elif isinstance(obj, Role):
+            changed.add(ALL_USERS)
+            identities.add(ALL_USERS)
+
+@event.listens_for(Session, "after_commit")
+def _revoke_role_claims(session):
+    # Dopiero po commicie - token wydany przed commitem i tak widział stare role
+    for user_id in session.info.pop("roles_changed", ()):
+        mark_roles_changed(user_id)
+    for username in session.info.pop("identities_changed", ()):
+        identity_cache.invalidate(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_role_changes(session):
+    session.info.pop("roles_changed", None)
+    session.info.pop("identities_changed", None)
+
+# --- LOADING PROFILES ---
+# Relacje modeli są lazy="raise_on_sql", więc endpoint ładuje tylko to, co wskaże profil:
+# kolumny i relacje potrzebne jego schematowi odpowiedzi (UserRead bez hashed_password,
+# role tylko z nazwą, bez list zadań userów). Z FASTAPI_LOADING_GUARD=1 check_loading()
+# zgłasza błąd, gdy obiekt ma załadowane pola, których schemat nie serializuje.
+USER_READ_LOAD = (
+    load_only(User.id, User.username, User.first_name, User.last_name),
+    selectinload(User.roles).load_only(Role.name),
+)
+TASK_READ_LOAD = (selectinload(Task.assigned_to).options(*USER_READ_LOAD),)
+
+LOADING_GUARD = os.environ.get("FASTAPI_LOADING_GUARD", "0") == "1"
+
+class OverfetchError(RuntimeError):
+    pass
+
+def _nested_schema(annotation):
+    # List[UserRead] -> UserRead
+    for arg in get_args(annotation) or (annotation,):
+        if isinstance(arg, type) and issubclass(arg, BaseModel):
+            return arg
+    return None
+
+def check_loading(objects, schema):
+    if not LOADING_GUARD: return
+    for obj in objects:
+        state = sa_inspect(obj)
+        mapper = state.mapper
+        loaded = set(mapper.attrs.keys()) - state.unloaded
+        primary_keys = {mapper.get_property_by_column(column).key for column in mapper.primary_key}
+        extra = loaded - set(schema.model_fields) - primary_keys
+        if extra:
+            raise OverfetchError(f"{mapper.class_.__name__}: loaded {sorted(extra)}, not serialised by {schema.__name__}")
+        for rel in mapper.relationships:
+            if rel.key in loaded:
+                check_loading(getattr(obj, rel.key), _nested_schema(schema.model_fields[rel.key].annotation))
+
+# --- SPARSE FIELDSETS ---
+# ?fields=id,title,status,assigned_to.first_name - odpowiedź tylko z tych pól (kropka = pole
+# zagnieżdżone, samo `assigned_to` = cały UserRead), a SELECT tylko z potrzebnymi kolumnami
+# (load_only) i relacjami (selectinload tylko tych, o które klient prosi).
+def parse_fields(value: Optional[str], schema) -> Optional[dict]:
+    if not value: return None
+    tree = {}
+    for path in filter(None, (part.strip() for part in value.split(","))):
+        node = tree
+        for name in path.split("."):
+            node = node.setdefault(name, {})
+    _validate_fields(tree, schema, "")
+    return tree
+
+def _validate_fields(tree: dict, schema, prefix: str):
+    unknown = sorted(prefix + name for name in set(tree) - set(schema.model_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    for name, subtree in tree.items():
+        if subtree:
+            nested = _nested_schema(schema.model_fields[name].annotation)
+            if nested is None:
+                raise HTTPException(status_code=400, detail=f"Field {prefix}{name} has no nested fields")
+            _validate_fields(subtree, nested, f"{prefix}{name}.")
+
+def _full_tree(schema) -> dict:
+    return {name: {} for name in schema.model_fields}
+
+def fields_load(model, schema, tree: dict, keep=()) -> list:
+    """Opcje ładowania dla drzewa pól: load_only(kolumny z drzewa + keep) i selectinload żądanych relacji."""
+    tree = tree or _full_tree(schema)
+    mapper = sa_inspect(model)
+    columns = [getattr(model, name) for name in (*tree, *keep) if name in mapper.column_attrs.keys()]
+    options = [load_only(*(columns or [getattr(model, mapper.primary_key[0].key)]))]
+    for rel in mapper.relationships:
+        if rel.key in tree:
+            nested = _nested_schema(schema.model_fields[rel.key].annotation)
+            options.append(selectinload(getattr(model, rel.key)).options(
+                *fields_load(rel.mapper.class_, nested, tree[rel.key])))
+    return options
+
+def dump_fields(obj, schema, tree: dict) -> dict:
+    data = {}
+    for name, subtree in (tree or _full_tree(schema)).items():
+        field = schema.model_fields[name]
+        nested = _nested_schema(field.annotation)
+        value = getattr(obj, name, field.default)
+        data[name] = [dump_fields(item, nested, subtree) for item in value] if nested else value
+    return data
+
+def sparse_response(payload, schema, tree: dict, headers: Optional[dict] = None) -> JSONResponse:
+    """Odpowiedź z części pól (poza response_model, który wymagałby kompletnych obiektów)."""
+    if isinstance(payload, dict):
+        payload = {**payload, "results": [dump_fields(row, schema, tree) for row in payload["results"]]}
+    else:
+        payload = [dump_fields(row, schema, tree) for row in payload]
+    return JSONResponse(jsonable_encoder(payload), headers=headers)
+
+# --- TASK FILTERS ---
+# ?status=done,in_process&assigned_to=3,4&due_after=&due_before=&ids=1,2 - każdy filtr ma indeks:
+# ix_tasks_status, ix_tasks_due_date, klucz główny task_assignments (user_id, ...) i klucz tasks.
+# Daty są włącznie; zadania bez terminu odpadają przy filtrze po dacie.
+TASK_STATUSES = ("not_started", "in_process", "done")
+MAX_FILTER_IDS = 500
+
+def _id_list(name: str, value: Optional[str]) -> Optional[list]:
+    if value is None: return None
+    try:
+        ids = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name}: comma-separated integers expected")
+    if len(ids) > MAX_FILTER_IDS:
+        raise HTTPException(status_code=400, detail=f"{name}: at most {MAX_FILTER_IDS} ids")
+    return ids
+
+def task_filters(status: Optional[str] = None, assigned_to: Optional[str] = None,
+                 due_after: Optional[date] = None, due_before: Optional[date] = None,
+                 ids: Optional[str] = None) -> list:
+    """Warunki WHERE dla listy zadań (zależność FastAPI)."""
+    conditions = []
+    if status is not None:
+        statuses = [s for s in status.split(",") if s]
+        unknown = sorted(set(statuses) - set(TASK_STATUSES))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown statuses: {', '.join(unknown)}")
+        conditions.append(Task.status.in_(statuses))
+    user_ids = _id_list("assigned_to", assigned_to)
+    if user_ids is not None:
+        # Podzapytanie zamiast JOIN - zadanie z kilkoma pasującymi userami nie powtarza się
+        conditions.append(Task.id.in_(
+            select(task_assignments.c.task_id).where(task_assignments.c.user_id.in_(user_ids))))
+    if due_after:
+        conditions.append(Task.due_date >= due_after)
+    if due_before:
+        conditions.append(Task.due_date <= due_before)
+    task_ids = _id_list("ids", ids)
+    if task_ids is not None:
+        conditions.append(Task.id.in_(task_ids))
+    return conditions
+
+# --- KEYSET PAGINATION ---
+# Kolejna strona to WHERE (due_date, id) > (ostatni wiersz) zamiast OFFSET, więc koszt
+# zapytania nie rośnie z numerem strony. Zadania bez terminu są na końcu.
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(ordering: str, values: list) -> str:
+    raw = json.dumps({"o": ordering, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, ordering: str) -> list:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["o"] != ordering: raise ValueError
+        return data["v"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def decode_changes_token(since: Optional[str]) -> list:
+    """(wersja, task_id) z tokenu delta sync ?since=; bez tokenu - od początku dziennika."""
+    if not since:
+        return [0, 0]
+    values = decode_cursor(since, "changes")
+    if not (isinstance(values, list) and len(values) == 2 and all(type(value) is int for value in values)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_after(model, ordering: str, values):
+    """Warunek "za ostatnim wierszem poprzedniej strony" z wartości kursora."""
+    if ordering == "due_date":
+        due, last_id = values
+        last_id = int(last_id)
+        if due is None:
+            return and_(model.due_date.is_(None), model.id > last_id)
+        due = date.fromisoformat(due)
+        return or_(
+            model.due_date > due,
+            and_(model.due_date == due, model.id > last_id),
+            model.due_date.is_(None),
+        )
+    (last_id,) = values
+    return model.id > int(last_id)
+
+async def keyset_page(db: AsyncSession, stmt, model, ordering: str, cursor: Optional[str], limit: int,
+                      mappings: bool = False):
+    """Strona obiektów `model` albo - przy mappings=True - wierszy select(kolumny) jako mapowań."""
+    limit = min(limit, MAX_PAGE_SIZE)
+    if ordering == "due_date":
+        stmt = stmt.order_by(model.due_date.asc().nulls_last(), model.id)
+    else:
+        stmt = stmt.order_by(model.id)
+
+    if cursor:
+        values = decode_cursor(cursor, ordering)
+        try:
+            stmt = stmt.where(keyset_after(model, ordering, values))
+        except (ValueError, TypeError):
+            # Kursor da się zdekodować, ale wartości nie pasują (podrobiony albo z innej wersji API)
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = (result.mappings() if mappings else result.scalars()).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        due_date, last_id = (last["due_date"], last["id"]) if mappings else (last.due_date, last.id)
+        position = [due_date.isoformat() if due_date else None, last_id] if ordering == "due_date" else [last_id]
+        next_cursor = encode_cursor(ordering, position)
+    return {"next_cursor": next_cursor, "results": rows[:limit]}
+
+# --- FAST LIST PATH ---
+# /api/tasks/ bez ?fields= i ?stream=: strona jako wiersze select(kolumny), przypisani userzy z rolami
+# jednym zapytaniem, słowniki w kolejności pól TaskRead/UserRead i kodowanie orjson - bez obiektów ORM
+# i walidacji Pydantic. Bajty odpowiedzi są te same co z response_model (test parytetu w tests.py).
+# FASTAPI_FAST_LISTS=0 wyłącza szybką ścieżkę (odpowiedź przez response_model).
+FAST_LISTS = os.environ.get("FASTAPI_FAST_LISTS", "1") == "1"
+TASK_ROW_COLUMNS = (Task.id, Task.title, Task.description, Task.due_date, Task.status)
+
+async def task_rows(db: AsyncSession, rows) -> list:
+    """Wiersze zadań -> słowniki w kształcie TaskRead (userzy w kolejności selectinload: po user_id)."""
+    assigned = {row["id"]: [] for row in rows}
+    if assigned:
+        result = await db.execute(
+            select(task_assignments.c.task_id, User.id, User.username, User.first_name, User.last_name, Role.name)
+            .join(User, User.id == task_assignments.c.user_id)
+            .outerjoin(user_roles, user_roles.c.user_id == User.id).outerjoin(Role, Role.id == user_roles.c.role_id)
+            .where(task_assignments.c.task_id.in_(assigned))
+            .order_by(task_assignments.c.task_id, task_assignments.c.user_id, user_roles.c.role_id)
+        )
+        for task_id, user_id, username, first_name, last_name, role in result:
+            users = assigned[task_id]
+            if not users or users[-1]["id"] != user_id:
+                users.append({"id": user_id, "username": username, "first_name": first_name,
+                              "last_name": last_name, "roles": [], "is_admin": False})
+            if role is not None:
+                users[-1]["roles"].append({"name": role})
+    return [{"id": row["id"], "title": row["title"], "description": row["description"], "due_date": row["due_date"],
+             "status": row["status"], "assigned_to": assigned[row["id"]]} for row in rows]
+
+def fast_json_response(payload, headers: Optional[dict] = None) -> Response:
+    # orjson: zapis zwarty i UTF-8 bez escape'owania, jak JSONResponse (json.dumps ensure_ascii=False)
+    return Response(orjson.dumps(payload), media_type="application/json", headers=headers)
+
+# --- STREAMING ---
+# Opcjonalny tryb ?stream=ndjson|json: wiersze pobierane paczkami (WHERE id > ostatnie id)
+# we własnej sesji i wysyłane od razu, więc pamięć nie rośnie z rozmiarem tabeli.
+STREAM_BATCH_SIZE = 500
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+StreamFormat = Literal["ndjson", "json"]
+
+async def stream_rows(stmt, model, schema, fmt: str, fields: Optional[dict] = None):
+    async with AsyncSessionLocal() as session:
+        last_id = 0
+        first = True
+        if fmt == "json": yield "["
+        while True:
+            result = await session.execute(stmt.where(model.id > last_id).order_by(model.id).limit(STREAM_BATCH_SIZE))
+            rows = result.scalars().all()
+            if not rows: break
+            check_loading(rows, schema)
+            if fields:
+                items = [json.dumps(jsonable_encoder(dump_fields(row, schema, fields)), ensure_ascii=False) for row in rows]
+            else:
+                items = [schema.model_validate(row).model_dump_json() for row in rows]
+            if fmt == "ndjson":
+                yield "".join(item + "\n" for item in items)
+            else:
+                yield ("" if first else ",") + ",".join(items)
+            first = False
+            last_id = rows[-1].id
+            session.expunge_all()
+        if fmt == "json": yield "]"
+
+def streaming_response(stmt, model, schema, fmt: str, headers: Optional[dict] = None, fields: Optional[dict] = None):
+    return StreamingResponse(stream_rows(stmt, model, schema, fmt, fields), media_type=STREAM_MEDIA_TYPES[fmt],
+                             headers=headers)
+
+# --- EXPORT (CSV / NDJSON) ---
+# /api/bills/export/ i /api/tasks/export/: krotki wprost z kursora (session.stream + yield_per -
+# bez obiektów ORM i schematów Pydantic) we własnej sesji, zamieniane na tekst paczkami po
+# EXPORT_CHUNK_ROWS i wysyłane od razu; przy Accept-Encoding: gzip każda paczka przechodzi przez
+# jeden strumień zlib. Pamięć nie zależy od liczby wierszy.
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+ExportFormat = Literal["csv", "ndjson"]
+
+def _export_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def export_chunk(rows, columns: list, fmt: str, id_lists=()) -> str:
+    """Paczka wierszy jako CSV albo NDJSON; kolumny z `id_lists` (group_concat id) w NDJSON to listy liczb."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+    lines = []
+    for row in rows:
+        item = dict(zip(columns, row))
+        for name in id_lists:
+            item[name] = [int(pk) for pk in item[name].split(",")] if item[name] else []
+        lines.append(json.dumps(item, ensure_ascii=False, default=_export_value) + "\n")
+    return "".join(lines)
+
+async def export_rows(stmt, columns: list, fmt: str, id_lists=()):
+    if fmt == "csv":
+        yield export_chunk([columns], columns, fmt)
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            yield export_chunk(rows, columns, fmt, id_lists)
+
+async def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: nagłówek gzip
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(request: Request, stmt, fmt: str, name: str, id_lists=()) -> StreamingResponse:
+    """Plik <name>.csv/.ndjson z kolumnami zapytania `stmt`, gzip przy Accept-Encoding: gzip."""
+    content = export_rows(stmt, [column.name for column in stmt.selected_columns], fmt, id_lists)
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{fmt}"', "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        content = _gzip(content)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(content, media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
+
+# --- CONDITIONAL GET ---
+# ETag = wersja kolekcji + skrót query stringa, więc If-None-Match z aktualną wersją kończy się
+# odpowiedzią 304 po jednym zapytaniu (collection_versions), bez zapytania o listę.
+class CollectionETag:
+    def __init__(self, name: str):
+        self.name = name
+
+    async def __call__(self, request: Request, response: Response, db: AsyncSession = Depends(get_db)) -> dict:
+        stamp = await db.get(CollectionVersion, self.name)
+        if stamp is None:
+            return {}
+        query = hashlib.sha1(request.url.query.encode()).hexdigest()[:12]
+        etag = f'"{self.name}-{stamp.version}-{query}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(stamp.updated_at.replace(tzinfo=timezone.utc), usegmt=True),
+            "Cache-Control": "private, no-cache",
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match.strip() == "*" or etag in (t.strip().removeprefix("W/") for t in if_none_match.split(",")):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        # Zwracamy nagłówki dla odpowiedzi budowanych ręcznie (StreamingResponse)
+        return headers
+
+# --- BILL ANALYTICS (NumPy) ---
+# Rachunki jako kolumny NumPy (kod kategorii, miesiąc, kwota), wczytywane raz na wersję kolekcji
+# bills (collection_versions, triggery) - kolejne żądania dla dowolnego zakresu liczą się w pamięci.
+# Sumy miesięczne, YoY, średnie kroczące i percentyle to operacje na całych tablicach
+# (bincount, cumsum, searchsorted), bez pętli po rachunkach.
+ANALYTICS_WINDOW = 3
+MAX_ANALYTICS_WINDOW = 24
+ANALYTICS_PERCENTILES = "50,90,99"
+MAX_ANALYTICS_PERCENTILES = 10
+MAX_ANALYTICS_MONTHS = 240
+ANALYTICS_LOAD_BATCH = 100_000
+MONTH_RE = re.compile(r"^(\d{4})-(\d{2})$")
+
+class BillFrame:
+    """Rachunki posortowane po (kategoria, kwota); month = rok * 12 + miesiąc - 1."""
+    def __init__(self, categories, category, month, amount):
+        order = np.lexsort((amount, category))
+        self.categories = categories
+        self.category = category[order]
+        self.month = month[order]
+        self.amount = amount[order]
+
+    def __len__(self):
+        return len(self.amount)
+
+async def load_bill_frame(db: AsyncSession) -> BillFrame:
+    complete = "category IS NOT NULL AND date IS NOT NULL AND amount IS NOT NULL"
+    # Same kategorie - z indeksu ix_bills_category_date, bez czytania tabeli
+    categories = [row[0] for row in await db.execute(
+        text("SELECT DISTINCT category FROM bills WHERE category IS NOT NULL ORDER BY category"))]
+    chunks = [np.empty((0, 3))]
+    if categories:
+        # Kategoria jako kod liczbowy już w SQL - do Pythona trafiają tylko liczby. Kursor aiosqlite
+        # zamiast Row SQLAlchemy: przy milionach wierszy obiekty Row kosztują kilka razy więcej niż zapytanie.
+        codes = " ".join(f"WHEN ? THEN {code}" for code in range(len(categories)))
+        connection = await (await db.connection()).get_raw_connection()
+        cursor = await connection.driver_connection.execute(
+            f"SELECT CASE category {codes} END, "
+            f"CAST(strftime('%Y', date) AS INTEGER) * 12 + CAST(strftime('%m', date) AS INTEGER) - 1, amount "
+            f"FROM bills WHERE {complete}", categories)
+        try:
+            while rows := await cursor.fetchmany(ANALYTICS_LOAD_BATCH):
+                chunks.append(np.array(rows, dtype=np.float64))
+        finally:
+            await cursor.close()
+    data = np.concatenate(chunks)
+    # Sortowanie milionów wierszy poza pętlą zdarzeń (NumPy zwalnia GIL)
+    return await asyncio.to_thread(BillFrame, categories, data[:, 0].astype(np.int64),
+                                   data[:, 1].astype(np.int64), data[:, 2])
+
+_bill_frame_lock = asyncio.Lock()
+_cached_bill_frame = None
+
+async def bill_frame(db: AsyncSession) -> BillFrame:
+    # Nowa wersja kolekcji (albo jej brak) = ponowne wczytanie; wersję zna już sesja po CollectionETag
+    global _cached_bill_frame
+    stamp = await db.get(CollectionVersion, "bills")
+    key = (stamp.version, stamp.updated_at) if stamp else None
+    async with _bill_frame_lock:
+        if key is None or _cached_bill_frame is None or _cached_bill_frame[0] != key:
+            frame = await load_bill_frame(db)
+            _cached_bill_frame = (key, frame) if key is not None else None
+            return frame
+        return _cached_bill_frame[1]
+
+def _analytics_month(name: str, value: Optional[str]) -> Optional[int]:
+    if value is None: return None
+    match = MONTH_RE.match(value)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise HTTPException(status_code=400, detail=f"{name}: month expected as YYYY-MM")
+    return int(match.group(1)) * 12 + int(match.group(2)) - 1
+
+def _month_label(month: int) -> str:
+    return f"{month // 12:04d}-{month % 12 + 1:02d}"
+
+def analytics_params(start: Optional[str] = None, end: Optional[str] = None,
+                     window: int = Query(ANALYTICS_WINDOW, ge=1, le=MAX_ANALYTICS_WINDOW),
+                     percentiles: str = ANALYTICS_PERCENTILES) -> dict:
+    """start/end (RRRR-MM, włącznie), window (miesiące średniej kroczącej), percentiles (0-100)."""
+    first, last = _analytics_month("start", start), _analytics_month("end", end)
+    if first is not None and last is not None and not 0 <= last - first < MAX_ANALYTICS_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range must span 1 to {MAX_ANALYTICS_MONTHS} months")
+    try:
+        values = [float(p) for p in percentiles.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles: comma-separated numbers expected")
+    if not 0 < len(values) <= MAX_ANALYTICS_PERCENTILES or not all(0 <= p <= 100 for p in values):
+        raise HTTPException(status_code=400,
+                            detail=f"percentiles: 1 to {MAX_ANALYTICS_PERCENTILES} values between 0 and 100")
+    return {"start": first, "end": last, "window": window, "percentiles": values}
+
+def _group_percentiles(category, amount, groups, quantiles):
+    """Percentyle (interpolacja liniowa jak np.percentile) każdej grupy posortowanych kwot naraz."""
+    starts = np.searchsorted(category, np.arange(groups))
+    sizes = np.searchsorted(category, np.arange(groups), side="right") - starts
+    if not len(amount):
+        return np.full((groups, len(quantiles)), np.nan)
+    last = np.maximum(starts + sizes - 1, 0)
+    position = starts[:, None] + quantiles[None, :] * np.maximum(sizes - 1, 0)[:, None]
+    lower = np.minimum(np.floor(position).astype(np.int64), len(amount) - 1)
+    upper = np.minimum(lower + 1, last[:, None])
+    values = amount[lower] + (amount[upper] - amount[lower]) * (position - lower)
+    return np.where(sizes[:, None] > 0, values, np.nan)
+
+def _rounded(values) -> list:
+    # Tablica -> lista z zaokrągleniem do groszy i None zamiast NaN
+    return [None if np.isnan(v) else v for v in np.round(values, 2).tolist()]
+
+def analyze_bills(frame: BillFrame, start=None, end=None, window=ANALYTICS_WINDOW, percentiles=()) -> dict:
+    """Sumy i liczby rachunków per (kategoria, miesiąc), zmiana rok do roku, średnia krocząca
+    sum z `window` miesięcy i percentyle kwot per kategoria w zakresie [start, end]."""
+    if start is None and end is None and not len(frame):
+        return {"start": None, "end": None, "window": window, "percentiles": percentiles,
+                "count": 0, "total": 0, "categories": []}
+    # Brakujący koniec zakresu = pierwszy/ostatni miesiąc z danymi, najwyżej MAX_ANALYTICS_MONTHS miesięcy
+    if len(frame):
+        first, last = int(frame.month.min()), int(frame.month.max())
+    else:
+        first = last = start if start is not None else end
+    if start is None and end is None:
+        start, end = max(first, last - MAX_ANALYTICS_MONTHS + 1), last
+    elif end is None:
+        end = min(max(last, start), start + MAX_ANALYTICS_MONTHS - 1)
+    elif start is None:
+        start = max(min(first, end), end - MAX_ANALYTICS_MONTHS + 1)
+    groups, months = len(frame.categories), end - start + 1
+    # Seria zaczyna się wcześniej, żeby YoY i średnia krocząca miały dane sprzed początku zakresu
+    lead = max(12, window - 1)
+    span = months + lead
+    in_span = (frame.month >= start - lead) & (frame.month <= end)
+    bins = frame.category[in_span] * span + (frame.month[in_span] - (start - lead))
+    totals = np.bincount(bins, weights=frame.amount[in_span], minlength=groups * span).reshape(groups, span)
+    counts = np.bincount(bins, minlength=groups * span).reshape(groups, span)
+
+    current, previous = totals[:, lead:], totals[:, lead - 12:span - 12]
+    had_previous = counts[:, lead - 12:span - 12] > 0
+    yoy_delta = np.where(had_previous, current - previous, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yoy_pct = np.where(had_previous & (previous != 0), (current - previous) / previous * 100, np.nan)
+    cumulative = np.concatenate([np.zeros((groups, 1)), np.cumsum(totals, axis=1)], axis=1)
+    rolling = (cumulative[:, lead + 1:] - cumulative[:, lead + 1 - window:span + 1 - window]) / window
+
+    in_range = (frame.month >= start) & (frame.month <= end)
+    category, amount = frame.category[in_range], frame.amount[in_range]
+    group_counts = np.bincount(category, minlength=groups)
+    group_totals = np.bincount(category, weights=amount, minlength=groups)
+    quantiles = np.asarray(percentiles, dtype=np.float64) / 100
+    group_percentiles = _group_percentiles(category, amount, groups, quantiles)
+
+    labels = [_month_label(month) for month in range(start, end + 1)]
+    keys = [f"p{p:g}" for p in percentiles]
+    result = []
+    for code in np.flatnonzero(group_counts):
+        result.append({
+            "category": frame.categories[code],
+            "count": int(group_counts[code]),
+            "total": round(float(group_totals[code]), 2),
+            "percentiles": dict(zip(keys, _rounded(group_percentiles[code]))),
+            "months": [
+                {"month": label, "count": count, "total": total, "rolling_mean": mean,
+                 "yoy_delta": delta, "yoy_pct": pct}
+                for label, count, total, mean, delta, pct in zip(
+                    labels, counts[code, lead:].tolist(), _rounded(current[code]), _rounded(rolling[code]),
+                    _rounded(yoy_delta[code]), _rounded(yoy_pct[code]))
+            ],
+        })
+    return {
+        "start": _month_label(start), "end": _month_label(end), "window": window, "percentiles": percentiles,
+        "count": int(group_counts.sum()), "total": round(float(group_totals.sum()), 2), "categories": result,
+    }
+
+# --- BILL IMPORT (CSV / NDJSON) ---
+# Plik (upload albo bill_import.py) czytany strumieniowo, linia po linii; poprawne wiersze trafiają
+# do bazy paczkami po IMPORT_BATCH (jedno executemany i jeden commit na paczkę), więc pamięć nie
+# rośnie z rozmiarem pliku. Błędny wiersz jest odrzucany i raportowany (numer linii + powód),
+# a import trwa dalej. Kolumny: category, amount, date (YYYY-MM-DD), opcjonalnie description.
+IMPORT_BATCH = 5000
+MAX_IMPORT_ERRORS = 100
+IMPORT_COLUMNS = ("category", "amount", "date")
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson",
+                  "text/csv": "csv", "application/x-ndjson": "ndjson"}
+
+def import_format(name: str, content_type: str = "") -> str:
+    extension = name[name.rfind("."):].lower() if "." in name else ""
+    fmt = IMPORT_FORMATS.get(extension) or IMPORT_FORMATS.get(content_type.split(";")[0].strip())
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Expected a .csv or .ndjson file")
+    return fmt
+
+def _import_records(lines, fmt):
+    """(numer linii, słownik pól) - dla linii NDJSON, która nie jest obiektem JSON, słownik to None."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        missing = [column for column in IMPORT_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+def _import_row(record) -> dict:
+    """Wiersz tabeli bills albo ValueError z powodem odrzucenia."""
+    if record is None:
+        raise ValueError("Line is not a JSON object")
+    category = str(record.get("category") or "").strip()
+    if not category:
+        raise ValueError("category: required")
+    try:
+        amount = Decimal(str(record.get("amount")).strip())
+    except InvalidOperation:
+        raise ValueError("amount: number expected")
+    if not amount.is_finite() or amount.as_tuple().exponent < -2:
+        raise ValueError("amount: finite number with at most 2 decimal places expected")
+    try:
+        day = date.fromisoformat(str(record.get("date")).strip())
+    except ValueError:
+        raise ValueError("date: YYYY-MM-DD expected")
+    return {"category": category, "amount": float(amount), "date": day,
+            "description": str(record.get("description") or "").strip() or None}
+
+def import_batches(stream, fmt: str, report: dict):
+    """Paczki poprawnych wierszy z binarnego strumienia; odrzucone wiersze lądują w raporcie."""
+    batch = []
+    for number, record in _import_records(codecs.iterdecode(stream, "utf-8-sig", errors="replace"), fmt):
+        try:
+            batch.append(_import_row(record))
+        except ValueError as error:
+            report["rejected"] += 1
+            if len(report["errors"]) < MAX_IMPORT_ERRORS:
+                report["errors"].append({"line": number, "error": str(error)})
+            continue
+        if len(batch) == IMPORT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def import_bills(db: AsyncSession, stream, fmt: str) -> dict:
+    report = {"imported": 0, "rejected": 0, "batches": 0, "errors": []}
+    batches = import_batches(stream, fmt, report)
+    # Parsowanie paczki w wątku - pętla zdarzeń obsługuje inne żądania w trakcie importu
+    while (rows := await asyncio.to_thread(next, batches, None)) is not None:
+        await db.execute(insert(Bill), rows)
+        await db.commit()
+        report["imported"] += len(rows)
+        report["batches"] += 1
+    return report
+
+# --- TASK EVENTS (PUB/SUB) ---
+# create_task/update_task publikują zmienione zadanie do huba w pamięci procesu, a hub rozsyła je
+# subskrybentom (WebSocket /api/tasks/ws/, SSE /api/tasks/events/) zamiast refetchu całej tablicy.
+# Każde połączenie ma własną, ograniczoną kolejkę; publikujący nigdy nie czeka. Klient, który nie
+# nadąża (pełna kolejka), dostaje zdarzenie "resync" i jest odłączany - powinien pobrać listę od nowa.
+EVENT_QUEUE_SIZE = int(os.environ.get("FASTAPI_EVENT_QUEUE_SIZE", 100))
+EVENT_KEEPALIVE_SECONDS = 15
+
+class TaskEventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers: set = set()
+        self.sequence = 0
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event_type: str, task: dict):
+        self.sequence += 1
+        event = {"id": self.sequence, "type": event_type, "task": task}
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Zamiast blokować publikującego: czyścimy kolejkę i zostawiamy w niej tylko "resync"
+                self.dropped += 1
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"id": self.sequence, "type": "resync"})
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self.subscribers), "published": self.sequence, "dropped": self.dropped}
+
+task_events = TaskEventHub(EVENT_QUEUE_SIZE)
+
+async def next_event(queue: asyncio.Queue) -> dict:
+    try:
+        return await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE_SECONDS)
+    except asyncio.TimeoutError:
+        return {"type": "ping"}
+
+def publish_task(event_type: str, task: "TaskRead"):
+    task_events.publish(event_type, task.model_dump(mode="json"))
+
 # --- APP SETUP ---
 app = FastAPI(title="Projekt Firmowy API")
 
@@ -157,7 +1278,7 @@ class AdminAuth(AuthenticationBackend):
             user = result.scalars().first()
 
         # Wpuszczamy KAŻDEGO z dobrym hasłem, ale oznaczamy czy jest Managerem
-        if user and verify_password(password, user.hashed_password):
+        if user and await verify_password(password, user.hashed_password):
             request.session.update({
                 "token": user.username,
                 "is_manager": user.has_role("Manager") # Zapisujemy uprawnienia w sesji
@@ -262,6 +1383,31 @@ class TaskRead(BaseModel):
     assigned_to: List[UserRead] = []
     class Config: from_attributes = True
 
+class UserPage(BaseModel):
+    next_cursor: Optional[str] = None
+    results: List[UserRead]
+
+class TaskPage(BaseModel):
+    next_cursor: Optional[str] = None
+    results: List[TaskRead]
+
+class TaskBulkItem(TaskUpdate):
+    id: int
+
+class TaskBulkResult(BaseModel):
+    id: int
+    fields: List[str]
+
+class TaskBulkResponse(BaseModel):
+    updated: int
+    results: List[TaskBulkResult]
+
+class TaskChanges(BaseModel):
+    upserted: List[TaskRead]
+    deleted: List[int]
+    next_token: str
+    has_more: bool
+
 class BillSchema(BaseModel):
     id: int
     category: str
@@ -269,6 +1415,61 @@ class BillSchema(BaseModel):
     date: date
     class Config: from_attributes = True
 
+class BillSummary(BaseModel):
+    category: str
+    year: int
+    month: int
+    total: float
+    count: int
+    min_amount: float
+    max_amount: float
+    class Config: from_attributes = True
+
+class BillImportError(BaseModel):
+    line: int
+    error: str
+
+class BillImportReport(BaseModel):
+    imported: int
+    rejected: int
+    batches: int
+    errors: List[BillImportError]
+
+class BillMonthStats(BaseModel):
+    month: str
+    count: int
+    total: float
+    rolling_mean: Optional[float] = None
+    yoy_delta: Optional[float] = None
+    yoy_pct: Optional[float] = None
+
+class BillCategoryStats(BaseModel):
+    category: str
+    count: int
+    total: float
+    percentiles: Dict[str, Optional[float]]
+    months: List[BillMonthStats]
+
+class BillAnalytics(BaseModel):
+    start: Optional[str] = None
+    end: Optional[str] = None
+    window: int
+    percentiles: List[float]
+    count: int
+    total: float
+    categories: List[BillCategoryStats]
+
+class SearchHit(BaseModel):
+    type: Literal["task", "definition"]
+    id: int
+    title: str    # HTML (escape'owany) z trafieniami w <mark>
+    snippet: str
+    score: float
+
+class SearchResults(BaseModel):
+    results: List[SearchHit]
+    truncated: bool
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -276,78 +1477,448 @@ class Token(BaseModel):
 # --- ROUTES ---
 @app.post("/api/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).where(User.username == form_data.username))
+    result = await db.execute(select(User).where(User.username == form_data.username).options(selectinload(User.roles)))
     user = result.scalars().first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(data=role_claims(user))
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/me/", response_model=UserRead)
-async def get_me(current_user: User = Depends(get_current_user)):
-    user_response = UserRead.model_validate(current_user)
-    user_response.is_admin = current_user.has_role("Manager")
-    return user_response
-
-@app.get("/api/users/", response_model=List[UserRead])
-async def get_all_users(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User))
-    return result.scalars().all()
+async def get_me(current_user: UserIdentity = Depends(get_current_user)):
+    return UserRead(
+        id=current_user.id, username=current_user.username,
+        first_name=current_user.first_name, last_name=current_user.last_name,
+        roles=[RoleSchema(name=name) for name in current_user.roles],
+        is_admin=current_user.has_role("Manager"),
+    )
 
-@app.get("/api/tasks/", response_model=List[TaskRead])
-async def get_tasks(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Task).options(selectinload(Task.assigned_to)))
-    return result.scalars().all()
+@app.get("/api/identity-cache/")
+async def get_identity_cache_stats(current_user: Principal = Depends(get_principal)):
+    if not current_user.has_role("Manager"):
+        raise HTTPException(status_code=403, detail="Only Managers can view cache stats.")
+    return identity_cache.stats()
+
+@app.get("/api/password-hashing/")
+async def get_password_hashing_stats(current_user: Principal = Depends(get_principal)):
+    if not current_user.has_role("Manager"):
+        raise HTTPException(status_code=403, detail="Only Managers can view hashing stats.")
+    return hash_metrics.stats()
+
+@app.get("/api/users/", response_model=UserPage)
+async def get_all_users(cursor: Optional[str] = None, limit: int = Query(PAGE_SIZE, ge=1),
+                        stream: Optional[StreamFormat] = None, fields: Optional[str] = None,
+                        current_user: Principal = Depends(get_principal),
+                        etag: dict = Depends(CollectionETag("users")), db: AsyncSession = Depends(get_db)):
+    tree = parse_fields(fields, UserRead)
+    stmt = select(User).options(*(fields_load(User, UserRead, tree) if tree else USER_READ_LOAD))
+    if stream:
+        return streaming_response(stmt, User, UserRead, stream, headers=etag, fields=tree)
+    page = await keyset_page(db, stmt, User, "id", cursor, limit)
+    check_loading(page["results"], UserRead)
+    return sparse_response(page, UserRead, tree, etag) if tree else page
+
+@app.get("/api/tasks/", response_model=TaskPage)
+async def get_tasks(cursor: Optional[str] = None, limit: int = Query(PAGE_SIZE, ge=1),
+                    ordering: Literal["id", "due_date"] = "id", stream: Optional[StreamFormat] = None,
+                    fields: Optional[str] = None, filters: list = Depends(task_filters),
+                    current_user: Principal = Depends(get_principal),
+                    etag: dict = Depends(CollectionETag("tasks")), db: AsyncSession = Depends(get_db)):
+    tree = parse_fields(fields, TaskRead)
+    # Kolumna sortowania zostaje - keyset_page buduje z niej kursor
+    stmt = select(Task).where(*filters).options(
+        *(fields_load(Task, TaskRead, tree, keep=(ordering,)) if tree else TASK_READ_LOAD))
+    if stream:
+        return streaming_response(stmt, Task, TaskRead, stream, headers=etag, fields=tree)
+    if FAST_LISTS and not tree:
+        # FAST LIST PATH - te same bajty co response_model TaskPage
+        page = await keyset_page(db, select(*TASK_ROW_COLUMNS).where(*filters), Task, ordering, cursor, limit,
+                                 mappings=True)
+        return fast_json_response({**page, "results": await task_rows(db, page["results"])}, etag)
+    page = await keyset_page(db, stmt, Task, ordering, cursor, limit)
+    check_loading(page["results"], TaskRead)
+    return sparse_response(page, TaskRead, tree, etag) if tree else page
+
+@app.get("/api/tasks/changes/", response_model=TaskChanges)
+async def get_task_changes(since: Optional[str] = None, limit: int = Query(PAGE_SIZE, ge=1),
+                           current_user: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    # Delta sync: tylko zadania zmienione/usunięte od tokenu `since` (dziennik task_changes),
+    # więc koszt zależy od liczby zmian, a nie od rozmiaru tabeli. Bez `since` - wszystkie zadania.
+    limit = min(limit, MAX_PAGE_SIZE)
+    version, last_id = decode_changes_token(since)
+    result = await db.execute(
+        select(TaskChange)
+        .where(or_(TaskChange.version > version, and_(TaskChange.version == version, TaskChange.task_id > last_id)))
+        .order_by(TaskChange.version, TaskChange.task_id).limit(limit + 1)
+    )
+    changes = result.scalars().all()
+    if not changes and version > (await db.scalar(select(func.max(TaskChange.version))) or 0):
+        # Token spoza dziennika (np. z odtworzonej bazy) - bez błędu klient nie dostałby już żadnych zmian
+        raise HTTPException(status_code=400, detail="Token is newer than the change log - sync again without since")
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    live_ids = [c.task_id for c in changes if not c.deleted]
+    tasks = {}
+    if live_ids:
+        result = await db.execute(select(Task).where(Task.id.in_(live_ids)).options(*TASK_READ_LOAD))
+        tasks = {task.id: task for task in result.scalars()}
+        check_loading(tasks.values(), TaskRead)
+    last = changes[-1] if changes else None
+    return {
+        "upserted": [tasks[task_id] for task_id in live_ids if task_id in tasks],
+        "deleted": [c.task_id for c in changes if c.deleted],
+        "next_token": encode_cursor("changes", [last.version, last.task_id]) if last else
+                      since or encode_cursor("changes", [0, 0]),
+        "has_more": has_more,
+    }
+
+# Ścieżka zapisu: odpowiedź TaskRead budowana ze stanu w pamięci po jednym commicie - bez
+# db.refresh() i ponownego SELECT. Przypisani userzy ładowani profilem UserRead.
+def _assignees_query():
+    return select(User).options(*USER_READ_LOAD)
+
+async def _replace_assignments(db: AsyncSession, task_id: int, user_ids: List[int]):
+    # Różnica zamiast "usuń wszystko i wstaw": DELETE tylko zbędnych, INSERT OR IGNORE brakujących
+    await db.execute(delete(task_assignments).where(
+        task_assignments.c.task_id == task_id, task_assignments.c.user_id.not_in(user_ids)))
+    if user_ids:
+        await db.execute(sqlite_insert(task_assignments).on_conflict_do_nothing(),
+                         [{"task_id": task_id, "user_id": user_id} for user_id in user_ids])
+
+# Przypisania jako group_concat id userów (podzapytanie skorelowane) zamiast selectinload
+TASK_EXPORT_COLUMNS = (
+    Task.id, Task.title, Task.description, Task.status, Task.due_date,
+    select(func.group_concat(task_assignments.c.user_id)).where(task_assignments.c.task_id == Task.id)
+    .scalar_subquery().label("assigned_to_ids"),
+)
+
+@app.get("/api/tasks/export/")
+async def export_tasks(request: Request, output: ExportFormat = "csv", filters: list = Depends(task_filters),
+                       current_user: Principal = Depends(get_principal)):
+    # ?output=csv|ndjson + filtry listy (?status=done&due_after=2026-01-01...) - EXPORT
+    stmt = select(*TASK_EXPORT_COLUMNS).where(*filters).order_by(Task.id)
+    return export_response(request, stmt, output, "tasks", id_lists=("assigned_to_ids",))
 
 @app.post("/api/tasks/", response_model=TaskRead)
-async def create_task(task_in: TaskCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def create_task(task_in: TaskCreate, current_user: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
     new_task = Task(title=task_in.title, description=task_in.description, due_date=task_in.due_date, status=task_in.status)
     if task_in.assigned_to_ids:
         if not current_user.has_role("Manager"):
              raise HTTPException(status_code=403, detail="Only Managers can assign users.")
-        result = await db.execute(select(User).where(User.id.in_(task_in.assigned_to_ids)))
-        users = result.scalars().all()
-        new_task.assigned_to = users
+        result = await db.execute(_assignees_query().where(User.id.in_(task_in.assigned_to_ids)))
+        new_task.assigned_to = result.scalars().all()
+    else:
+        new_task.assigned_to = []
     db.add(new_task)
+    # expire_on_commit=False: id (lastrowid), kolumny i przypisani userzy z rolami zostają w obiekcie
     await db.commit()
-    await db.refresh(new_task)
-    result = await db.execute(select(Task).where(Task.id == new_task.id).options(selectinload(Task.assigned_to)))
-    return result.scalars().first()
+    check_loading([new_task], TaskRead)
+    task = TaskRead.model_validate(new_task)
+    publish_task("task.created", task)
+    return task
 
 @app.patch("/api/tasks/{task_id}/", response_model=TaskRead)
-async def update_task(task_id: int, task_in: TaskUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Task).where(Task.id == task_id).options(selectinload(Task.assigned_to)))
-    task = result.scalars().first()
-    if not task: raise HTTPException(status_code=404, detail="Task not found")
+async def update_task(task_id: int, task_in: TaskUpdate, current_user: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    if task_in.assigned_to_ids is not None and not current_user.has_role("Manager"):
+        raise HTTPException(status_code=403, detail="Only Managers can assign users.")
 
-    if task_in.title is not None: task.title = task_in.title
-    if task_in.description is not None: task.description = task_in.description
-    if task_in.due_date is not None: task.due_date = task_in.due_date
-    if task_in.status is not None: task.status = task_in.status 
+    # Zmiana kolumn to jedno UPDATE ... RETURNING zamiast SELECT zadania + UPDATE
+    columns = (Task.id, Task.title, Task.description, Task.due_date, Task.status)
+    values = task_in.model_dump(exclude_none=True, exclude={"assigned_to_ids"})
+    if values:
+        stmt = update(Task).where(Task.id == task_id).values(**values).returning(*columns)
+        row = (await db.execute(stmt.execution_options(synchronize_session=False))).first()
+    else:
+        row = (await db.execute(select(*columns).where(Task.id == task_id))).first()
+    if row is None: raise HTTPException(status_code=404, detail="Task not found")
 
     if task_in.assigned_to_ids is not None:
-        if not current_user.has_role("Manager"):
-             raise HTTPException(status_code=403, detail="Only Managers can assign users.")
-        user_result = await db.execute(select(User).where(User.id.in_(task_in.assigned_to_ids)))
+        users = []
+        if task_in.assigned_to_ids:
+            user_result = await db.execute(_assignees_query().where(User.id.in_(task_in.assigned_to_ids)))
+            users = user_result.scalars().all()
+        await _replace_assignments(db, task_id, [user.id for user in users])
+    else:
+        user_result = await db.execute(_assignees_query().join(task_assignments, task_assignments.c.user_id == User.id)
+                                       .where(task_assignments.c.task_id == task_id))
         users = user_result.scalars().all()
-        task.assigned_to = users
 
     await db.commit()
-    await db.refresh(task)
-    return task
+    check_loading(users, UserRead)
+    task_out = TaskRead(**row._mapping, assigned_to=[UserRead.model_validate(user) for user in users])
+    publish_task("task.assigned" if task_in.assigned_to_ids is not None else "task.updated", task_out)
+    return task_out
+
+# Zbiorcza zmiana zadań: jedna transakcja i stała liczba zapytań niezależnie od liczby pozycji -
+# pola jednym UPDATE ... SET pole = CASE id WHEN ... END, przypisania jako różnica z task_assignments.
+MAX_BULK_ITEMS = 500
+BULK_TASK_FIELDS = ("title", "description", "due_date", "status")
+
+@app.post("/api/tasks/bulk/", response_model=TaskBulkResponse)
+async def bulk_update_tasks(items: List[TaskBulkItem], current_user: Principal = Depends(get_principal),
+                            db: AsyncSession = Depends(get_db)):
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BULK_ITEMS} items per request.")
+    changes = [item.model_dump(exclude_none=True) for item in items]
+    assignments = {c["id"]: set(c["assigned_to_ids"]) for c in changes if "assigned_to_ids" in c}
+    if assignments and not current_user.has_role("Manager"):
+        raise HTTPException(status_code=403, detail="Only Managers can assign users.")
+
+    # Walidacja całej paczki przed zapisem - błąd w jednej pozycji odrzuca wszystkie
+    ids = [c["id"] for c in changes]
+    existing = set((await db.execute(select(Task.id).where(Task.id.in_(ids)))).scalars())
+    user_ids = set().union(*assignments.values())
+    existing_users = set((await db.execute(select(User.id).where(User.id.in_(user_ids)))).scalars()) if user_ids else set()
+    errors = []
+    for index, c in enumerate(changes):
+        if c["id"] not in existing:
+            errors.append({"index": index, "id": c["id"], "error": "Task not found"})
+        elif ids.count(c["id"]) > 1:
+            errors.append({"index": index, "id": c["id"], "error": "Duplicated task id"})
+        missing = sorted(set(c.get("assigned_to_ids", ())) - existing_users)
+        if missing:
+            errors.append({"index": index, "id": c["id"], "error": f"Unknown users: {missing}"})
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    values = {}
+    for field in BULK_TASK_FIELDS:
+        per_task = {c["id"]: c[field] for c in changes if field in c}
+        if per_task:
+            values[field] = case(per_task, value=Task.id, else_=getattr(Task, field))
+    if values:
+        changed_ids = [c["id"] for c in changes if any(field in c for field in BULK_TASK_FIELDS)]
+        await db.execute(update(Task).where(Task.id.in_(changed_ids)).values(**values)
+                         .execution_options(synchronize_session=False))
+    if assignments:
+        current = {}
+        rows = await db.execute(select(task_assignments.c.task_id, task_assignments.c.user_id)
+                                .where(task_assignments.c.task_id.in_(assignments)))
+        for task_id, user_id in rows:
+            current.setdefault(task_id, set()).add(user_id)
+        removed = [(task_id, user_id) for task_id, users in current.items() for user_id in users - assignments[task_id]]
+        added = [{"task_id": task_id, "user_id": user_id}
+                 for task_id, users in assignments.items() for user_id in users - current.get(task_id, set())]
+        if removed:
+            await db.execute(delete(task_assignments).where(
+                tuple_(task_assignments.c.task_id, task_assignments.c.user_id).in_(removed)))
+        if added:
+            await db.execute(insert(task_assignments), added)
+    await db.commit()
+
+    if task_events.subscribers:
+        result = await db.execute(select(Task).where(Task.id.in_(ids)).options(*TASK_READ_LOAD))
+        for task in result.scalars():
+            publish_task("task.assigned" if task.id in assignments else "task.updated", TaskRead.model_validate(task))
+    return {
+        "updated": len(changes),
+        "results": [{"id": c["id"], "fields": sorted(k for k in c if k != "id")} for c in changes],
+    }
+
+@app.websocket("/api/tasks/ws/")
+async def task_events_ws(websocket: WebSocket, token: str = ""):
+    # Przeglądarka nie ustawi nagłówka Authorization dla WebSocket - token w query stringu
+    try:
+        decode_principal(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    queue = task_events.subscribe()
+    try:
+        while True:
+            event = await next_event(queue)
+            await websocket.send_json(event)
+            if event["type"] == "resync":
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task_events.unsubscribe(queue)
+
+@app.get("/api/tasks/events/")
+async def task_events_sse(request: Request, token: str = ""):
+    # Server-Sent Events (EventSource też nie wysyła nagłówków) - token w query stringu
+    decode_principal(token)
+    queue = task_events.subscribe()
+
+    async def stream():
+        try:
+            while not await request.is_disconnected():
+                event = await next_event(queue)
+                if event["type"] == "ping":
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == "resync":
+                    return
+        finally:
+            task_events.unsubscribe(queue)
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/api/bills/", response_model=List[BillSchema])
-async def get_bills(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Bill).where(Bill.date >= date(2025, 1, 1), Bill.date <= date(2026, 12, 31)))
+async def get_bills(stream: Optional[StreamFormat] = None, fields: Optional[str] = None,
+                    current_user: Principal = Depends(get_principal),
+                    etag: dict = Depends(CollectionETag("bills")), db: AsyncSession = Depends(get_db)):
+    tree = parse_fields(fields, BillSchema)
+    stmt = select(Bill).where(Bill.date >= date(2025, 1, 1), Bill.date <= date(2026, 12, 31))
+    if tree:
+        stmt = stmt.options(*fields_load(Bill, BillSchema, tree))
+    if stream:
+        return streaming_response(stmt, Bill, BillSchema, stream, headers=etag, fields=tree)
+    result = await db.execute(stmt)
+    rows = result.scalars().all()
+    return sparse_response(rows, BillSchema, tree, etag) if tree else rows
+
+@app.get("/api/bills/export/")
+async def export_bills(request: Request, output: ExportFormat = "csv", start: Optional[str] = None,
+                       end: Optional[str] = None, current_user: Principal = Depends(get_principal)):
+    # ?output=csv|ndjson&start=2025-01&end=2026-12 (miesiące włącznie) - EXPORT
+    first, last = _analytics_month("start", start), _analytics_month("end", end)
+    stmt = select(Bill.id, Bill.category, Bill.amount, Bill.date).order_by(Bill.id)
+    if first is not None:
+        stmt = stmt.where(Bill.date >= date(first // 12, first % 12 + 1, 1))
+    if last is not None:
+        stmt = stmt.where(Bill.date < date((last + 1) // 12, (last + 1) % 12 + 1, 1))
+    return export_response(request, stmt, output, "bills")
+
+@app.get("/api/bills/summary/", response_model=List[BillSummary])
+async def get_bills_summary(current_user: Principal = Depends(get_principal),
+                            etag: dict = Depends(CollectionETag("bills")), db: AsyncSession = Depends(get_db)):
+    # Sumy per kategoria/rok/miesiąc czytane z tabeli rollup (utrzymywanej przez triggery)
+    result = await db.execute(
+        select(BillMonthlyRollup)
+        .where(BillMonthlyRollup.year.between(2025, 2026))
+        .order_by(BillMonthlyRollup.category, BillMonthlyRollup.year, BillMonthlyRollup.month)
+    )
     return result.scalars().all()
 
+@app.get("/api/bills/analytics/", response_model=BillAnalytics)
+async def get_bills_analytics(params: dict = Depends(analytics_params), current_user: Principal = Depends(get_principal),
+                              etag: dict = Depends(CollectionETag("bills")), db: AsyncSession = Depends(get_db)):
+    # ?start=2025-01&end=2026-12&window=3&percentiles=50,90,99 - liczone w NumPy na rachunkach
+    # wczytanych raz na wersję kolekcji (BILL ANALYTICS)
+    return await asyncio.to_thread(analyze_bills, await bill_frame(db), **params)
+
+@app.post("/api/bills/import/", response_model=BillImportReport)
+async def import_bills_file(file: UploadFile, current_user: Principal = Depends(get_principal),
+                            db: AsyncSession = Depends(get_db)):
+    # multipart: file=<plik .csv/.ndjson> - upload jest buforowany przez Starlette na dysku, nie w pamięci
+    if not current_user.has_role("Manager"):
+        raise HTTPException(status_code=403, detail="Only Managers can import bills.")
+    return await import_bills(db, file.file, import_format(file.filename or "", file.content_type or ""))
+
+@app.get("/api/search/", response_model=SearchResults)
+async def search(q: str = "", limit: int = Query(SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+                 current_user: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    # Zadania i słownik w jednym zapytaniu, od najlepszego dopasowania (bm25)
+    rows = (await db.execute(SEARCH_SQL, {"query": match_expression(q), "candidates": SEARCH_CANDIDATES,
+                                          "limit": limit})).all()
+    return {"results": [
+        {"type": kind, "id": pk, "title": highlight(title), "snippet": highlight(snippet), "score": round(score, 4)}
+        for kind, pk, title, snippet, score, _ in rows
+    ], "truncated": bool(rows and rows[0].truncated)}
+
 
 # --- SIMPLE HTML PANEL FOR PRESENTATION ---
+# Strona userów po id (?after=<id ostatniego usera>), liczniki zadań jako podzapytania skorelowane
+# (liczone tylko dla userów ze strony), a lista zadań każdej karty jako fragment HTML w LRU.
+# Klucz fragmentu zawiera liczbę zadań i wersję karty - najnowszą wersję z task_changes wśród zadań
+# usera (TASK CHANGE LOG TRIGGERS) - więc zmiana zadań lub przypisań usera, także z sqladmin
+# czy bulk, daje nowy klucz, a stary wpis wypada z LRU.
+STAFF_PAGE_SIZE = 50
+CARD_TASKS = 10
+CARD_CACHE_SIZE = int(os.environ.get("FASTAPI_CARD_CACHE_SIZE", 10000))
+
+class FragmentCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        fragment = self.entries.get(key)
+        if fragment is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return fragment
+
+    def set(self, key, fragment):
+        self.entries[key] = fragment
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+card_cache = FragmentCache(CARD_CACHE_SIZE)
+
+def _user_assignments(*columns):
+    return select(*columns).select_from(task_assignments).where(task_assignments.c.user_id == User.id)
+
+# Status w FILTER, a nie w WHERE - inaczej planer SQLite wybiera ix_tasks_status i dla każdego
+# usera przegląda wszystkie zadania "done"
+STAFF_PAGE_COLUMNS = (
+    _user_assignments(func.count()).scalar_subquery().label("task_count"),
+    _user_assignments(func.count().filter(Task.status == "done"))
+        .join(Task, Task.id == task_assignments.c.task_id).scalar_subquery().label("done_count"),
+    _user_assignments(func.max(TaskChange.version))
+        .join(TaskChange, TaskChange.task_id == task_assignments.c.task_id).scalar_subquery().label("card_version"),
+)
+
+def card_key(user) -> str:
+    return f"staff-card:{user.id}:{user.task_count}:{user.card_version or 0}"
+
+async def _card_tasks(db: AsyncSession, user_ids) -> dict:
+    # Najbliższe terminem CARD_TASKS zadań każdego usera - jedno zapytanie (ROW_NUMBER per user)
+    position = func.row_number().over(
+        partition_by=task_assignments.c.user_id,
+        order_by=(Task.due_date.is_(None), Task.due_date, Task.id),
+    ).label("position")
+    ranked = (
+        select(task_assignments.c.user_id, Task.title, Task.due_date, position)
+        .join(Task, Task.id == task_assignments.c.task_id)
+        .where(task_assignments.c.user_id.in_(user_ids))
+        .subquery()
+    )
+    rows = await db.execute(
+        select(ranked.c.user_id, ranked.c.title, ranked.c.due_date)
+        .where(ranked.c.position <= CARD_TASKS).order_by(ranked.c.user_id, ranked.c.position)
+    )
+    tasks = {}
+    for user_id, title, due_date in rows:
+        tasks.setdefault(user_id, []).append({"title": title, "due_date": due_date})
+    return tasks
+
 @app.get("/staff/tasks/", response_class=HTMLResponse)
-async def users_tasks_view(request: Request, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).options(selectinload(User.tasks)))
-    users = result.scalars().all()
-    return templates.TemplateResponse("users_tasks.html", {"request": request, "users": users})
+async def users_tasks_view(request: Request, after: int = Query(0, ge=0), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(User.id, User.username, User.first_name, User.last_name, *STAFF_PAGE_COLUMNS)
+        .where(User.id > after).order_by(User.id).limit(STAFF_PAGE_SIZE + 1)
+    )
+    users = result.all()
+    next_after = users[STAFF_PAGE_SIZE - 1].id if len(users) > STAFF_PAGE_SIZE else None
+    users = users[:STAFF_PAGE_SIZE]
+
+    # Zadania czytane z bazy tylko dla kart spoza cache
+    cards = {user.id: card_cache.get(card_key(user)) for user in users}
+    missing = [user.id for user in users if cards[user.id] is None and user.task_count]
+    tasks = await _card_tasks(db, missing) if missing else {}
+    card_template = templates.get_template("users_tasks_card.html")
+    for user in users:
+        if cards[user.id] is None:
+            user_tasks = tasks.get(user.id, [])
+            cards[user.id] = Markup(card_template.render(tasks=user_tasks, more=user.task_count - len(user_tasks)))
+            card_cache.set(card_key(user), cards[user.id])
+    return templates.TemplateResponse(request, "users_tasks.html", {
+        "users": users, "cards": cards, "after": after, "next_after": next_after,
+    })
 
 # --- STARTUP LOGIC ---
 @app.on_event("startup")
@@ -356,6 +1927,12 @@ async def startup():
         await conn.run_sync(Base.metadata.create_all)
     
     async with AsyncSessionLocal() as session:
+        # 0. Rollup rachunków dla bazy sprzed dodania triggerów
+        rollup_empty = (await session.execute(select(BillMonthlyRollup.year).limit(1))).first() is None
+        if rollup_empty and (await session.execute(select(Bill.id).limit(1))).first() is not None:
+            print("--- Rebuilding bill rollup ---")
+            await rebuild_bill_rollup(session)
+
         # 1. Create Role Manager
         result = await session.execute(select(Role).where(Role.name == "Manager"))
         manager_role = result.scalars().first()
@@ -370,7 +1947,7 @@ async def startup():
         existing_admin = result.scalars().first()
         if not existing_admin:
             print("--- Creating admin user ---")
-            hashed = get_password_hash("adminpassword")
+            hashed = await get_password_hash("adminpassword")
             admin_user = User(username="admin", hashed_password=hashed, first_name="Admin", last_name="System")
             admin_user.roles.append(manager_role)
             session.add(admin_user)
@@ -381,7 +1958,7 @@ async def startup():
         result = await session.execute(select(User).where(User.username == "adam"))
         if not result.scalars().first():
             print("--- Creating user adam ---")
-            hashed = get_password_hash("password")
+            hashed = await get_password_hash("password")
             adam = User(username="adam", hashed_password=hashed, first_name="Adam", last_name="Worker")
             session.add(adam)
             await session.commit()
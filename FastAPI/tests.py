@@ -0,0 +1,1197 @@
+"""
+Testy API FastAPI: cd FastAPI && python -m unittest tests
+
+Baza SQLite w katalogu tymczasowym i FASTAPI_LOADING_GUARD=1 - endpoint, który załaduje
+kolumny albo relacje spoza schematu odpowiedzi, kończy się błędem OverfetchError.
+"""
+import asyncio
+import csv
+import gzip
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+_tmpdir = tempfile.TemporaryDirectory(prefix="fastapi-tests-")
+os.environ["FASTAPI_DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmpdir.name}/test.db"
+os.environ["FASTAPI_LOADING_GUARD"] = "1"
+
+from fastapi import WebSocketDisconnect  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+
+class ApiTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Jeden klient (jedna pętla zdarzeń) na klasę - startup tworzy tabele, admina i adama
+        cls.client = TestClient(main.app, raise_server_exceptions=True).__enter__()
+        token = cls.client.post("/api/token", data={"username": "admin", "password": "adminpassword"}).json()
+        cls.headers = {"Authorization": f"Bearer {token['access_token']}"}
+        cls.users = [u["id"] for u in cls.client.get("/api/users/", headers=cls.headers).json()["results"]]
+        cls.tasks = [
+            cls.client.post("/api/tasks/", json={"title": f"Zadanie {i}", "description": "Opis",
+                                                 "assigned_to_ids": cls.users}, headers=cls.headers).json()["id"]
+            for i in range(5)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
+
+    @classmethod
+    def login(cls, username, password):
+        token = cls.client.post("/api/token", data={"username": username, "password": password}).json()
+        return {"Authorization": f"Bearer {token['access_token']}"}
+
+    def get(self, path, **params):
+        response = self.client.get(path, params=params, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response
+
+    def task(self, task_id):
+        # FastAPI nie ma GET /api/tasks/{id}/ - jedno zadanie z listy przez filtr ?ids=
+        return self.get("/api/tasks/", ids=task_id).json()["results"][0]
+
+
+def ndjson(text):
+    # Tylko "\n" - splitlines() dzieli też na U+2028, który model_dump_json() zostawia w tytułach
+    return [json.loads(line) for line in text.split("\n") if line]
+
+
+class LoadingProfileTests(ApiTestCase):
+    """Endpointy ładują tylko to, co serializują (profile LOADING PROFILES + check_loading)."""
+
+    def test_task_list(self):
+        results = self.get("/api/tasks/").json()["results"]
+        self.assertEqual(len(results), len(self.tasks))
+        self.assertEqual([r["name"] for r in results[0]["assigned_to"][0]["roles"]], ["Manager"])
+        # Profil TASK_READ_LOAD - ścieżka response_model (bez FAST LIST PATH)
+        with mock.patch.object(main, "FAST_LISTS", False):
+            self.assertEqual(self.get("/api/tasks/").json()["results"], results)
+
+    def test_user_list(self):
+        results = self.get("/api/users/").json()["results"]
+        self.assertEqual({u["username"] for u in results}, {"admin", "adam"})
+
+    def test_streams(self):
+        self.assertEqual(len(ndjson(self.get("/api/tasks/", stream="ndjson").text)), len(self.tasks))
+        self.assertEqual(len(self.get("/api/users/", stream="json").json()), len(self.users))
+
+    def test_task_changes(self):
+        self.assertEqual(len(self.get("/api/tasks/changes/").json()["upserted"]), len(self.tasks))
+
+    def test_writes(self):
+        task_id = self.tasks[0]
+        response = self.client.patch(f"/api/tasks/{task_id}/", json={"status": "done"}, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(len(response.json()["assigned_to"]), len(self.users))
+        response = self.client.patch(f"/api/tasks/{task_id}/", json={"assigned_to_ids": self.users[:1]},
+                                     headers=self.headers)
+        self.assertEqual([u["id"] for u in response.json()["assigned_to"]], self.users[:1])
+        response = self.client.post("/api/tasks/bulk/", json=[{"id": task_id, "status": "in_process"}],
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.text)
+
+    def test_staff_panel(self):
+        self.assertIn("Zadanie 0", self.client.get("/staff/tasks/").text)
+
+    def test_guard_detects_unserialised_fields(self):
+        with self.assertRaises(main.OverfetchError):
+            main.check_loading([main.User(id=1, username="x", hashed_password="hash")], main.UserRead)
+        with self.assertRaises(main.OverfetchError):
+            main.check_loading([main.User(id=1, username="x", tasks=[])], main.UserRead)
+        main.check_loading([main.User(id=1, username="x", first_name="X")], main.UserRead)
+
+
+class NotModifiedTests(ApiTestCase):
+    """ETag kolekcji (CollectionETag): 304 bez zapytania o listę, nowa wersja po każdej zmianie widocznej w liście."""
+
+    def etag(self, path="/api/tasks/", **params):
+        response = self.get(path, **params)
+        self.assertIn("last-modified", response.headers)
+        return response.headers["etag"]
+
+    def revalidate(self, path, etag):
+        return self.client.get(path, headers={**self.headers, "If-None-Match": etag}).status_code
+
+    def rename_adam(self, first_name):
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.execute("UPDATE users SET first_name = ? WHERE username = 'adam'", (first_name,))
+        main.identity_cache.invalidate()
+
+    def test_not_modified(self):
+        for path in ("/api/tasks/", "/api/users/", "/api/bills/"):
+            etag = self.etag(path)
+            statements = []
+            record = lambda conn, cursor, statement, *args: statements.append(statement)
+            main.event.listen(main.engine.sync_engine, "before_cursor_execute", record)
+            try:
+                self.assertEqual(self.revalidate(path, etag), 304, path)
+            finally:
+                main.event.remove(main.engine.sync_engine, "before_cursor_execute", record)
+            self.assertEqual(len(statements), 1, statements)
+            self.assertIn("FROM collection_versions", statements[0])
+            self.assertEqual(self.revalidate(path, f"W/{etag}"), 304, path)
+
+    def test_query_string_is_part_of_etag(self):
+        self.assertNotEqual(self.etag(), self.etag(ordering="due_date"))
+
+    def test_writes_change_etag(self):
+        etag = self.etag()
+        self.client.patch(f"/api/tasks/{self.tasks[0]}/", json={"status": "done"}, headers=self.headers)
+        self.assertEqual(self.revalidate("/api/tasks/", etag), 200)
+        etag = self.etag()
+        self.client.patch(f"/api/tasks/{self.tasks[0]}/", json={"assigned_to_ids": self.users[:1]}, headers=self.headers)
+        self.assertNotEqual(self.etag(), etag)
+
+        etags = self.etag(), self.etag("/api/users/")
+        self.rename_adam("Adaś")
+        self.addCleanup(self.rename_adam, "Adam")
+        self.assertEqual([self.revalidate("/api/tasks/", etags[0]), self.revalidate("/api/users/", etags[1])], [200, 200])
+
+        etag = self.etag("/api/bills/")
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            bill_id = conn.execute("INSERT INTO bills (category, amount, date) VALUES ('Prąd', 10, '2025-03-01')").lastrowid
+        self.assertEqual(self.revalidate("/api/bills/", etag), 200)
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.execute("DELETE FROM bills WHERE id = ?", (bill_id,))
+
+
+class PasswordHashingTests(ApiTestCase):
+    """bcrypt w puli hash_executor (poza pętlą zdarzeń), metryki kolejki i /api/password-hashing/."""
+
+    def setUp(self):
+        self.threads = []
+        self.loop_thread = self.client.portal.call(lambda: threading.current_thread().name)
+
+    def recording(self, fn):
+        def wrapper(*args, **kwargs):
+            self.threads.append(threading.current_thread().name)
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def login_admin(self):
+        with mock.patch.object(main.pwd_context, "verify", self.recording(main.pwd_context.verify)):
+            response = self.client.post("/api/token", data={"username": "admin", "password": "adminpassword"})
+        self.assertEqual(response.status_code, 200, response.text)
+
+    def test_login_and_user_creation_hash_off_loop(self):
+        before = main.hash_metrics.stats()
+        self.login_admin()
+        with mock.patch.object(main.pwd_context, "hash", self.recording(main.pwd_context.hash)):
+            hashed = self.client.portal.call(main.get_password_hash, "nowe-haslo")
+        self.assertTrue(main.pwd_context.verify("nowe-haslo", hashed))
+        self.assertEqual(len(self.threads), 2)
+        for name in self.threads:
+            self.assertTrue(name.startswith("bcrypt"), name)
+            self.assertNotEqual(name, self.loop_thread)
+        after = main.hash_metrics.stats()
+        self.assertEqual((after["hashes"] - before["hashes"], after["queued_now"]), (2, 0))
+
+    def test_zero_concurrency_hashes_inline(self):
+        before = main.hash_metrics.stats()
+        with mock.patch.object(main, "HASH_CONCURRENCY", 0):
+            self.login_admin()
+        self.assertEqual(self.threads, [self.loop_thread])
+        self.assertEqual(main.hash_metrics.stats()["hashes"], before["hashes"])
+
+    def test_queue_metrics(self):
+        before = main.hash_metrics.stats()
+
+        async def burst():
+            # Dwa razy więcej zadań niż wątków puli - druga połowa czeka w kolejce
+            jobs = main.HASH_CONCURRENCY * 2
+            await asyncio.gather(*(main.run_hash(time.sleep, 0.05) for _ in range(jobs)))
+            return jobs
+
+        jobs = self.client.portal.call(burst)
+        stats = self.get("/api/password-hashing/").json()
+        self.assertEqual(stats, main.hash_metrics.stats())
+        self.assertEqual((stats["concurrency"], stats["hashes"] - before["hashes"], stats["queued_now"]),
+                         (main.HASH_CONCURRENCY, jobs, 0))
+        self.assertGreaterEqual(stats["queue_ms_max"], 40)
+        self.assertGreater(stats["queue_ms_avg"], 0)
+        employee = self.login("adam", "password")
+        self.assertEqual(self.client.get("/api/password-hashing/", headers=employee).status_code, 403)
+
+
+class RoleClaimTests(ApiTestCase):
+    """Role w tokenie (claimy) i unieważnianie tokenów po zmianie ról zatwierdzonej w sesji ORM."""
+
+    def claims(self, headers):
+        return main.jwt.decode(headers["Authorization"].split()[1], main.SECRET_KEY, algorithms=[main.ALGORITHM])
+
+    def me_status(self, headers):
+        return self.client.get("/api/me/", headers=headers).status_code
+
+    def test_roles_in_token(self):
+        admin, employee = self.claims(self.headers), self.claims(self.login("adam", "password"))
+        self.assertEqual((admin["sub"], admin["uid"], admin["roles"]), ("admin", self.users[0], ["Manager"]))
+        self.assertEqual((employee["sub"], employee["roles"]), ("adam", []))
+        self.assertLessEqual(admin["roles_at"], time.time())
+        # Uprawnienia z claimów - bez zapytania o role
+        self.assertEqual(self.client.get("/api/identity-cache/", headers=self.headers).status_code, 200)
+
+    def test_committed_role_change_revokes_token(self):
+        employee = self.login("adam", "password")
+
+        async def join_role(db, user):
+            role = await role_named(db, "Kontroler")
+            role.users.append(user)
+
+        async def leave_role(db, user):
+            user.roles = []
+
+        for change in (join_role, leave_role):
+            with self.subTest(change=change.__name__):
+                self.assertEqual(self.me_status(employee), 200)
+                self.client.portal.call(change_user, "adam", change)
+                response = self.client.get("/api/me/", headers=employee)
+                self.assertEqual((response.status_code, response.json()["detail"]),
+                                 (401, "Roles changed, log in again"))
+                # Tylko tokeny zmienionego usera
+                self.assertEqual(self.me_status(self.headers), 200)
+                employee = self.login("adam", "password")
+        self.assertEqual(self.claims(employee)["roles"], [])
+
+    def test_rollback_keeps_token(self):
+        employee = self.login("adam", "password")
+
+        async def make_manager(db, user):
+            user.roles = [await role_named(db, "Manager")]
+            await db.flush()
+            await db.rollback()
+            # Kolejny commit tej samej sesji nie może zastosować zmian ról zebranych przed rollbackiem
+            user = (await db.execute(main.select(main.User).where(main.User.username == "adam"))).scalar_one()
+            user.last_name = "Worker"
+
+        self.client.portal.call(change_user, "adam", make_manager)
+        self.assertEqual(self.me_status(employee), 200)
+        self.assertEqual(self.claims(self.login("adam", "password"))["roles"], [])
+
+
+class SparseFieldsTests(ApiTestCase):
+    """?fields= zawęża odpowiedź i listę kolumn w SELECT."""
+
+    def setUp(self):
+        self.statements = []
+        main.event.listen(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        main.event.remove(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_task_list_with_assignee_names(self):
+        fields = "id,title,status,assigned_to.first_name,assigned_to.last_name"
+        results = self.get("/api/tasks/", fields=fields).json()["results"]
+        self.assertEqual(set(results[0]), {"id", "title", "status", "assigned_to"})
+        self.assertEqual(set(results[0]["assigned_to"][0]), {"first_name", "last_name"})
+        task_query = next(s for s in self.statements if "FROM tasks" in s)
+        self.assertNotIn("description", task_query)
+        self.assertFalse(any("FROM roles" in s or "JOIN roles" in s for s in self.statements))
+
+    def test_task_list_without_relations(self):
+        response = self.get("/api/tasks/", fields="title", ordering="due_date", limit=2)
+        self.assertEqual(set(response.json()["results"][0]), {"title"})
+        self.assertIsNotNone(response.json()["next_cursor"])
+        self.assertIn("ETag", response.headers)
+        self.assertFalse(any("FROM users" in s for s in self.statements))
+
+    def test_stream_and_users(self):
+        rows = self.get("/api/tasks/", stream="json", fields="id,assigned_to.username").json()
+        self.assertEqual(set(rows[0]["assigned_to"][0]), {"username"})
+        self.assertEqual(set(self.get("/api/users/", fields="username").json()["results"][0]), {"username"})
+
+    def test_unknown_field(self):
+        for fields in ("id,secret", "title.x", "assigned_to.hashed_password"):
+            response = self.client.get("/api/tasks/", params={"fields": fields}, headers=self.headers)
+            self.assertEqual(response.status_code, 400, fields)
+
+
+class PaginationTests(ApiTestCase):
+    """Kursor keyset: kolejne strony bez pominięć i powtórzeń, 400 dla kursora spoza API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        changes = [{"id": task_id, "due_date": "2030-05-01" if i % 2 else None} for i, task_id in enumerate(cls.tasks)]
+        cls.client.post("/api/tasks/bulk/", json=changes, headers=cls.headers).raise_for_status()
+
+    def test_pages(self):
+        for ordering in ("id", "due_date"):
+            params, ids = {"ids": ",".join(map(str, self.tasks)), "ordering": ordering, "limit": 2}, []
+            while True:
+                page = self.get("/api/tasks/", **params).json()
+                ids += [t["id"] for t in page["results"]]
+                if not page["next_cursor"]:
+                    break
+                params["cursor"] = page["next_cursor"]
+            expected = self.tasks if ordering == "id" else self.tasks[1::2] + self.tasks[::2]
+            self.assertEqual(ids, expected, ordering)
+
+    def test_invalid_cursors(self):
+        cursors = [("id", "zly-kursor"), ("id", main.encode_cursor("due_date", [None, 1])),
+                   *(("id", main.encode_cursor("id", values)) for values in ([], ["x"], None, [1, 2], [[1]])),
+                   *(("due_date", main.encode_cursor("due_date", values))
+                     for values in (["2030-13-01", 1], [5, 1], [None], [None, "x"], "2030-05-01"))]
+        for ordering, cursor in cursors:
+            response = self.client.get("/api/tasks/", params={"ordering": ordering, "cursor": cursor},
+                                       headers=self.headers)
+            self.assertEqual(response.status_code, 400, (ordering, cursor))
+
+class TaskFilterTests(ApiTestCase):
+    """Filtry listy zadań i plan zapytania (EXPLAIN QUERY PLAN) - każdy filtr korzysta z indeksu."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        changes = [{"id": task_id, "status": "done" if i < 2 else "in_process", "due_date": f"2025-03-0{i + 1}"}
+                   for i, task_id in enumerate(cls.tasks)]
+        changes[0]["assigned_to_ids"] = cls.users[:1]
+        cls.client.post("/api/tasks/bulk/", json=changes, headers=cls.headers).raise_for_status()
+
+    def list_ids(self, **params):
+        response = self.get("/api/tasks/", ids=",".join(map(str, self.tasks)), **params)
+        return [t["id"] for t in response.json()["results"]]
+
+    def plan(self, **params):
+        statements = []
+        record = lambda conn, cursor, statement, parameters, *args: statements.append((statement, parameters))
+        main.event.listen(main.engine.sync_engine, "before_cursor_execute", record)
+        try:
+            self.get("/api/tasks/", **params)
+        finally:
+            main.event.remove(main.engine.sync_engine, "before_cursor_execute", record)
+        statement, parameters = next(s for s in statements if s[0].startswith("SELECT tasks.id"))
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            return "\n".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + statement, parameters))
+
+    def test_filters(self):
+        self.assertEqual(self.list_ids(status="done"), self.tasks[:2])
+        self.assertEqual(self.list_ids(status="done,in_process"), self.tasks)
+        self.assertEqual(self.list_ids(assigned_to=str(self.users[1])), self.tasks[1:])
+        self.assertEqual(self.list_ids(due_after="2025-03-02", due_before="2025-03-03"), self.tasks[1:3])
+
+    def test_invalid_filters(self):
+        for params in ({"status": "lost"}, {"assigned_to": "x"}, {"ids": "1,a"}):
+            self.assertEqual(self.client.get("/api/tasks/", params=params, headers=self.headers).status_code, 400)
+
+    def test_filters_use_indexes(self):
+        self.assertIn("USING INDEX ix_tasks_status", self.plan(status="done"))
+        # Zakres jednostronny przy sortowaniu po id: SQLite woli przejść tabelę w kolejności id (LIMIT)
+        self.assertIn("USING INDEX ix_tasks_due_date", self.plan(due_after="2025-03-02", due_before="2025-03-03"))
+        self.assertIn("USING INDEX ix_tasks_due_date", self.plan(due_before="2025-03-03", ordering="due_date"))
+        self.assertRegex(self.plan(assigned_to="1"), r"task_assignments USING (COVERING )?INDEX")
+        self.assertIn("USING INTEGER PRIMARY KEY", self.plan(ids="1,2"))
+
+
+class StaffPanelTests(ApiTestCase):
+    """/staff/tasks/ - strony userów, liczniki i karty z cache unieważniane zmianą przypisań."""
+
+    def setUp(self):
+        main.card_cache.entries.clear()
+        self.statements = []
+        main.event.listen(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        main.event.remove(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def panel(self, **params):
+        self.statements.clear()
+        return self.get("/staff/tasks/", **params).text
+
+    def test_counts_and_cached_cards(self):
+        task_id = self.client.post("/api/tasks/", json={"title": "Karta <b>", "description": "Opis", "due_date": "2020-01-01",
+                                                        "assigned_to_ids": self.users[:1]}, headers=self.headers).json()["id"]
+        page = self.panel()
+        self.assertIn("Karta &lt;b&gt;", page)
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(self.panel(), page)
+        self.assertEqual(len(self.statements), 1)
+
+        self.client.patch(f"/api/tasks/{task_id}/", json={"assigned_to_ids": self.users[1:]}, headers=self.headers)
+        page = self.panel()
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(page.count("Karta &lt;b&gt;"), 1)
+        self.client.patch(f"/api/tasks/{task_id}/", json={"title": "Nowa karta"}, headers=self.headers)
+        self.assertNotIn("Karta", self.panel())
+        self.assertEqual(len(self.statements), 2)
+
+    def test_pages_by_user(self):
+        with mock.patch.object(main, "STAFF_PAGE_SIZE", 1):
+            first = self.panel()
+            self.assertIn("@admin", first)
+            self.assertIn(f"?after={self.users[0]}", first)
+            second = self.panel(after=self.users[0])
+            self.assertIn("@adam", second)
+            self.assertNotIn("Następna strona", second)
+        main.card_cache.entries.clear()
+        with mock.patch.object(main, "CARD_TASKS", 2):
+            page = self.panel(after=self.users[0])
+        task_count = int(re.search(r"Zadania: (\d+)", page).group(1))
+        self.assertEqual(page.count('class="task-item"'), 2)
+        self.assertIn(f"…i {task_count - 2} więcej", page)
+
+
+class SpendingAnalyticsTests(ApiTestCase):
+    """/api/bills/analytics/ - wyniki NumPy zgodne z prostym liczeniem, cache per wersja kolekcji."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.bills = [(f"Kategoria {i % 2}", f"{2024 + i % 3}-{i % 12 + 1:02d}-15", 10 + i * 7 % 50) for i in range(144)]
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.execute("DELETE FROM bills")
+            conn.executemany("INSERT INTO bills (category, date, amount) VALUES (?, ?, ?)", cls.bills)
+
+    def test_matches_plain_computation(self):
+        data = self.get("/api/bills/analytics/", start="2025-01", end="2026-12", percentiles="0,50,90,100").json()
+        monthly = {}
+        for category, day, amount in self.bills:
+            monthly[category, day[:7]] = monthly.get((category, day[:7]), 0) + amount
+        self.assertEqual([c["category"] for c in data["categories"]], ["Kategoria 0", "Kategoria 1"])
+        for row in data["categories"]:
+            amounts = [a for c, day, a in self.bills if c == row["category"] and "2025" <= day[:4] <= "2026"]
+            self.assertEqual(row["count"], len(amounts))
+            self.assertEqual(list(row["percentiles"].values()),
+                             [round(float(np.percentile(amounts, q)), 2) for q in (0, 50, 90, 100)])
+            for month in row["months"]:
+                year, number = map(int, month["month"].split("-"))
+                earlier = [f"{(year * 12 + number - 1 - i) // 12}-{(number - 1 - i) % 12 + 1:02d}" for i in range(3)]
+                self.assertAlmostEqual(month["total"], monthly.get((row["category"], month["month"]), 0), places=2)
+                self.assertAlmostEqual(month["rolling_mean"],
+                                       sum(monthly.get((row["category"], m), 0) for m in earlier) / 3, places=2)
+                previous = monthly.get((row["category"], f"{year - 1}-{number:02d}"))
+                self.assertEqual(month["yoy_delta"],
+                                 None if previous is None else round(month["total"] - previous, 2))
+
+    def test_cached_per_collection_version(self):
+        self.assertEqual(self.get("/api/bills/analytics/").json()["end"], "2026-12")
+        frame = main._cached_bill_frame[1]
+        self.get("/api/bills/analytics/", window=6)
+        self.assertIs(main._cached_bill_frame[1], frame)
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.execute("INSERT INTO bills (category, date, amount) VALUES ('Nowa', '2030-05-01', 5)")
+        data = self.get("/api/bills/analytics/").json()
+        self.assertEqual((data["end"], data["categories"][-1]["category"]), ("2030-05", "Nowa"))
+        self.assertIsNot(main._cached_bill_frame[1], frame)
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.execute("DELETE FROM bills WHERE category = 'Nowa'")
+
+    def test_invalid_params(self):
+        for params in ({"start": "2025-13"}, {"percentiles": "50,x"}, {"start": "2026-01", "end": "2025-01"}):
+            response = self.client.get("/api/bills/analytics/", params=params, headers=self.headers)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class RollupTriggerTests(ApiTestCase):
+    """Triggery bill_monthly_rollup po zapisach z pominięciem API i indeks rachunków dokładany do starej bazy."""
+
+    def execute(self, *statements):
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            for statement in statements:
+                conn.execute(statement)
+
+    def assertRollupMatches(self):
+        async def check():
+            async with main.AsyncSessionLocal() as db:
+                return await main.check_bill_rollup(db)
+        self.assertEqual(self.client.portal.call(check), [])
+
+    def test_insert_update_delete(self):
+        self.execute("INSERT INTO bills (category, amount, date) VALUES " + ", ".join(
+            f"('Rollup {i % 3}', {10 + i * 7 % 20}, '2032-0{i % 2 + 1}-{i + 1:02d}')" for i in range(24)))
+        self.assertRollupMatches()
+        group = "category = 'Rollup 0' AND date LIKE '2032-01-%'"
+        self.execute(f"UPDATE bills SET amount = 0 WHERE {group} AND amount = (SELECT MAX(amount) FROM bills WHERE {group})")
+        self.assertRollupMatches()
+        self.execute(f"UPDATE bills SET date = '2032-12-01', category = 'Rollup 2' WHERE id = "
+                     f"(SELECT id FROM bills WHERE {group} ORDER BY amount LIMIT 1)")
+        self.assertRollupMatches()
+        group = "category = 'Rollup 1' AND date LIKE '2032-02-%'"
+        for order in ("amount DESC", "amount"):
+            self.execute(f"DELETE FROM bills WHERE id = (SELECT id FROM bills WHERE {group} ORDER BY {order}, id LIMIT 1)")
+            self.assertRollupMatches()
+        self.execute(f"DELETE FROM bills WHERE {group}")
+        self.assertRollupMatches()
+
+    def test_bill_index_added_to_existing_database(self):
+        self.execute("DROP INDEX ix_bills_category_date")
+
+        async def create_all():
+            async with main.engine.begin() as conn:
+                await conn.run_sync(main.Base.metadata.create_all)
+        self.client.portal.call(create_all)
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            self.assertTrue(conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_bills_category_date'").fetchone())
+
+
+class SearchTests(ApiTestCase):
+    """/api/search/ - FTS5 po zadaniach i słowniku, indeks aktualizowany triggerami."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.invoice = cls.client.post("/api/tasks/", json={"title": "Faktura za serwery",
+                                                           "description": "Zapłacić <do> piątku dostawcy"},
+                                      headers=cls.headers).json()["id"]
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            cls.kpi = conn.execute("INSERT INTO definitions (term, definition) VALUES "
+                                   "('KPI', 'Kluczowy wskaźnik efektywności faktur')").lastrowid
+
+    def search(self, q, **params):
+        return self.get("/api/search/", q=q, **params).json()["results"]
+
+    def test_ranked_prefix_search(self):
+        results = self.search("faktu")
+        self.assertEqual([(r["type"], r["id"]) for r in results], [("task", self.invoice), ("definition", self.kpi)])
+        self.assertEqual(results[0]["title"], "<mark>Faktura</mark> za serwery")
+        self.assertIn("<mark>faktur</mark>", results[1]["snippet"])
+        self.assertEqual([r["id"] for r in self.search("faktura dostaw")], [self.invoice])
+        self.assertIn("&lt;do&gt; <mark>piątku</mark>", self.search("piatku")[0]["snippet"])
+
+    def test_index_follows_changes(self):
+        task_id = self.client.post("/api/tasks/", json={"title": "Umowa najmu", "description": "Biuro"},
+                                   headers=self.headers).json()["id"]
+        self.assertEqual([r["id"] for r in self.search("najmu")], [task_id])
+        self.client.patch(f"/api/tasks/{task_id}/", json={"title": "Aneks"}, headers=self.headers)
+        self.assertEqual(self.search("najmu"), [])
+        self.assertEqual([r["id"] for r in self.search("aneks")], [task_id])
+
+    def test_candidates_cap_is_reported(self):
+        # Stare zadanie z szukanym słowem w tytule (waga 10) i nowsze ze słowem tylko w opisie
+        old = self.client.post("/api/tasks/", json={"title": "Rozliczenie kwartalne", "description": "Księgowość"},
+                               headers=self.headers).json()["id"]
+        newer = [self.client.post("/api/tasks/", json={"title": f"Spotkanie {i}", "description": "Omówić rozliczenie"},
+                                  headers=self.headers).json()["id"] for i in range(3)]
+        response = self.get("/api/search/", q="rozliczenie").json()
+        ids = [r["id"] for r in response["results"]]
+        self.assertEqual((ids[0], sorted(ids[1:])), (old, newer))
+        self.assertFalse(response["truncated"])
+        with mock.patch.object(main, "SEARCH_CANDIDATES", 2):
+            response = self.get("/api/search/", q="rozliczenie").json()
+        self.assertEqual(sorted(r["id"] for r in response["results"]), newer[1:])
+        self.assertTrue(response["truncated"])
+
+    def test_invalid_query(self):
+        self.assertEqual(self.client.get("/api/search/", params={"q": "\"*"}, headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get("/api/search/", params={"q": "faktura"}).status_code, 401)
+        self.assertEqual(len(self.search("zadanie", limit=3)), 3)
+
+
+class StreamedExportTests(ApiTestCase):
+    """/api/bills/export/ i /api/tasks/export/ - CSV/NDJSON z kursora, filtry i gzip w trakcie wysyłania."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.executemany("INSERT INTO bills (category, date, amount) VALUES ('Eksport', ?, ?)",
+                             [(f"{2040 + i // 12}-{i % 12 + 1:02d}-15", i + 0.5) for i in range(24)])
+
+    def export(self, path, headers=None, **params):
+        response = self.client.get(path, params=params, headers={**self.headers, **(headers or {})})
+        self.assertEqual(response.status_code, 200, response.text)
+        return response
+
+    def test_bills_csv_month_range(self):
+        response = self.export("/api/bills/export/", start="2040-11", end="2041-02")
+        self.assertEqual(response.headers["content-disposition"], 'attachment; filename="bills.csv"')
+        rows = list(csv.reader(response.text.splitlines()))
+        self.assertEqual(rows[0], ["id", "category", "amount", "date"])
+        self.assertEqual([row[2:] for row in rows[1:]], [["10.5", "2040-11-15"], ["11.5", "2040-12-15"],
+                                                         ["12.5", "2041-01-15"], ["13.5", "2041-02-15"]])
+
+    def test_tasks_ndjson_gzip(self):
+        done = self.tasks[:2]
+        self.client.post("/api/tasks/bulk/", json=[{"id": pk, "status": "done"} for pk in done], headers=self.headers)
+        with mock.patch.object(main, "EXPORT_CHUNK_ROWS", 1):
+            response = self.export("/api/tasks/export/", {"Accept-Encoding": "gzip"}, output="ndjson",
+                                   ids=",".join(map(str, self.tasks)), status="done")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        items = ndjson(response.text)
+        self.assertEqual([item["id"] for item in items], done)
+        self.assertEqual((items[0]["status"], sorted(items[0]["assigned_to_ids"])), ("done", sorted(self.users)))
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get("/api/bills/export/", params={"start": "2040-13"},
+                                         headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get("/api/tasks/export/", params={"status": "lost"},
+                                         headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get("/api/tasks/export/", params={"output": "xml"},
+                                         headers=self.headers).status_code, 422)
+        self.assertEqual(self.client.get("/api/bills/export/").status_code, 401)
+
+
+class SSEClient:
+    """Namiastka Request dla task_events_sse - klient rozłącza się po ustawieniu `disconnected`."""
+
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+async def next_chunk(iterator):
+    return await iterator.__anext__()
+
+
+class TaskEventTests(ApiTestCase):
+    """Zdarzenia zadań na żywo (TaskEventHub): WebSocket /api/tasks/ws/ i SSE /api/tasks/events/."""
+
+    def setUp(self):
+        self.token = self.headers["Authorization"].split()[1]
+        self.baseline = main.task_events.stats()
+
+    def wait_for_subscribers(self, count):
+        # Handler WebSocket subskrybuje tuż po accept - czekamy, aż pętla zdarzeń do tego dojdzie
+        for _ in range(100):
+            if main.task_events.stats()["subscribers"] == count:
+                return
+            time.sleep(0.01)
+        self.fail(f"subscribers: {main.task_events.stats()['subscribers']} != {count}")
+
+    def open_sse(self):
+        # Endpoint SSE wołany w pętli zdarzeń TestClient - strumień czytamy zdarzenie po zdarzeniu
+        client = SSEClient()
+        response = self.client.portal.call(main.task_events_sse, client, self.token)
+        self.assertEqual(response.media_type, "text/event-stream")
+        return client, response.body_iterator
+
+    def next_sse(self, iterator):
+        chunk = self.client.portal.call(next_chunk, iterator)
+        fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+        event = json.loads(fields["data"])
+        self.assertEqual((fields["id"], fields["event"]), (str(event["id"]), event["type"]))
+        return event
+
+    def test_bad_token_rejected(self):
+        with self.assertRaises(WebSocketDisconnect) as caught:
+            with self.client.websocket_connect("/api/tasks/ws/?token=zly"):
+                pass
+        self.assertEqual(caught.exception.code, 1008)
+        self.assertEqual(self.client.get("/api/tasks/events/", params={"token": "zly"}).status_code, 401)
+        self.assertEqual(main.task_events.stats()["subscribers"], self.baseline["subscribers"])
+
+    def test_writes_publish_to_ws_and_sse(self):
+        subscribers = self.baseline["subscribers"]
+        sse_client, sse = self.open_sse()
+        with self.client.websocket_connect(f"/api/tasks/ws/?token={self.token}") as ws:
+            self.wait_for_subscribers(subscribers + 2)
+            task_id = self.client.post("/api/tasks/", json={"title": "Na żywo", "description": "Opis"},
+                                       headers=self.headers).json()["id"]
+            self.client.patch(f"/api/tasks/{task_id}/", json={"status": "done"}, headers=self.headers)
+            self.client.post("/api/tasks/bulk/", json=[{"id": task_id, "assigned_to_ids": self.users[:1]}],
+                             headers=self.headers)
+            ws_events = [ws.receive_json() for _ in range(3)]
+        sse_events = [self.next_sse(sse) for _ in range(3)]
+
+        self.assertEqual(ws_events, sse_events)
+        self.assertEqual([e["type"] for e in ws_events], ["task.created", "task.updated", "task.assigned"])
+        self.assertEqual({e["task"]["id"] for e in ws_events}, {task_id})
+        self.assertEqual([e["id"] for e in ws_events], list(range(ws_events[0]["id"], ws_events[0]["id"] + 3)))
+        self.assertEqual(ws_events[1]["task"]["status"], "done")
+        self.assertEqual([u["id"] for u in ws_events[2]["task"]["assigned_to"]], self.users[:1])
+
+        # Rozłączenie usuwa subskrybentów (WebSocket przy zamknięciu, SSE przy kolejnym obrocie pętli)
+        self.wait_for_subscribers(subscribers + 1)
+        sse_client.disconnected = True
+        with self.assertRaises(StopAsyncIteration):
+            self.client.portal.call(next_chunk, sse)
+        self.assertEqual(main.task_events.stats()["subscribers"], subscribers)
+
+    def test_full_queue_drops_to_resync(self):
+        subscribers = self.baseline["subscribers"]
+        with mock.patch.object(main.task_events, "queue_size", 2):
+            _, sse = self.open_sse()
+            with self.client.websocket_connect(f"/api/tasks/ws/?token={self.token}") as ws:
+                self.wait_for_subscribers(subscribers + 2)
+
+                def publish_burst():
+                    # W jednym obrocie pętli - subskrybenci nie zdążą nic odebrać
+                    for task_id in range(3):
+                        main.task_events.publish("task.updated", {"id": task_id})
+
+                self.client.portal.call(publish_burst)
+                resync = ws.receive_json()
+                with self.assertRaises(WebSocketDisconnect):
+                    ws.receive_json()
+            self.assertEqual(resync, {"id": main.task_events.stats()["published"], "type": "resync"})
+            self.assertEqual(self.next_sse(sse), resync)
+            with self.assertRaises(StopAsyncIteration):
+                self.client.portal.call(next_chunk, sse)
+        stats = main.task_events.stats()
+        self.assertEqual(stats["dropped"], self.baseline["dropped"] + 2)
+        self.assertEqual(stats["subscribers"], subscribers)
+
+
+class TaskListParityTests(ApiTestCase):
+    """Szybka ścieżka /api/tasks/ (wiersze + orjson) - bajt w bajt to samo co response_model."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        titles = ['Cytat "x" i \\ukośnik', "Zażółć gęślą jaźń 🚀", "Linia\u2028separator\x01\n\t", "</script>"]
+        cls.special = [
+            cls.client.post("/api/tasks/", json={
+                "title": title, "description": title[::-1], "due_date": f"2030-01-0{i + 1}" if i % 2 else None,
+                "assigned_to_ids": cls.users[::-1][:i + 1],
+            }, headers=cls.headers).json()["id"]
+            for i, title in enumerate(titles)
+        ]
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.execute("INSERT OR IGNORE INTO roles (name) VALUES ('Audytor')")
+            conn.execute("INSERT OR IGNORE INTO user_roles (user_id, role_id) "
+                         "SELECT ?, id FROM roles WHERE name = 'Audytor'", (cls.users[0],))
+
+    @classmethod
+    def tearDownClass(cls):
+        # Tytuły z U+2028 i znakami sterującymi oraz rola Audytor nie mogą wyciec do kolejnych klas
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            placeholders = ", ".join("?" * len(cls.special))
+            conn.execute(f"DELETE FROM task_assignments WHERE task_id IN ({placeholders})", cls.special)
+            conn.execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", cls.special)
+            conn.execute("DELETE FROM user_roles WHERE role_id IN (SELECT id FROM roles WHERE name = 'Audytor')")
+            conn.execute("DELETE FROM roles WHERE name = 'Audytor'")
+        main.identity_cache.invalidate()
+        super().tearDownClass()
+
+    def both(self, **params):
+        fast = self.client.get("/api/tasks/", params=params, headers=self.headers)
+        with mock.patch.object(main, "FAST_LISTS", False):
+            slow = self.client.get("/api/tasks/", params=params, headers=self.headers)
+        self.assertEqual(fast.status_code, 200, fast.text)
+        return fast, slow
+
+    def test_same_bytes(self):
+        for params in ({}, {"limit": 3}, {"ordering": "due_date", "limit": 4}, {"status": "not_started"}):
+            fast, slow = self.both(**params)
+            self.assertEqual(fast.content, slow.content, params)
+            self.assertEqual((fast.headers["content-type"], fast.headers["etag"]),
+                             (slow.headers["content-type"], slow.headers["etag"]))
+            cursor = fast.json()["next_cursor"]
+            if cursor:
+                fast, slow = self.both(**params, cursor=cursor)
+                self.assertEqual(fast.content, slow.content, params)
+
+    def test_roles_and_order(self):
+        results = self.both(limit=main.MAX_PAGE_SIZE)[0].json()["results"]
+        task = next(t for t in results if t["title"] == "</script>")
+        self.assertEqual([u["id"] for u in task["assigned_to"]], sorted(self.users))
+        roles = {u["id"]: [r["name"] for r in u["roles"]] for u in task["assigned_to"]}
+        self.assertEqual(len(roles[self.users[0]]), 2)
+
+
+class TaskChangesTests(ApiTestCase):
+    """Delta sync: /api/tasks/changes/ zwraca tylko zmiany od tokenu, z tombstone'ami usuniętych."""
+
+    def sync(self, token=None, **params):
+        if token:
+            params["since"] = token
+        return self.get("/api/tasks/changes/", **params).json()
+
+    def latest_token(self):
+        page = self.sync(limit=main.MAX_PAGE_SIZE)
+        while page["has_more"]:
+            page = self.sync(page["next_token"], limit=main.MAX_PAGE_SIZE)
+        return page["next_token"]
+
+    def test_only_changes_since_token(self):
+        token = self.latest_token()
+        self.assertEqual(self.sync(token), {"upserted": [], "deleted": [], "next_token": token, "has_more": False})
+
+        self.client.patch(f"/api/tasks/{self.tasks[0]}/", json={"status": "done"}, headers=self.headers)
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            # Przypisanie i usunięcie z pominięciem API - dziennik prowadzą triggery
+            conn.execute("DELETE FROM task_assignments WHERE task_id = ? AND user_id = ?", (self.tasks[1], self.users[0]))
+            deleted_id = conn.execute("INSERT INTO tasks (title, description) VALUES ('Do usunięcia', '')").lastrowid
+            conn.execute("DELETE FROM tasks WHERE id = ?", (deleted_id,))
+
+        delta = self.sync(token)
+        self.assertEqual([t["id"] for t in delta["upserted"]], self.tasks[:2])
+        self.assertEqual([u["id"] for u in delta["upserted"][1]["assigned_to"]], self.users[1:])
+        self.assertEqual(delta["deleted"], [deleted_id])
+        self.assertEqual(self.sync(delta["next_token"])["upserted"], [])
+
+    def test_pages(self):
+        token = self.latest_token()
+        for task_id in self.tasks[2:]:
+            self.client.patch(f"/api/tasks/{task_id}/", json={"status": "in_process"}, headers=self.headers)
+        first = self.sync(token, limit=2)
+        self.assertTrue(first["has_more"])
+        second = self.sync(first["next_token"], limit=2)
+        self.assertFalse(second["has_more"])
+        self.assertEqual([t["id"] for t in first["upserted"] + second["upserted"]], self.tasks[2:])
+
+    def test_invalid_tokens(self):
+        latest = main.decode_cursor(self.latest_token(), "changes")
+        tokens = ["zly-token", main.encode_cursor("tasks", latest),
+                  *(main.encode_cursor("changes", values) for values in ([1], ["1", 2], None, [1, 2, 3])),
+                  main.encode_cursor("changes", [latest[0] + 1, 0])]
+        for token in tokens:
+            response = self.client.get("/api/tasks/changes/", params={"since": token}, headers=self.headers)
+            self.assertEqual(response.status_code, 400, token)
+
+
+class TaskWriteTests(ApiTestCase):
+    """POST/PATCH /api/tasks/: odpowiedź z UPDATE ... RETURNING i stanu w pamięci, bez ponownego SELECT."""
+
+    def setUp(self):
+        self.statements = []
+        main.event.listen(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        main.event.remove(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement.split()[0])
+
+    def write(self, method, path, payload):
+        self.statements.clear()
+        response = self.client.request(method, path, json=payload, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json(), list(self.statements)
+
+    def test_patch_matches_fresh_get(self):
+        admin, adam = self.users
+        created, statements = self.write("POST", "/api/tasks/", {"title": "Zapis", "description": "Opis",
+                                                                 "assigned_to_ids": [adam, admin]})
+        # INSERT zadania i przypisań + przypisani z rolami; bez SELECT zadania po commicie
+        self.assertEqual(statements, ["SELECT", "SELECT", "INSERT", "INSERT"])
+        self.assertEqual(created, self.task(created["id"]))
+        path = f"/api/tasks/{created['id']}/"
+        cases = [
+            # (zmiana, instrukcje SQL)
+            ({"status": "done", "title": "Nowy", "due_date": "2030-05-05"}, ["UPDATE", "SELECT", "SELECT"]),
+            ({"assigned_to_ids": [adam]}, ["SELECT", "SELECT", "SELECT", "DELETE", "INSERT"]),
+            ({"description": "Inny", "assigned_to_ids": []}, ["UPDATE", "DELETE"]),
+            ({}, ["SELECT", "SELECT"]),
+            ({"assigned_to_ids": [admin, adam]}, ["SELECT", "SELECT", "SELECT", "DELETE", "INSERT"]),
+        ]
+        for payload, expected in cases:
+            with self.subTest(payload=payload):
+                task, statements = self.write("PATCH", path, payload)
+                self.assertEqual(task, self.task(created["id"]))
+                self.assertEqual(statements, expected)
+        self.assertEqual((task["title"], task["description"], task["status"], task["due_date"]),
+                         ("Nowy", "Inny", "done", "2030-05-05"))
+        self.assertEqual(sorted(u["id"] for u in task["assigned_to"]), sorted(self.users))
+
+    def test_missing_task(self):
+        for payload in ({"status": "done"}, {}, {"assigned_to_ids": self.users}):
+            with self.subTest(payload=payload):
+                response = self.client.patch("/api/tasks/999999/", json=payload, headers=self.headers)
+                self.assertEqual(response.status_code, 404)
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            self.assertEqual(conn.execute("SELECT count(*) FROM task_assignments WHERE task_id = 999999").fetchone(),
+                             (0,))
+
+
+class UploadImportTests(ApiTestCase):
+    """POST /api/bills/import/ - import paczkami, błędne wiersze odrzucane bez przerywania importu."""
+
+    def upload(self, name, content, headers=None):
+        return self.client.post("/api/bills/import/", files={"file": (name, content)},
+                                headers=headers or self.headers)
+
+    def test_csv_in_batches(self):
+        rows = [f"Import CSV,{10 + i}.50,2031-0{i % 3 + 1}-10" for i in range(7)]
+        bad = ["Import CSV,abc,2031-01-10", ",5,2031-01-10", "Import CSV,1.005,2031-01-10", "Import CSV,5,2031-02-30"]
+        content = "\ufeffcategory,amount,date\n" + "\n".join(rows + bad) + "\n"
+        with mock.patch.object(main, "IMPORT_BATCH", 3):
+            report = self.upload("rachunki.csv", content.encode()).json()
+        self.assertEqual((report["imported"], report["rejected"], report["batches"]), (7, 4, 3))
+        self.assertEqual([e["line"] for e in report["errors"]], [9, 10, 11, 12])
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            stored = conn.execute("SELECT count(*), sum(amount) FROM bills WHERE category = 'Import CSV'").fetchone()
+            rollup = conn.execute("SELECT sum(count), sum(total) FROM bill_monthly_rollup "
+                                  "WHERE category = 'Import CSV'").fetchone()
+        self.assertEqual(stored, (7, sum(10.5 + i for i in range(7))))
+        self.assertEqual(rollup, stored)
+
+    def test_ndjson(self):
+        content = ('{"category": "Import NDJSON", "amount": 12, "date": "2031-05-01", "description": "Prąd"}\n'
+                   '\n[1, 2]\n{"category": "Import NDJSON", "amount": "x", "date": "2031-05-01"}\n')
+        report = self.upload("rachunki.ndjson", content.encode()).json()
+        self.assertEqual((report["imported"], report["rejected"]), (1, 2))
+        self.assertEqual([e["line"] for e in report["errors"]], [3, 4])
+
+    def test_rejected_requests(self):
+        employee = self.login("adam", "password")
+        self.assertEqual(self.upload("rachunki.csv", b"category,amount,date\n", employee).status_code, 403)
+        self.assertEqual(self.upload("rachunki.txt", b"category,amount,date\n").status_code, 400)
+        self.assertEqual(self.upload("rachunki.csv", b"category,amount\nA,1\n").status_code, 400)
+
+
+class StreamedListTests(ApiTestCase):
+    """?stream=ndjson|json na /api/tasks/ - wszystkie wiersze, paczkami po STREAM_BATCH_SIZE."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.executemany("INSERT INTO tasks (title, description, status) VALUES (?, 'Opis', 'not_started')",
+                             [(f"Strumień {i}",) for i in range(main.STREAM_BATCH_SIZE * 2 + 100)])
+            cls.all_ids = [row[0] for row in conn.execute("SELECT id FROM tasks ORDER BY id")]
+
+    @classmethod
+    def tearDownClass(cls):
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            conn.execute("DELETE FROM tasks WHERE title LIKE 'Strumień %'")
+        super().tearDownClass()
+
+    def stream(self, fmt):
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        main.event.listen(main.engine.sync_engine, "before_cursor_execute", record)
+        try:
+            response = self.get("/api/tasks/", stream=fmt)
+        finally:
+            main.event.remove(main.engine.sync_engine, "before_cursor_execute", record)
+        batches = [s for s in statements if s.startswith("SELECT tasks.id") and "LIMIT" in s]
+        # Paczki po 500 aż do pustej
+        self.assertEqual(len(batches), -(-len(self.all_ids) // main.STREAM_BATCH_SIZE) + 1)
+        self.assertEqual(response.headers["content-type"], main.STREAM_MEDIA_TYPES[fmt])
+        return response
+
+    def test_ndjson(self):
+        items = ndjson(self.stream("ndjson").text)
+        self.assertEqual([item["id"] for item in items], self.all_ids)
+        self.assertEqual(set(items[-1]), set(main.TaskRead.model_fields))
+
+    def test_json(self):
+        items = self.stream("json").json()
+        self.assertEqual([item["id"] for item in items], self.all_ids)
+        own = next(item for item in items if item["id"] == self.tasks[0])
+        self.assertEqual(len(own["assigned_to"]), len(self.users))
+
+    def test_unknown_format(self):
+        # Literal w parametrze - błąd walidacji FastAPI (422), jak ?output= eksportu
+        response = self.client.get("/api/tasks/", params={"stream": "xml"}, headers=self.headers)
+        self.assertEqual(response.status_code, 422)
+
+
+class TaskBulkTests(ApiTestCase):
+    """POST /api/tasks/bulk/ - walidacja całej paczki (422), rola Manager i różnica przypisań."""
+
+    def bulk(self, items, headers=None):
+        return self.client.post("/api/tasks/bulk/", json=items, headers=headers or self.headers)
+
+    def assignments(self, task_id):
+        with sqlite3.connect(f"{_tmpdir.name}/test.db") as conn:
+            return {row[0] for row in conn.execute("SELECT user_id FROM task_assignments WHERE task_id = ?",
+                                                   (task_id,))}
+
+    def test_assignment_diff(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, *args):
+            if "task_assignments" in statement and not statement.startswith("SELECT"):
+                statements.append((statement.split()[0], parameters))
+
+        admin, adam = self.users
+        main.event.listen(main.engine.sync_engine, "before_cursor_execute", record)
+        try:
+            response = self.bulk([
+                {"id": self.tasks[0], "assigned_to_ids": [adam]},
+                {"id": self.tasks[1], "assigned_to_ids": []},
+                {"id": self.tasks[2], "status": "done", "title": "Zbiorczo"},
+            ])
+        finally:
+            main.event.remove(main.engine.sync_engine, "before_cursor_execute", record)
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()["results"][2], {"id": self.tasks[2], "fields": ["status", "title"]})
+        # Jeden DELETE tylko usuwanych par, bez INSERT - pozostający przypisany nie jest ruszany
+        self.assertEqual([kind for kind, _ in statements], ["DELETE"])
+        self.assertEqual(sorted(statements[0][1]), sorted((self.tasks[0], admin, self.tasks[1], admin, self.tasks[1], adam)))
+        self.assertEqual((self.assignments(self.tasks[0]), self.assignments(self.tasks[1])), ({adam}, set()))
+        self.assertEqual(self.assignments(self.tasks[2]), {admin, adam})
+        task = self.task(self.tasks[2])
+        self.assertEqual((task["status"], task["title"]), ("done", "Zbiorczo"))
+
+        response = self.bulk([{"id": self.tasks[1], "assigned_to_ids": [admin, adam]}])
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(self.assignments(self.tasks[1]), {admin, adam})
+
+    def test_invalid_items_reject_whole_batch(self):
+        response = self.bulk([
+            {"id": self.tasks[3], "status": "in_process"},
+            {"id": 999999, "status": "done"},
+            {"id": self.tasks[4], "status": "done"},
+            {"id": self.tasks[4], "assigned_to_ids": [999999]},
+        ])
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["detail"], [
+            {"index": 1, "id": 999999, "error": "Task not found"},
+            {"index": 2, "id": self.tasks[4], "error": "Duplicated task id"},
+            {"index": 3, "id": self.tasks[4], "error": "Duplicated task id"},
+            {"index": 3, "id": self.tasks[4], "error": "Unknown users: [999999]"},
+        ])
+        self.assertEqual(self.task(self.tasks[3])["status"], "not_started")
+        with mock.patch.object(main, "MAX_BULK_ITEMS", 1):
+            response = self.bulk([{"id": self.tasks[3], "status": "done"}, {"id": self.tasks[4], "status": "done"}])
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.bulk([{"status": "done"}]).status_code, 422)
+
+    def test_only_manager_assigns(self):
+        employee = self.login("adam", "password")
+        response = self.bulk([{"id": self.tasks[3], "status": "done"},
+                              {"id": self.tasks[4], "assigned_to_ids": []}], employee)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.assignments(self.tasks[4]), set(self.users))
+        self.assertEqual(self.bulk([{"id": self.tasks[3], "status": "done"}], employee).status_code, 200)
+
+
+async def change_user(username, change, commit=True):
+    """Zmienia usera (z rolami) przez sesję ORM - jak sqladmin; słuchacze sesji widzą commit albo rollback."""
+    async with main.AsyncSessionLocal() as db:
+        user = (await db.execute(main.select(main.User).where(main.User.username == username)
+                                 .options(main.selectinload(main.User.roles)))).scalar_one()
+        await change(db, user)
+        await (db.commit() if commit else db.rollback())
+
+
+async def role_named(db, name):
+    role = (await db.execute(main.select(main.Role).where(main.Role.name == name)
+                             .options(main.selectinload(main.Role.users)))).scalar_one_or_none()
+    if role is None:
+        db.add(main.Role(name=name))
+        await db.flush()
+        return await role_named(db, name)
+    return role
+
+
+class UserIdentityCacheTests(ApiTestCase):
+    """get_current_user z IdentityCache: trafienie bez bazy, TTL, LRU i czyszczenie po zapisach User/Role."""
+
+    def setUp(self):
+        main.identity_cache.invalidate()
+        self.statements = []
+        main.event.listen(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        main.event.remove(main.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def me(self, headers=None):
+        response = self.client.get("/api/me/", headers=headers or self.headers)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_hit_skips_database(self):
+        stats = main.identity_cache.stats()
+        first = self.me()
+        self.assertTrue(any("FROM users" in s for s in self.statements))
+        self.statements.clear()
+        self.assertEqual(self.me(), first)
+        self.assertEqual(self.statements, [])
+        after = main.identity_cache.stats()
+        self.assertEqual((after["hits"] - stats["hits"], after["misses"] - stats["misses"]), (1, 1))
+
+    def test_ttl_and_lru(self):
+        loads = []
+
+        async def loader(username):
+            loads.append(username)
+            return main.UserIdentity(id=len(loads), username=username)
+
+        async def scenario():
+            cache = main.IdentityCache(2, 60)
+            for username in ("a", "b", "a", "c", "a", "b"):
+                await cache.get(username, loader)
+            # "a" odświeżone przed "c", więc "c" wypycha "b"; kolejne "b" to znowu odczyt z bazy
+            self.assertEqual(loads, ["a", "b", "c", "b"])
+            self.assertEqual(list(cache.entries), ["a", "b"])
+            self.assertEqual(cache.stats(), {"size": 2, "maxsize": 2, "ttl": 60, "hits": 2, "misses": 4})
+
+            cache.ttl = 0.01
+            await cache.get("d", loader)
+            await asyncio.sleep(0.02)
+            await cache.get("d", loader)
+            self.assertEqual(loads[-2:], ["d", "d"])
+
+        asyncio.run(scenario())
+
+    def test_invalidation_during_load_is_not_cached(self):
+        async def scenario():
+            cache = main.IdentityCache(10, 60)
+
+            async def racing_loader(username):
+                cache.invalidate(username)  # zapis User/Role w trakcie ładowania
+                return main.UserIdentity(id=1, username=username)
+
+            await cache.get("a", racing_loader)
+            self.assertEqual((cache.stats()["size"], cache.generation), (0, 1))
+
+        asyncio.run(scenario())
+
+    def test_user_change_invalidates_entry(self):
+        employee = self.login("adam", "password")
+        self.assertEqual(self.me(employee)["first_name"], "Adam")
+        self.me()
+        generation = main.identity_cache.generation
+
+        async def rename(db, user):
+            user.first_name = "Adaś"
+
+        self.client.portal.call(change_user, "adam", rename)
+        self.assertGreater(main.identity_cache.generation, generation)
+        self.assertEqual(set(main.identity_cache.entries), {"admin"})
+        self.assertEqual(self.me(employee)["first_name"], "Adaś")
+
+        async def restore(db, user):
+            user.first_name = "Adam"
+
+        self.client.portal.call(change_user, "adam", restore)
+        self.assertEqual(self.me(employee)["first_name"], "Adam")
+
+    def test_role_change_clears_every_entry(self):
+        self.me()
+        self.me(self.login("adam", "password"))
+        generation = main.identity_cache.generation
+
+        async def join_role(db, user):
+            role = await role_named(db, "Kontroler")
+            role.users.append(user)
+
+        self.client.portal.call(change_user, "adam", join_role)
+        self.assertEqual((main.identity_cache.stats()["size"], main.identity_cache.generation > generation), (0, True))
+        self.assertIn("Kontroler", [r["name"] for r in self.me(self.login("adam", "password"))["roles"]])
+
+        async def leave_role(db, user):
+            user.roles = [role for role in user.roles if role.name != "Kontroler"]
+
+        self.client.portal.call(change_user, "adam", leave_role)
+        self.assertEqual([r["name"] for r in self.me(self.login("adam", "password"))["roles"]], [])
+
+    def test_stats_endpoint(self):
+        self.me()
+        self.me()
+        response = self.get("/api/identity-cache/").json()
+        self.assertEqual(response, main.identity_cache.stats())
+        self.assertEqual((response["size"], response["maxsize"], response["ttl"]),
+                         (1, main.IDENTITY_CACHE_SIZE, main.IDENTITY_CACHE_TTL))
+        employee = self.login("adam", "password")
+        self.assertEqual(self.client.get("/api/identity-cache/", headers=employee).status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,8 @@
+import os
+import click
 from flask import Flask, jsonify, request, session, redirect, url_for, render_template_string
 from flask_cors import CORS
+from sqlalchemy import select
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_admin import Admin, AdminIndexView, expose
 from flask_admin.contrib.sqla import ModelView
@@ -8,22 +11,42 @@ from datetime import datetime
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
 
 # Importy modeli i schematów
-from models import db, User, Task, BusinessDefinition, Employee, Bill, Role
+from models import db, User, Task, TaskChange, BusinessDefinition, Employee, Bill, Role, BillMonthlyRollup
+from models import rebuild_bill_rollup, check_bill_rollup
 from serializers import ma, TaskSchema, BillSchema, UserSchema, BusinessDefinitionSchema
+from pagination import keyset_page, task_changes_page, InvalidPageRequest
+from streaming import stream_rows, STREAM_MIMETYPES
+from role_claims import role_claims, has_role_claim, claims_revoked
+from conditional import collection_etag
+from bulk import parse_bulk, apply_bulk, InvalidBulkRequest
+from sparse_fields import sparse_fields
+from filters import task_filters
+from search import search
+from analytics import analytics_params, analyze, bill_frame
+from importer import import_bills, import_format
+from fast_lists import task_row_query, task_rows
+from export import BILL_EXPORT_COLUMNS, TASK_EXPORT_COLUMNS, bill_period, export_format, export_response
 
 app = Flask(__name__)
 
 # --- KONFIGURACJA ---
 app.config['SECRET_KEY'] = 'twoj-sekretny-klucz-sesji' 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///projekt_firmowy.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('FLASK_DATABASE_URL', 'sqlite:///projekt_firmowy.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = 'jwt-sekretny-klucz'
+# Lista zadań z krotek zamiast Marshmallow (fast_lists.py); FLASK_FAST_LISTS=0 wyłącza
+app.config['FAST_LIST_RESPONSES'] = os.environ.get('FLASK_FAST_LISTS', '1') == '1'
 
 db.init_app(app)
 ma.init_app(app)
 jwt = JWTManager(app)
 CORS(app)
 
+# Token z rolami sprzed ich zmiany jest odrzucany (401 "Token has been revoked")
+@jwt.token_in_blocklist_loader
+def check_role_claims(jwt_header, jwt_payload):
+    return claims_revoked(jwt_payload)
+
 # --- KONFIGURACJA FLASK-LOGIN (Dla Panelu Admina) ---
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -115,6 +138,17 @@ def admin_logout():
 
 # --- API ENDPOINTS (DLA REACTA) ---
 
+@app.errorhandler(InvalidPageRequest)
+def invalid_page_request(error):
+    return jsonify({"msg": str(error)}), 400
+
+def requested_stream():
+    """Zwraca format z ?stream=ndjson|json (albo None, gdy nie zażądano streamingu)."""
+    fmt = request.args.get('stream')
+    if fmt is not None and fmt not in STREAM_MIMETYPES:
+        raise InvalidPageRequest(f"Dozwolone formaty: {', '.join(STREAM_MIMETYPES)}.")
+    return fmt
+
 # 1. Login (JWT)
 @app.route('/api/token/', methods=['POST'])
 def login():
@@ -125,7 +159,8 @@ def login():
     if not user or user.password != password:
         return jsonify({"msg": "Błędny login lub hasło"}), 401
 
-    access_token = create_access_token(identity=user.id)
+    # flask_jwt_extended wymaga, żeby 'sub' był stringiem; role w claimach - uprawnienia bez zapytań
+    access_token = create_access_token(identity=str(user.id), additional_claims=role_claims(user))
     return jsonify(access_token=access_token)
 
 # 2. Current User
@@ -140,20 +175,38 @@ def get_me():
 # 3. Lista userów (dla dropdownu)
 @app.route('/api/users/', methods=['GET'])
 @jwt_required()
+@collection_etag('users')
 def get_users():
-    users = User.query.all()
-    return jsonify(users_schema.dump(users))
+    schema, options = sparse_fields(UserSchema, User, request.args)
+    query = User.query.options(*options) if schema else User.query
+    schema = schema or users_schema
+    fmt = requested_stream()
+    if fmt:
+        return stream_rows(query, User, schema, fmt)
+    users, next_cursor = keyset_page(query, User, request.args)
+    return jsonify(next_cursor=next_cursor, results=schema.dump(users))
 
 # 4. Tasks (GET / POST)
 @app.route('/api/tasks/', methods=['GET', 'POST'])
 @jwt_required()
+@collection_etag('tasks')
 def handle_tasks():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-
     if request.method == 'GET':
-        tasks = Task.query.all()
-        return jsonify(tasks_schema.dump(tasks))
+        fmt = requested_stream()
+        if app.config['FAST_LIST_RESPONSES'] and not fmt and not request.args.get('fields'):
+            rows, next_cursor = keyset_page(task_row_query(task_filters(request.args)), Task, request.args,
+                                            orderings=('id', 'due_date'))
+            return jsonify(next_cursor=next_cursor, results=task_rows(rows))
+        # Kolumna sortowania zostaje w SELECT - keyset_page buduje z niej kursor
+        schema, options = sparse_fields(TaskSchema, Task, request.args, keep=(request.args.get('ordering', 'id'),))
+        query = Task.query.filter(*task_filters(request.args))
+        if schema:
+            query = query.options(*options)
+        schema = schema or tasks_schema
+        if fmt:
+            return stream_rows(query, Task, schema, fmt)
+        tasks, next_cursor = keyset_page(query, Task, request.args, orderings=('id', 'due_date'))
+        return jsonify(next_cursor=next_cursor, results=schema.dump(tasks))
     
     if request.method == 'POST':
         data = request.json
@@ -174,7 +227,7 @@ def handle_tasks():
         # Przypisywanie ludzi (tylko Manager)
         user_ids = data.get('assigned_to_ids', [])
         if user_ids:
-            if not current_user.has_role('Manager'):
+            if not has_role_claim('Manager'):
                  return jsonify({"msg": "Brak uprawnień. Tylko Manager."}), 403
             users = User.query.filter(User.id.in_(user_ids)).all()
             new_task.assigned_to.extend(users)
@@ -183,12 +236,44 @@ def handle_tasks():
         db.session.commit()
         return task_schema.dump(new_task), 201
 
+# 4b. Delta sync - tylko zadania zmienione/usunięte od tokenu ?since= (bez since - wszystkie)
+@app.route('/api/tasks/changes/', methods=['GET'])
+@jwt_required()
+def get_task_changes():
+    changes, next_token, has_more = task_changes_page(TaskChange, request.args)
+    live_ids = [c.task_id for c in changes if not c.deleted]
+    tasks = {task.id: task for task in Task.query.filter(Task.id.in_(live_ids))} if live_ids else {}
+    return jsonify(
+        upserted=tasks_schema.dump([tasks[task_id] for task_id in live_ids if task_id in tasks]),
+        deleted=[c.task_id for c in changes if c.deleted],
+        next_token=next_token,
+        has_more=has_more,
+    )
+
+# 4c. Zbiorcza zmiana zadań (status, pola, przypisania) w jednej transakcji
+@app.route('/api/tasks/bulk/', methods=['POST'])
+@jwt_required()
+def bulk_update_tasks():
+    try:
+        changes = parse_bulk(request.get_json(silent=True))
+        if any('assigned_to_ids' in c for c in changes) and not has_role_claim('Manager'):
+            return jsonify({"msg": "Brak uprawnień. Tylko Manager."}), 403
+        return jsonify(apply_bulk(changes))
+    except InvalidBulkRequest as error:
+        db.session.rollback()
+        return jsonify({"msg": str(error), "errors": error.errors}), 400
+
+# 4d. Eksport zadań: ?output=csv|ndjson + filtry listy (?status=done&due_after=...) - export.py
+@app.route('/api/tasks/export/', methods=['GET'])
+@jwt_required()
+def export_tasks():
+    stmt = select(*TASK_EXPORT_COLUMNS).where(*task_filters(request.args)).order_by(Task.id)
+    return export_response(stmt, export_format(request.args), 'tasks', id_lists=('assigned_to_ids',))
+
 # 5. Task Update (PATCH)
 @app.route('/api/tasks/<int:task_id>/', methods=['PATCH'])
 @jwt_required()
 def update_task(task_id):
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
     task = Task.query.get_or_404(task_id)
     data = request.json
 
@@ -198,7 +283,7 @@ def update_task(task_id):
 
     # Zmiana osób (tylko Manager)
     if 'assigned_to_ids' in data:
-        if not current_user.has_role('Manager'):
+        if not has_role_claim('Manager'):
             return jsonify({"msg": "Brak uprawnień. Tylko Manager."}), 403
         
         user_ids = data['assigned_to_ids']
@@ -211,13 +296,63 @@ def update_task(task_id):
 # 6. Rachunki (z obsługą year)
 @app.route('/api/bills/', methods=['GET'])
 # @jwt_required()
+@collection_etag('bills')
 def get_bills():
     # Pobieramy wszystko z 2025 i 2026
-    bills = Bill.query.filter(
+    query = Bill.query.filter(
         Bill.date >= '2025-01-01',
         Bill.date <= '2026-12-31'
-    ).all()
-    return jsonify(bills_schema.dump(bills))
+    )
+    schema, options = sparse_fields(BillSchema, Bill, request.args)
+    if schema:
+        query = query.options(*options)
+    schema = schema or bills_schema
+    fmt = requested_stream()
+    if fmt:
+        return stream_rows(query, Bill, schema, fmt)
+    return jsonify(schema.dump(query.all()))
+
+# 6a. Podsumowanie rachunków (sumy per kategoria/rok/miesiąc zamiast sumowania w React)
+@app.route('/api/bills/summary/', methods=['GET'])
+# @jwt_required()
+@collection_etag('bills')
+def get_bills_summary():
+    # Czytamy gotowe sumy z tabeli rollup (utrzymywanej przez triggery)
+    rows = BillMonthlyRollup.query.filter(
+        BillMonthlyRollup.year.between(2025, 2026)
+    ).order_by(BillMonthlyRollup.category, BillMonthlyRollup.year, BillMonthlyRollup.month).all()
+    return jsonify([{
+        'category': r.category, 'year': r.year, 'month': r.month, 'total': r.total,
+        'count': r.count, 'min_amount': r.min_amount, 'max_amount': r.max_amount,
+    } for r in rows])
+
+# 6b. Analityka rachunków: ?start=2025-01&end=2026-12&window=3&percentiles=50,90,99 - sumy
+# miesięczne, YoY, średnie kroczące i percentyle liczone w NumPy (analytics.py)
+@app.route('/api/bills/analytics/', methods=['GET'])
+# @jwt_required()
+@collection_etag('bills')
+def get_bills_analytics():
+    params = analytics_params(request.args)
+    return jsonify(analyze(bill_frame(), **params))
+
+# 6c. Eksport rachunków: ?output=csv|ndjson&start=2025-01&end=2026-12 (miesiące włącznie) - export.py
+@app.route('/api/bills/export/', methods=['GET'])
+@jwt_required()
+def export_bills():
+    stmt = select(*BILL_EXPORT_COLUMNS).where(*bill_period(request.args)).order_by(Bill.id)
+    return export_response(stmt, export_format(request.args), 'bills')
+
+# 6d. Import rachunków: multipart file=<plik .csv/.ndjson>, paczkami po IMPORT_BATCH (importer.py);
+# Werkzeug buforuje duży upload na dysku, a plik jest czytany strumieniowo
+@app.route('/api/bills/import/', methods=['POST'])
+@jwt_required()
+def import_bills_file():
+    if not has_role_claim('Manager'):
+        return jsonify({"msg": "Brak uprawnień. Tylko Manager."}), 403
+    upload = request.files.get('file')
+    if upload is None:
+        raise InvalidPageRequest("Brak pliku w polu 'file'.")
+    return jsonify(import_bills(upload.stream, import_format(upload.filename or '', upload.mimetype or '')))
 
 # 7. Słownik
 @app.route('/api/definitions/', methods=['GET'])
@@ -226,12 +361,57 @@ def get_definitions():
     defs = BusinessDefinition.query.all()
     return jsonify(def_schema.dump(defs))
 
+# 8. Wyszukiwanie w zadaniach i słowniku (FTS5) - ?q=fakt klie&limit=20;
+# tytuł i snippet to HTML z trafieniami w <mark>
+@app.route('/api/search/', methods=['GET'])
+@jwt_required()
+def search_documents():
+    results, truncated = search(request.args)
+    return jsonify(results=results, truncated=truncated)
+
+
+# --- KOMENDY CLI (flask --app app bill-rollup rebuild|check) ---
+@app.cli.command('bill-rollup')
+@click.argument('action', type=click.Choice(['rebuild', 'check']))
+def bill_rollup_command(action):
+    """Przelicza lub weryfikuje tabelę bill_monthly_rollup."""
+    db.create_all()
+    if action == 'rebuild':
+        rebuild_bill_rollup()
+        print("--- Rollup rachunków przeliczony ---")
+        return
+    mismatches = check_bill_rollup()
+    for item in mismatches:
+        print(f"{item['key']}: oczekiwano={item['expected']} jest={item['stored']}")
+    print(f"--- Niespójne grupy: {len(mismatches)} ---")
+    if mismatches:
+        raise SystemExit(1)
+
+
+@app.cli.command('bill-import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Domyślnie z rozszerzenia pliku.')
+def bill_import_command(path, fmt):
+    """Importuje rachunki z pliku CSV albo NDJSON (category, amount, date[, description])."""
+    db.create_all()
+    try:
+        with open(path, 'rb') as stream:
+            report = import_bills(stream, fmt or import_format(path))
+    except InvalidPageRequest as error:
+        raise click.ClickException(str(error))
+    for item in report['errors']:
+        print(f"linia {item['line']}: {item['error']}")
+    print(f"--- Zaimportowano: {report['imported']}, odrzucono: {report['rejected']} ---")
+
 
 # --- START APLIKACJI I DANE POCZĄTKOWE ---
 if __name__ == '__main__':
     with app.app_context():
         # 1. Tworzenie tabel
         db.create_all()
+        if not BillMonthlyRollup.query.first() and Bill.query.first():
+            print("--- Przeliczam rollup rachunków... ---")
+            rebuild_bill_rollup()
         
         # 2. Tworzenie Roli Manager
         if not Role.query.filter_by(name='Manager').first():
@@ -0,0 +1,96 @@
+from datetime import date
+
+from sqlalchemy import case, delete, insert, select, tuple_, update
+
+from models import db, Task, User, task_assignments
+
+# --- ZBIORCZA ZMIANA ZADAŃ (POST /api/tasks/bulk/) ---
+# Jedna transakcja i stała liczba zapytań niezależnie od liczby pozycji: pola jednym
+# UPDATE ... SET pole = CASE id WHEN ... END, przypisania jako różnica z task_assignments.
+# Błąd w którejkolwiek pozycji odrzuca całą paczkę - nic nie jest zapisywane.
+MAX_BULK_ITEMS = 500
+TASK_FIELDS = ('title', 'description', 'due_date', 'status')
+
+
+class InvalidBulkRequest(ValueError):
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+def _parse_item(index, item):
+    if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+        raise InvalidBulkRequest("Każda pozycja musi mieć liczbowe 'id'.", [{"index": index, "error": "Brak id"}])
+    change = {'id': item['id']}
+    for field in ('title', 'description', 'status'):
+        if item.get(field) is not None:
+            change[field] = str(item[field])
+    if item.get('due_date') is not None:
+        try:
+            change['due_date'] = date.fromisoformat(item['due_date'])
+        except (TypeError, ValueError):
+            raise InvalidBulkRequest("Nieprawidłowa data.", [{"index": index, "id": item['id'], "error": "Zły format due_date"}])
+    if 'assigned_to_ids' in item:
+        user_ids = item['assigned_to_ids']
+        if not isinstance(user_ids, list) or not all(isinstance(pk, int) for pk in user_ids):
+            raise InvalidBulkRequest("assigned_to_ids musi być listą id.", [{"index": index, "id": item['id'], "error": "Złe assigned_to_ids"}])
+        change['assigned_to_ids'] = set(user_ids)
+    return change
+
+
+def parse_bulk(payload):
+    """Lista zmian z żądania albo InvalidBulkRequest (format pozycji)."""
+    if not isinstance(payload, list):
+        raise InvalidBulkRequest("Oczekiwana lista zmian.")
+    if len(payload) > MAX_BULK_ITEMS:
+        raise InvalidBulkRequest(f"Najwyżej {MAX_BULK_ITEMS} pozycji w jednym żądaniu.")
+    return [_parse_item(index, item) for index, item in enumerate(payload)]
+
+
+def apply_bulk(changes):
+    """Sprawdza istnienie zadań i userów, a potem zapisuje całą paczkę w jednej transakcji."""
+    ids = [c['id'] for c in changes]
+    assignments = {c['id']: c['assigned_to_ids'] for c in changes if 'assigned_to_ids' in c}
+    existing = set(db.session.scalars(select(Task.id).where(Task.id.in_(ids))))
+    user_ids = set().union(*assignments.values())
+    existing_users = set(db.session.scalars(select(User.id).where(User.id.in_(user_ids)))) if user_ids else set()
+    errors = []
+    for index, c in enumerate(changes):
+        if c['id'] not in existing:
+            errors.append({"index": index, "id": c['id'], "error": "Zadanie nie istnieje"})
+        elif ids.count(c['id']) > 1:
+            errors.append({"index": index, "id": c['id'], "error": "Zadanie występuje więcej niż raz"})
+        missing = sorted(set(c.get('assigned_to_ids', ())) - existing_users)
+        if missing:
+            errors.append({"index": index, "id": c['id'], "error": f"Nieistniejący użytkownicy: {missing}"})
+    if errors:
+        raise InvalidBulkRequest("Błędne pozycje - nic nie zapisano.", errors)
+
+    values = {}
+    for field in TASK_FIELDS:
+        per_task = {c['id']: c[field] for c in changes if field in c}
+        if per_task:
+            values[field] = case(per_task, value=Task.id, else_=getattr(Task, field))
+    if values:
+        changed_ids = [c['id'] for c in changes if any(field in c for field in TASK_FIELDS)]
+        db.session.execute(update(Task).where(Task.id.in_(changed_ids)).values(**values)
+                           .execution_options(synchronize_session=False))
+    if assignments:
+        current = {}
+        rows = db.session.execute(select(task_assignments.c.task_id, task_assignments.c.user_id)
+                                  .where(task_assignments.c.task_id.in_(assignments)))
+        for task_id, user_id in rows:
+            current.setdefault(task_id, set()).add(user_id)
+        removed = [(task_id, user_id) for task_id, users in current.items() for user_id in users - assignments[task_id]]
+        added = [{"task_id": task_id, "user_id": user_id}
+                 for task_id, users in assignments.items() for user_id in users - current.get(task_id, set())]
+        if removed:
+            db.session.execute(delete(task_assignments).where(
+                tuple_(task_assignments.c.task_id, task_assignments.c.user_id).in_(removed)))
+        if added:
+            db.session.execute(insert(task_assignments), added)
+    db.session.commit()
+    return {
+        "updated": len(changes),
+        "results": [{"id": c['id'], "fields": sorted(k for k in c if k != 'id')} for c in changes],
+    }
@@ -0,0 +1,37 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from models import db, CollectionVersion
+
+# --- CONDITIONAL GET ---
+# ETag = wersja kolekcji + skrót query stringa, więc If-None-Match z aktualną wersją kończy się
+# odpowiedzią 304 po jednym zapytaniu (collection_version), bez zapytania o listę.
+
+
+def collection_etag(name):
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            stamp = db.session.get(CollectionVersion, name)
+            if stamp is None:
+                return view(*args, **kwargs)
+
+            etag = f"{name}-{stamp.version}-{hashlib.sha1(request.query_string).hexdigest()[:12]}"
+            # contains_weak - W/"..." od klienta też pasuje, jak w FastAPI
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            response.last_modified = stamp.updated_at.replace(tzinfo=timezone.utc)
+            # Przeglądarka trzyma odpowiedź, ale zawsze ją rewaliduje
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorator
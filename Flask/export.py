@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date
+
+from flask import Response, request, stream_with_context
+from sqlalchemy import func, select
+
+from models import db, Bill, Task, task_assignments
+from analytics import parse_month
+from pagination import InvalidPageRequest
+
+# --- EKSPORT CSV / NDJSON (/api/bills/export/, /api/tasks/export/) ---
+# Krotki wprost z kursora (execution_options(yield_per=...) - bez obiektów modeli i Marshmallow),
+# zamieniane na tekst paczkami po EXPORT_CHUNK_ROWS i wysyłane od razu; przy Accept-Encoding: gzip
+# każda paczka przechodzi przez jeden strumień zlib. Pamięć nie zależy od liczby wierszy.
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Przypisania jako group_concat id userów (podzapytanie skorelowane) zamiast relacji
+TASK_EXPORT_COLUMNS = (
+    Task.id, Task.title, Task.description, Task.status, Task.due_date,
+    select(func.group_concat(task_assignments.c.user_id)).where(task_assignments.c.task_id == Task.id)
+    .scalar_subquery().label('assigned_to_ids'),
+)
+BILL_EXPORT_COLUMNS = (Bill.id, Bill.category, Bill.amount, Bill.date, Bill.description)
+
+
+def export_format(args):
+    """?output=csv (domyślnie) albo ?output=ndjson."""
+    fmt = args.get('output', 'csv')
+    if fmt not in EXPORT_MIMETYPES:
+        raise InvalidPageRequest(f"output: dozwolone {', '.join(EXPORT_MIMETYPES)}.")
+    return fmt
+
+
+def bill_period(args):
+    """Warunki WHERE dla ?start=RRRR-MM&end=RRRR-MM (miesiące włącznie)."""
+    conditions = []
+    if args.get('start'):
+        first = parse_month(args['start'], 'start')
+        conditions.append(Bill.date >= date(first // 12, first % 12 + 1, 1))
+    if args.get('end'):
+        after = parse_month(args['end'], 'end') + 1
+        conditions.append(Bill.date < date(after // 12, after % 12 + 1, 1))
+    return conditions
+
+
+def _json_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _chunk(rows, columns, fmt, id_lists):
+    """Paczka wierszy jako CSV albo NDJSON; kolumny z `id_lists` (group_concat id) w NDJSON to listy liczb."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+    lines = []
+    for row in rows:
+        item = dict(zip(columns, row))
+        for name in id_lists:
+            item[name] = [int(pk) for pk in item[name].split(',')] if item[name] else []
+        lines.append(json.dumps(item, ensure_ascii=False, default=_json_value) + '\n')
+    return ''.join(lines)
+
+
+def _rows(stmt, columns, fmt, id_lists):
+    if fmt == 'csv':
+        yield _chunk([columns], columns, fmt, ())
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+    for rows in result.partitions():
+        yield _chunk(rows, columns, fmt, id_lists)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: nagłówek gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(stmt, fmt, name, id_lists=()):
+    """Plik <name>.csv/.ndjson z kolumnami zapytania `stmt`, gzip przy Accept-Encoding: gzip."""
+    content = _rows(stmt, [column.name for column in stmt.selected_columns], fmt, id_lists)
+    headers = {'Content-Disposition': f'attachment; filename="{name}.{fmt}"', 'Vary': 'Accept-Encoding'}
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        content = _gzip(content)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(content), mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
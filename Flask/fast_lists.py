@@ -0,0 +1,40 @@
+from sqlalchemy import exists, select
+
+from models import db, Role, Task, User, task_assignments, user_roles
+
+# --- SZYBKA ŚCIEŻKA LISTY ZADAŃ (GET /api/tasks/) ---
+# Strona jako krotki kolumn (bez obiektów modeli i Marshmallow), przypisani userzy jednym zapytaniem
+# dla całej strony zamiast leniwego ładowania assigned_to i roles przy każdym zadaniu. Słowniki mają
+# pola TaskSchema/UserSchema, a kodowanie idzie tym samym app.json (sort_keys, ensure_ascii), więc
+# odpowiedź jest bajt w bajt ta sama - orjson nie escapuje znaków spoza ASCII jak jsonify.
+# ?fields= i ?stream= idą zwykłą ścieżką; app.config['FAST_LIST_RESPONSES'] = False ją wyłącza.
+TASK_ROW_COLUMNS = (Task.id, Task.title, Task.description, Task.due_date, Task.status)
+
+_IS_MANAGER = exists().where(
+    user_roles.c.user_id == User.id, user_roles.c.role_id == Role.id, Role.name == 'Manager',
+).label('is_admin')
+
+
+def task_row_query(filters):
+    """Zapytanie o kolumny zadań - keyset_page czyta z wierszy id i due_date jak z modelu."""
+    return db.session.query(*TASK_ROW_COLUMNS).filter(*filters)
+
+
+def task_rows(rows):
+    """Słowniki jak TaskSchema.dump: daty ISO, assigned_to z is_admin w kolejności id userów."""
+    assigned = {row.id: [] for row in rows}
+    if assigned:
+        users = db.session.execute(
+            select(task_assignments.c.task_id, User.id, User.username, User.first_name, User.last_name, _IS_MANAGER)
+            .join(User, User.id == task_assignments.c.user_id)
+            .where(task_assignments.c.task_id.in_(assigned))
+            .order_by(task_assignments.c.task_id, User.id)
+        )
+        for task_id, user_id, username, first_name, last_name, is_admin in users:
+            assigned[task_id].append({'id': user_id, 'username': username, 'first_name': first_name,
+                                      'last_name': last_name, 'is_admin': bool(is_admin)})
+    return [{
+        'id': row.id, 'title': row.title, 'description': row.description,
+        'due_date': row.due_date.isoformat() if row.due_date else None,
+        'status': row.status, 'assigned_to': assigned[row.id],
+    } for row in rows]
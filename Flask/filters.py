@@ -0,0 +1,62 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from models import Task, task_assignments
+from pagination import InvalidPageRequest
+
+# --- FILTRY LISTY ZADAŃ ---
+# ?status=done,in_process&assigned_to=3,4&due_after=&due_before=&ids=1,2 - każdy filtr ma indeks:
+# ix_task_status, ix_task_due_date, klucz główny task_assignments (user_id, ...) i klucz task.
+# Daty są włącznie; zadania bez terminu odpadają przy filtrze po dacie.
+TASK_STATUSES = ('not_started', 'in_process', 'done')
+MAX_FILTER_IDS = 500
+
+
+def _id_list(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise InvalidPageRequest(f"{name}: wymagana lista liczb oddzielonych przecinkami.")
+    if len(ids) > MAX_FILTER_IDS:
+        raise InvalidPageRequest(f"{name}: najwyżej {MAX_FILTER_IDS} id.")
+    return ids
+
+
+def _date(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidPageRequest(f"{name}: wymagana data RRRR-MM-DD.")
+
+
+def task_filters(args):
+    """Warunki WHERE dla listy zadań z request.args."""
+    conditions = []
+    statuses = args.get('status')
+    if statuses is not None:
+        statuses = [s for s in statuses.split(',') if s]
+        unknown = sorted(set(statuses) - set(TASK_STATUSES))
+        if unknown:
+            raise InvalidPageRequest(f"Nieznane statusy: {', '.join(unknown)}.")
+        conditions.append(Task.status.in_(statuses))
+    user_ids = _id_list(args, 'assigned_to')
+    if user_ids is not None:
+        # Podzapytanie zamiast JOIN - zadanie z kilkoma pasującymi userami nie powtarza się
+        conditions.append(Task.id.in_(
+            select(task_assignments.c.task_id).where(task_assignments.c.user_id.in_(user_ids))))
+    due_after, due_before = _date(args, 'due_after'), _date(args, 'due_before')
+    if due_after:
+        conditions.append(Task.due_date >= due_after)
+    if due_before:
+        conditions.append(Task.due_date <= due_before)
+    ids = _id_list(args, 'ids')
+    if ids is not None:
+        conditions.append(Task.id.in_(ids))
+    return conditions
@@ -0,0 +1,102 @@
+import codecs
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert
+
+from models import db, Bill
+from pagination import InvalidPageRequest
+
+# --- IMPORT RACHUNKÓW (POST /api/bills/import/, flask bill-import) ---
+# Plik czytany strumieniowo, linia po linii; poprawne wiersze trafiają do bazy paczkami po
+# IMPORT_BATCH (jedno executemany i jeden commit na paczkę), więc pamięć nie rośnie
+# z rozmiarem pliku. Błędny wiersz jest odrzucany i raportowany (numer linii + powód),
+# a import trwa dalej. Kolumny: category, amount, date (RRRR-MM-DD), opcjonalnie description.
+IMPORT_BATCH = 5000
+MAX_REPORTED_ERRORS = 100
+IMPORT_COLUMNS = ('category', 'amount', 'date')
+IMPORT_FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson',
+                  'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}
+MAX_CATEGORY_LENGTH = Bill.__table__.c.category.type.length
+MAX_DESCRIPTION_LENGTH = Bill.__table__.c.description.type.length
+
+
+def import_format(name, content_type=''):
+    """csv/ndjson z rozszerzenia pliku albo typu treści."""
+    extension = name[name.rfind('.'):].lower() if '.' in name else ''
+    fmt = IMPORT_FORMATS.get(extension) or IMPORT_FORMATS.get(content_type.split(';')[0].strip())
+    if fmt is None:
+        raise InvalidPageRequest("Oczekiwany plik .csv albo .ndjson.")
+    return fmt
+
+
+def _records(lines, fmt):
+    """(numer linii, słownik pól) - dla linii NDJSON, która nie jest obiektem JSON, słownik to None."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        missing = [column for column in IMPORT_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise InvalidPageRequest(f"Brak kolumn: {', '.join(missing)}.")
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+
+def _clean(record):
+    """Wiersz tabeli bill albo ValueError z powodem odrzucenia."""
+    if record is None:
+        raise ValueError('Linia nie jest obiektem JSON.')
+    category = str(record.get('category') or '').strip()
+    if not category or len(category) > MAX_CATEGORY_LENGTH:
+        raise ValueError(f'category: wymagane, najwyżej {MAX_CATEGORY_LENGTH} znaków.')
+    try:
+        amount = Decimal(str(record.get('amount')).strip())
+    except InvalidOperation:
+        raise ValueError('amount: oczekiwana liczba.')
+    if not amount.is_finite() or amount.as_tuple().exponent < -2:
+        raise ValueError('amount: liczba, najwyżej 2 miejsca po przecinku.')
+    try:
+        day = date.fromisoformat(str(record.get('date')).strip())
+    except ValueError:
+        raise ValueError('date: oczekiwana data RRRR-MM-DD.')
+    description = str(record.get('description') or '').strip() or None
+    if description and len(description) > MAX_DESCRIPTION_LENGTH:
+        raise ValueError(f'description: najwyżej {MAX_DESCRIPTION_LENGTH} znaków.')
+    return {'category': category, 'amount': float(amount), 'date': day, 'year': day.year,
+            'description': description}
+
+
+def _insert(rows, report):
+    db.session.execute(insert(Bill), rows)
+    db.session.commit()
+    report['imported'] += len(rows)
+    report['batches'] += 1
+
+
+def import_bills(stream, fmt):
+    """Importuje rachunki z binarnego strumienia (plik, upload) i zwraca raport importu."""
+    report = {'imported': 0, 'rejected': 0, 'batches': 0, 'errors': []}
+    batch = []
+    for number, record in _records(codecs.iterdecode(stream, 'utf-8-sig', errors='replace'), fmt):
+        try:
+            batch.append(_clean(record))
+        except ValueError as error:
+            report['rejected'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': number, 'error': str(error)})
+            continue
+        if len(batch) == IMPORT_BATCH:
+            _insert(batch, report)
+            batch = []
+    if batch:
+        _insert(batch, report)
+    return report
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin  # <--- WAŻNE: To pozwala na logowanie sesyjne
+from sqlalchemy import DDL, event, func, extract
 
 db = SQLAlchemy()
 
@@ -14,9 +15,11 @@ user_roles = db.Table('user_roles',
 
 # 2. Tabela łącząca Zadania z Użytkownikami (Wiele-do-Wielu)
 # Jedno zadanie może robić wiele osób, jedna osoba ma wiele zadań.
+# Klucz główny (user_id, task_id) obsługuje "zadania usera"; indeks (task_id, user_id) - "userzy zadania".
 task_assignments = db.Table('task_assignments',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('task_id', db.Integer, db.ForeignKey('task.id'), primary_key=True)
+    db.Column('task_id', db.Integer, db.ForeignKey('task.id'), primary_key=True),
+    db.Index('ix_task_assignments_task_user', 'task_id', 'user_id'),
 )
 
 # --- MODELE ---
@@ -50,6 +53,9 @@ class User(UserMixin, db.Model): # <--- Dziedziczenie po UserMixin jest kluczowe
         return self.username
 
 class Task(db.Model):
+    # Filtry listy zadań (filters.py)
+    __table_args__ = (db.Index('ix_task_status', 'status'), db.Index('ix_task_due_date', 'due_date'))
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -65,6 +71,8 @@ class Task(db.Model):
         return self.title
 
 class Bill(db.Model):
+    __table_args__ = (db.Index('ix_bill_category_date', 'category', 'date'),)
+
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(50), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -75,6 +83,30 @@ class Bill(db.Model):
     def __str__(self):
         return f"{self.category} - {self.date}"
 
+class BillMonthlyRollup(db.Model):
+    # Sumy rachunków per (rok, miesiąc, kategoria) - aktualizowane przez triggery na tabeli bill
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    min_amount = db.Column(db.Float)
+    max_amount = db.Column(db.Float)
+
+class CollectionVersion(db.Model):
+    # Licznik zmian kolekcji API (tasks, users, bills) - źródło ETag/Last-Modified, podbijany triggerami
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+class TaskChange(db.Model):
+    # Dziennik zmian zadań dla delta sync (/api/tasks/changes/): ostatnia wersja każdego zadania
+    # i tombstone (deleted) po usunięciu. Bez FK - wpis przeżywa usunięte zadanie. Utrzymywany triggerami.
+    __table_args__ = (db.Index('ix_task_change_version', 'version', 'task_id'),)
+    task_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+
 class BusinessDefinition(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     term = db.Column(db.String(200), nullable=False)
@@ -90,4 +122,196 @@ class Employee(db.Model):
     email = db.Column(db.String(120), nullable=False)
 
     def __str__(self):
-        return f"{self.first_name} {self.last_name}"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name}"
+
+
+# --- TRIGGERY ROLLUPU RACHUNKÓW ---
+# Działają w SQLite, więc obejmują API, Flask-Admin i masowe importy.
+# Przy usunięciu/zmianie min/max liczymy od nowa tylko dla jednej grupy (indeks category+date).
+def _rollup_key(row):
+    # %% - DDL() formatuje treść operatorem %
+    return f"CAST(strftime('%%Y', {row}.date) AS INTEGER), CAST(strftime('%%m', {row}.date) AS INTEGER), {row}.category"
+
+def _rollup_add(row):
+    return f"""
+    INSERT INTO bill_monthly_rollup (year, month, category, total, count, min_amount, max_amount)
+    VALUES ({_rollup_key(row)}, {row}.amount, 1, {row}.amount, {row}.amount)
+    ON CONFLICT (year, month, category) DO UPDATE SET
+        total = total + excluded.total,
+        count = count + 1,
+        min_amount = MIN(min_amount, excluded.min_amount),
+        max_amount = MAX(max_amount, excluded.max_amount);"""
+
+def _rollup_remove(row):
+    group = (f"category = {row}.category AND date >= date({row}.date, 'start of month') "
+             f"AND date < date({row}.date, 'start of month', '+1 month')")
+    key = f"(year, month, category) = ({_rollup_key(row)})"
+    return f"""
+    UPDATE bill_monthly_rollup SET
+        total = total - {row}.amount,
+        count = count - 1,
+        min_amount = CASE WHEN {row}.amount > min_amount THEN min_amount
+                          ELSE (SELECT MIN(amount) FROM bill WHERE {group}) END,
+        max_amount = CASE WHEN {row}.amount < max_amount THEN max_amount
+                          ELSE (SELECT MAX(amount) FROM bill WHERE {group}) END
+    WHERE {key};
+    DELETE FROM bill_monthly_rollup WHERE {key} AND count <= 0;"""
+
+for _trigger in (
+    f"CREATE TRIGGER bill_rollup_insert AFTER INSERT ON bill BEGIN {_rollup_add('NEW')} END",
+    f"CREATE TRIGGER bill_rollup_delete AFTER DELETE ON bill BEGIN {_rollup_remove('OLD')} END",
+    f"CREATE TRIGGER bill_rollup_update AFTER UPDATE OF category, amount, date ON bill "
+    f"BEGIN {_rollup_remove('OLD')} {_rollup_add('NEW')} END",
+):
+    event.listen(BillMonthlyRollup.__table__, 'after_create', DDL(_trigger))
+
+
+# --- TRIGGERY WERSJI KOLEKCJI ---
+# Każdy zapis widoczny w liście podbija wersję kolekcji - także z Flask-Admin i masowych importów.
+# Lista zadań zawiera przypisanych userów (z is_admin), więc zmiany user/user_roles/role unieważniają też 'tasks'.
+COLLECTIONS = ('tasks', 'users', 'bills')
+
+def _bump_versions(*names):
+    names = ", ".join(f"'{name}'" for name in names)
+    return (f"UPDATE collection_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE name IN ({names});")
+
+_VERSION_TRIGGERS = [
+    ('task', ('INSERT', 'UPDATE', 'DELETE'), ('tasks',)),
+    ('task_assignments', ('INSERT', 'DELETE'), ('tasks',)),
+    ('user', ('INSERT', 'UPDATE OF username, first_name, last_name', 'DELETE'), ('users', 'tasks')),
+    ('user_roles', ('INSERT', 'DELETE'), ('users', 'tasks')),
+    ('role', ('UPDATE OF name', 'DELETE'), ('users', 'tasks')),
+    ('bill', ('INSERT', 'UPDATE', 'DELETE'), ('bills',)),
+]
+
+# Na metadata (po utworzeniu wszystkich tabel) i idempotentnie - create_all działa też na istniejącej bazie
+event.listen(db.metadata, 'after_create', DDL(
+    "INSERT OR IGNORE INTO collection_version (name, version, updated_at) VALUES "
+    + ", ".join(f"('{name}', 0, CURRENT_TIMESTAMP)" for name in COLLECTIONS)
+))
+for _table, _events, _names in _VERSION_TRIGGERS:
+    for _event in _events:
+        event.listen(db.metadata, 'after_create', DDL(
+            f'CREATE TRIGGER IF NOT EXISTS {_table}_version_{_event.split()[0].lower()} AFTER {_event} ON "{_table}" '
+            f'BEGIN {_bump_versions(*_names)} END'
+        ))
+
+# create_all pomija istniejące tabele razem z ich indeksami - dokładamy nowe indeksy do starych baz
+LATE_INDEXES = (*Task.__table__.indexes, *task_assignments.indexes, *Bill.__table__.indexes)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_late_indexes(target, connection, **kw):
+    for index in LATE_INDEXES:
+        index.create(connection, checkfirst=True)
+
+
+# --- TRIGGERY DZIENNIKA ZMIAN ZADAŃ ---
+# Każda zmiana zadania (także przypisań, userów i ról widocznych w liście) dostaje nową,
+# rosnącą wersję w task_change; usunięcie zostawia tombstone (deleted = 1).
+def _touch_tasks(select_task_ids):
+    return f"""
+    INSERT INTO task_change (task_id, version, deleted)
+    SELECT changed.task_id, (SELECT COALESCE(MAX(version), 0) + 1 FROM task_change),
+           NOT EXISTS (SELECT 1 FROM task WHERE task.id = changed.task_id)
+    FROM ({select_task_ids}) AS changed WHERE true
+    ON CONFLICT (task_id) DO UPDATE SET version = excluded.version, deleted = excluded.deleted;"""
+
+_USER_TASKS = "SELECT task_id FROM task_assignments WHERE user_id = {user}"
+_TASK_CHANGE_TRIGGERS = [
+    ('task_change_insert', 'AFTER INSERT ON task', 'SELECT NEW.id AS task_id'),
+    ('task_change_update', 'AFTER UPDATE ON task', 'SELECT NEW.id AS task_id'),
+    ('task_change_delete', 'AFTER DELETE ON task', 'SELECT OLD.id AS task_id'),
+    ('task_assignments_change_insert', 'AFTER INSERT ON task_assignments', 'SELECT NEW.task_id AS task_id'),
+    ('task_assignments_change_delete', 'AFTER DELETE ON task_assignments', 'SELECT OLD.task_id AS task_id'),
+    ('user_task_change_update', 'AFTER UPDATE OF username, first_name, last_name ON "user"',
+     _USER_TASKS.format(user='NEW.id')),
+    ('user_roles_task_change_insert', 'AFTER INSERT ON user_roles', _USER_TASKS.format(user='NEW.user_id')),
+    ('user_roles_task_change_delete', 'AFTER DELETE ON user_roles', _USER_TASKS.format(user='OLD.user_id')),
+    ('role_task_change_update', 'AFTER UPDATE OF name ON role',
+     'SELECT task_id FROM task_assignments WHERE user_id IN (SELECT user_id FROM user_roles WHERE role_id = NEW.id)'),
+]
+
+# Istniejące zadania przy pierwszym starcie: wersja = id, więc sync bez `since` zwraca wszystkie
+event.listen(db.metadata, 'after_create', DDL(
+    "INSERT INTO task_change (task_id, version, deleted) SELECT id, id, 0 FROM task "
+    "WHERE NOT EXISTS (SELECT 1 FROM task_change)"
+))
+for _name, _event, _select in _TASK_CHANGE_TRIGGERS:
+    event.listen(db.metadata, 'after_create', DDL(
+        f'CREATE TRIGGER IF NOT EXISTS {_name} {_event} BEGIN {_touch_tasks(_select)} END'
+    ))
+
+
+# --- WYSZUKIWANIE PEŁNOTEKSTOWE (FTS5) ---
+# Indeksy FTS5 (external content) dla zadań i słownika, synchronizowane triggerami; zapytania w search.py.
+# (tabela, kolumny) - pierwsza kolumna to tytuł/termin, druga to treść
+SEARCH_TABLES = [
+    ('task', ('title', 'description')),
+    ('business_definition', ('term', 'definition')),
+]
+
+
+def _fts_triggers(table, columns):
+    fts, cols = f'{table}_fts', ', '.join(columns)
+    delete_old = (f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES "
+                  f"('delete', OLD.id, {', '.join(f'OLD.{c}' for c in columns)});")
+    insert_new = f"INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.id, {', '.join(f'NEW.{c}' for c in columns)});"
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN {delete_old} {insert_new} END',
+    ]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_indexes(target, connection, **kw):
+    for table, columns in SEARCH_TABLES:
+        fts = f'{table}_fts'
+        # Wypełnienie (rebuild) tylko przy tworzeniu indeksu - potem dbają o niego triggery
+        if connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).first() is None:
+            # prefix: indeksy prefiksów 2-4 znaków - zapytania "fakt*" bez przeglądania całego słownika
+            connection.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')")
+            connection.exec_driver_sql(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+            connection.exec_driver_sql(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        for statement in _fts_triggers(table, columns):
+            connection.exec_driver_sql(statement)
+
+
+def _bill_groups():
+    year = extract('year', Bill.date)
+    month = extract('month', Bill.date)
+    return db.session.query(
+        year, month, Bill.category, func.sum(Bill.amount), func.count(Bill.id),
+        func.min(Bill.amount), func.max(Bill.amount)
+    ).group_by(year, month, Bill.category)
+
+def rebuild_bill_rollup():
+    """Przelicza całą tabelę bill_monthly_rollup z tabeli bill."""
+    BillMonthlyRollup.query.delete()
+    db.session.execute(BillMonthlyRollup.__table__.insert().from_select(
+        ['year', 'month', 'category', 'total', 'count', 'min_amount', 'max_amount'], _bill_groups().statement
+    ))
+    db.session.commit()
+
+def check_bill_rollup():
+    """Zwraca grupy, w których rollup różni się od GROUP BY na tabeli bill."""
+    expected = {tuple(row[:3]): tuple(row[3:]) for row in _bill_groups()}
+    stored = {
+        (r.year, r.month, r.category): (r.total, r.count, r.min_amount, r.max_amount)
+        for r in BillMonthlyRollup.query.all()
+    }
+    return [
+        {'key': key, 'expected': expected.get(key), 'stored': stored.get(key)}
+        for key in sorted(expected.keys() | stored.keys())
+        if _rollup_differs(expected.get(key), stored.get(key))
+    ]
+
+def _rollup_differs(expected, stored):
+    if expected is None or stored is None:
+        return True
+    (total, count, low, high), (s_total, s_count, s_low, s_high) = expected, stored
+    return count != s_count or any(abs(a - b) > 0.005 for a, b in ((total, s_total), (low, s_low), (high, s_high)))
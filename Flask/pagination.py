@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import and_, func, or_
+
+# --- PAGINACJA KURSOREM (KEYSET) ---
+# Kolejna strona to WHERE (due_date, id) > (ostatni wiersz) zamiast OFFSET, więc koszt
+# zapytania nie rośnie z numerem strony. Zadania bez terminu są na końcu.
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(ordering, values):
+    raw = json.dumps({"o": ordering, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["o"] != ordering:
+            raise ValueError
+        return data["v"]
+    except (ValueError, KeyError, TypeError):
+        raise InvalidPageRequest("Nieprawidłowy kursor.")
+
+
+def decode_changes_token(since):
+    """(wersja, task_id) z tokenu delta sync ?since=; bez tokenu - od początku dziennika."""
+    if not since:
+        return 0, 0
+    values = decode_cursor(since, "changes")
+    if not (isinstance(values, list) and len(values) == 2 and all(type(value) is int for value in values)):
+        raise InvalidPageRequest("Nieprawidłowy token.")
+    return values
+
+
+def keyset_page(query, model, args, orderings=("id",)):
+    """Zwraca (wiersze, next_cursor) dla parametrów ?cursor=&limit=&ordering= z request.args."""
+    ordering = args.get('ordering', orderings[0])
+    if ordering not in orderings:
+        raise InvalidPageRequest(f"Dozwolone sortowanie: {', '.join(orderings)}.")
+    limit = args.get('limit', PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if ordering == 'due_date':
+        query = query.order_by(model.due_date.asc().nulls_last(), model.id)
+    else:
+        query = query.order_by(model.id)
+
+    cursor = args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, ordering)
+        try:
+            query = query.filter(_after(model, ordering, values))
+        except (ValueError, TypeError):
+            # Kursor da się zdekodować, ale wartości nie pasują (podrobiony albo z innej wersji API)
+            raise InvalidPageRequest("Nieprawidłowy kursor.")
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        if ordering == 'due_date':
+            position = [last.due_date.isoformat() if last.due_date else None, last.id]
+        else:
+            position = [last.id]
+        next_cursor = encode_cursor(ordering, position)
+    return rows[:limit], next_cursor
+
+
+def _after(model, ordering, values):
+    """Warunek "za ostatnim wierszem poprzedniej strony" z wartości kursora."""
+    if ordering == 'due_date':
+        due, last_id = values
+        last_id = int(last_id)
+        if due is None:
+            return and_(model.due_date.is_(None), model.id > last_id)
+        due = date.fromisoformat(due)
+        return or_(
+            model.due_date > due,
+            and_(model.due_date == due, model.id > last_id),
+            model.due_date.is_(None),
+        )
+    (last_id,) = values
+    return model.id > int(last_id)
+
+
+def task_changes_page(model, args):
+    """Delta sync: (zmiany, next_token, has_more) po tokenie ?since= (wersja, task_id) z dziennika zmian."""
+    limit = max(1, min(args.get('limit', PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    since = args.get('since')
+    version, last_id = decode_changes_token(since)
+    rows = (model.query
+            .filter(or_(model.version > version, and_(model.version == version, model.task_id > last_id)))
+            .order_by(model.version, model.task_id)
+            .limit(limit + 1).all())
+    if not rows and version > (model.query.with_entities(func.max(model.version)).scalar() or 0):
+        # Token spoza dziennika (np. z odtworzonej bazy) - bez błędu klient nie dostałby już żadnych zmian
+        raise InvalidPageRequest("Token nowszy niż dziennik zmian - zsynchronizuj od nowa bez since.")
+    changes = rows[:limit]
+    if changes:
+        next_token = encode_cursor("changes", [changes[-1].version, changes[-1].task_id])
+    else:
+        next_token = since or encode_cursor("changes", [0, 0])
+    return changes, next_token, len(rows) > limit
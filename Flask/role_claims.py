@@ -0,0 +1,67 @@
+import time
+
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import PASSIVE_NO_INITIALIZE, get_history
+
+from models import Role, User
+
+# --- ROLE W TOKENIE JWT ---
+# Role usera są podpisane w tokenie (claimy roles/roles_at), więc sprawdzenie uprawnień
+# nie pyta bazy. Zmiana ról usera, jego usunięcie albo zmiana samej roli zapisuje czas
+# zmiany, a tokeny wydane wcześniej są odrzucane (token_in_blocklist_loader w app.py).
+# Stan jest w pamięci procesu - przy kilku workerach potrzebny byłby wspólny magazyn.
+ALL_USERS = None
+roles_changed_at = {}
+
+
+def role_claims(user):
+    return {"roles": [role.name for role in user.roles], "roles_at": time.time()}
+
+
+def has_role_claim(role_name):
+    return role_name in get_jwt().get("roles", ())
+
+
+def mark_roles_changed(user_id=ALL_USERS):
+    roles_changed_at[user_id] = time.time()
+
+
+def claims_revoked(jwt_payload):
+    roles_at = jwt_payload.get("roles_at")
+    if roles_at is None:
+        return True
+    user_id = int(jwt_payload["sub"])
+    return roles_at < max(roles_changed_at.get(user_id, 0.0), roles_changed_at.get(ALL_USERS, 0.0))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_role_changes(session, flush_context):
+    # after_flush widzi jeszcze historię atrybutów sprzed flush; PASSIVE_NO_INITIALIZE - bez doczytywania kolekcji
+    changed = session.info.setdefault("roles_changed", set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and get_history(obj, "roles", PASSIVE_NO_INITIALIZE).has_changes():
+            changed.add(obj.id)
+        elif isinstance(obj, Role):
+            if get_history(obj, "name").has_changes():
+                changed.add(ALL_USERS)
+            history = get_history(obj, "users", PASSIVE_NO_INITIALIZE)
+            changed.update(user.id for user in history.added + history.deleted)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+        elif isinstance(obj, Role):
+            changed.add(ALL_USERS)
+
+
+@event.listens_for(Session, "after_commit")
+def _revoke_role_claims(session):
+    # Dopiero po commicie - token wydany przed commitem i tak widział stare role
+    for user_id in session.info.pop("roles_changed", ()):
+        mark_roles_changed(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_role_changes(session):
+    session.info.pop("roles_changed", None)
@@ -0,0 +1,62 @@
+import html
+import re
+
+from sqlalchemy import text
+
+from models import db
+from pagination import InvalidPageRequest
+
+# --- WYSZUKIWANIE (/api/search/?q=) ---
+# Zadania i słownik z indeksów FTS5 (models.SEARCH_TABLES) w jednym zapytaniu, od najlepszego
+# dopasowania (bm25). Każde słowo zapytania to prefiks, wszystkie są wymagane.
+SEARCH_SOURCES = [('task', 'task_fts'), ('definition', 'business_definition_fts')]
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_TERMS = 8
+# bm25 potrzebuje statystyk każdego trafienia - dla słowa z każdego dokumentu to setki ms.
+# Ranking obejmuje więc tylko SEARCH_CANDIDATES najnowszych (najwyższe id) trafień z tabeli;
+# gdy któraś tabela ma ich więcej, odpowiedź ma truncated = true (starsze trafienia pominięte).
+SEARCH_CANDIDATES = 2000
+
+
+def _first_skipped(fts):
+    # Najnowsze trafienie spoza SEARCH_CANDIDATES (NULL, gdy ranking obejmuje wszystkie)
+    return f"SELECT rowid FROM {fts} WHERE {fts} MATCH :query ORDER BY rowid DESC LIMIT 1 OFFSET :candidates"
+
+
+SEARCH_SQL = text(
+    "SELECT hits.*, (" + " OR ".join(f"({_first_skipped(fts)}) IS NOT NULL" for _, fts in SEARCH_SOURCES)
+    + ") AS truncated FROM (" + " UNION ALL ".join(f"""
+    SELECT * FROM (
+        SELECT '{kind}' AS type, rowid AS id,
+               highlight({fts}, 0, char(2), char(3)) AS title,
+               snippet({fts}, 1, char(2), char(3), '…', 16) AS snippet,
+               rank AS score
+        FROM {fts}
+        WHERE {fts} MATCH :query AND rowid > COALESCE(({_first_skipped(fts)}), 0)
+        ORDER BY rank LIMIT :limit)""" for kind, fts in SEARCH_SOURCES) + ") AS hits ORDER BY score LIMIT :limit")
+
+
+def match_expression(query):
+    """'fakt klie' -> '"fakt"* "klie"*'."""
+    terms = re.findall(r'\w+', query or '')[:MAX_QUERY_TERMS]
+    if not terms:
+        raise InvalidPageRequest("Podaj co najmniej jedno słowo.")
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def highlight(value):
+    # Znaczniki \x02/\x03 z snippet()/highlight() zamieniamy na <mark> dopiero po escape'owaniu HTML
+    return html.escape(value or '').replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+
+def search(args):
+    limit = max(1, min(args.get('limit', SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+    rows = db.session.execute(SEARCH_SQL, {
+        'query': match_expression(args.get('q')), 'candidates': SEARCH_CANDIDATES, 'limit': limit,
+    }).all()
+    results = [
+        {'type': kind, 'id': pk, 'title': highlight(title), 'snippet': highlight(snippet), 'score': round(score, 4)}
+        for kind, pk, title, snippet, score, _ in rows
+    ]
+    return results, bool(rows and rows[0].truncated)
@@ -11,6 +11,8 @@ class RoleSchema(ma.SQLAlchemyAutoSchema):
 class UserSchema(ma.SQLAlchemyAutoSchema):
     # We add a custom field 'is_admin' for React
     is_admin = fields.Method("get_is_admin")
+    # Relacje potrzebne polom wyliczanym (sparse fieldsets ładują je tylko dla tych pól)
+    load_relations = {"is_admin": ("roles",)}
 
     def get_is_admin(self, obj):
         # Returns True if user has 'Manager' role
@@ -0,0 +1,66 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+from marshmallow import fields
+
+from pagination import InvalidPageRequest
+
+# --- SPARSE FIELDSETS (?fields=id,title,assigned_to.first_name) ---
+# Marshmallow dostaje only= (kropka = pole zagnieżdżone, samo `assigned_to` = cały UserSchema),
+# a zapytanie load_only() z tymi kolumnami i selectinload tylko żądanych relacji.
+
+
+def parse_fields(value):
+    tree = {}
+    for path in filter(None, (part.strip() for part in value.split(','))):
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _validate(schema, tree, prefix=''):
+    readable = {name for name, field in schema.fields.items() if not field.load_only}
+    unknown = sorted(prefix + name for name in set(tree) - readable)
+    if unknown:
+        raise InvalidPageRequest(f"Nieznane pola: {', '.join(unknown)}.")
+    for name, subtree in tree.items():
+        if subtree:
+            field = schema.fields[name]
+            if not isinstance(field, fields.Nested):
+                raise InvalidPageRequest(f"Pole {prefix}{name} nie ma pól zagnieżdżonych.")
+            _validate(field.schema, subtree, f'{prefix}{name}.')
+
+
+def _paths(tree, prefix=''):
+    for name, subtree in tree.items():
+        if subtree:
+            yield from _paths(subtree, f'{prefix}{name}.')
+        else:
+            yield prefix + name
+
+
+def _load_options(model, schema, tree, keep=()):
+    mapper = inspect(model)
+    names = set(tree or (name for name, field in schema.fields.items() if not field.load_only))
+    columns = [getattr(model, name) for name in names | set(keep) if name in mapper.column_attrs.keys()]
+    options = [load_only(*(columns or [getattr(model, mapper.primary_key[0].key)]))]
+    # Pola wyliczane (np. is_admin) deklarują w schemacie relacje, których potrzebują
+    relations = set(names) | {rel for name in names for rel in getattr(schema, 'load_relations', {}).get(name, ())}
+    for rel in mapper.relationships:
+        if rel.key in relations:
+            loader = selectinload(getattr(model, rel.key))
+            field = schema.fields.get(rel.key)
+            if isinstance(field, fields.Nested):
+                loader = loader.options(*_load_options(rel.mapper.class_, field.schema, tree.get(rel.key)))
+            options.append(loader)
+    return options
+
+
+def sparse_fields(schema_class, model, args, keep=()):
+    """(schemat many=True z only=, opcje zapytania) dla ?fields= albo (None, None) bez parametru."""
+    value = args.get('fields')
+    if not value:
+        return None, None
+    tree = parse_fields(value)
+    _validate(schema_class(), tree)
+    return schema_class(many=True, only=tuple(_paths(tree))), _load_options(model, schema_class(), tree, keep)
@@ -0,0 +1,38 @@
+import json
+
+from flask import Response, stream_with_context
+
+from models import db
+
+# --- STREAMING (?stream=ndjson|json) ---
+# Wiersze pobierane paczkami (WHERE id > ostatnie id) i wysyłane od razu po serializacji.
+# Po każdej paczce czyścimy sesję, więc pamięć nie rośnie z rozmiarem tabeli.
+STREAM_BATCH_SIZE = 500
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def stream_rows(query, model, schema, fmt):
+    def generate():
+        last_id = 0
+        first = True
+        if fmt == 'json':
+            yield '['
+        while True:
+            rows = query.filter(model.id > last_id).order_by(model.id).limit(STREAM_BATCH_SIZE).all()
+            if not rows:
+                break
+            items = [json.dumps(item, ensure_ascii=False) for item in schema.dump(rows)]
+            if fmt == 'ndjson':
+                yield ''.join(item + '\n' for item in items)
+            else:
+                yield ('' if first else ',') + ','.join(items)
+            first = False
+            last_id = rows[-1].id
+            db.session.expunge_all()
+        if fmt == 'json':
+            yield ']'
+
+    return Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[fmt])
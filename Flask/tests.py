@@ -0,0 +1,630 @@
+"""
+Testy API Flask: cd Flask && python -m unittest tests
+
+Baza SQLite w katalogu tymczasowym; setUpModule tworzy tabele, rolę Manager, admina i adama
+tak jak start aplikacji (app.py, __main__).
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+_tmpdir = tempfile.TemporaryDirectory(prefix="flask-tests-")
+os.environ["FLASK_DATABASE_URL"] = f"sqlite:///{_tmpdir.name}/test.db"
+
+import numpy as np  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import analytics  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Role, User, check_bill_rollup  # noqa: E402
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor  # noqa: E402
+from streaming import STREAM_BATCH_SIZE, STREAM_MIMETYPES  # noqa: E402
+
+
+def setUpModule():
+    with app.app_context():
+        db.create_all()
+        manager = Role(name='Manager', description="Pełny dostęp")
+        db.session.add_all([
+            User(username='admin', password='adminpassword', first_name="Szef", last_name="Systemu", roles=[manager]),
+            User(username='adam', password='password', first_name="Adam", last_name="Kowalski"),
+        ])
+        db.session.commit()
+
+
+def connect():
+    return sqlite3.connect(f"{_tmpdir.name}/test.db")
+
+
+def ndjson(data):
+    # Tylko "\n" - splitlines() dzieli też na U+2028
+    return [json.loads(line) for line in data.decode().split("\n") if line]
+
+
+@contextmanager
+def recorded_statements():
+    """Lista instrukcji SQL (z parametrami) wykonanych w bloku."""
+    statements = []
+    record = lambda conn, cursor, statement, parameters, *args: statements.append((statement, parameters))
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+class ApiTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.test_client()
+        cls.headers = cls.login('admin', 'adminpassword')
+        cls.users = [u['id'] for u in cls.client.get('/api/users/', headers=cls.headers).json['results']]
+        cls.tasks = [
+            cls.client.post('/api/tasks/', json={'title': f"Zadanie {i}", 'description': "Opis",
+                                                 'assigned_to_ids': cls.users}, headers=cls.headers).json['id']
+            for i in range(5)
+        ]
+
+    @classmethod
+    def login(cls, username, password):
+        token = cls.client.post('/api/token/', json={'username': username, 'password': password}).json
+        return {'Authorization': f"Bearer {token['access_token']}"}
+
+    def get(self, path, **params):
+        response = self.client.get(path, query_string=params, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response
+
+
+class ConditionalGetTests(ApiTestCase):
+    """ETag kolekcji (conditional.py): 304 bez zapytania o listę, nowa wersja po każdej zmianie widocznej w liście."""
+
+    def etag(self, path='/api/tasks/', **params):
+        response = self.get(path, **params)
+        self.assertIn('Last-Modified', response.headers)
+        return response.headers['ETag']
+
+    def revalidate(self, path, etag):
+        return self.client.get(path, headers={**self.headers, 'If-None-Match': etag}).status_code
+
+    def test_not_modified(self):
+        for path in ('/api/tasks/', '/api/users/', '/api/bills/'):
+            etag = self.etag(path)
+            with recorded_statements() as statements:
+                self.assertEqual(self.revalidate(path, etag), 304, path)
+            self.assertEqual(len(statements), 1, statements)
+            self.assertIn('FROM collection_version', statements[0][0])
+            self.assertEqual(self.revalidate(path, f'W/{etag}'), 304, path)
+
+    def test_query_string_is_part_of_etag(self):
+        self.assertNotEqual(self.etag(), self.etag(ordering='due_date'))
+
+    def test_writes_change_etag(self):
+        etag = self.etag()
+        self.client.patch(f'/api/tasks/{self.tasks[0]}/', json={'status': 'done'}, headers=self.headers)
+        self.assertEqual(self.revalidate('/api/tasks/', etag), 200)
+        etag = self.etag()
+        self.client.patch(f'/api/tasks/{self.tasks[0]}/', json={'assigned_to_ids': self.users[:1]}, headers=self.headers)
+        self.assertNotEqual(self.etag(), etag)
+
+        etags = self.etag(), self.etag('/api/users/')
+        with connect() as conn:
+            conn.execute("UPDATE user SET first_name = 'Adaś' WHERE username = 'adam'")
+        self.assertEqual([self.revalidate('/api/tasks/', etags[0]), self.revalidate('/api/users/', etags[1])], [200, 200])
+
+        etag = self.etag('/api/bills/')
+        with connect() as conn:
+            conn.execute("INSERT INTO bill (category, amount, date, year) VALUES ('Prąd', 10, '2025-03-01', 2025)")
+        self.assertEqual(self.revalidate('/api/bills/', etag), 200)
+
+
+class SparseFieldsTests(ApiTestCase):
+    """?fields= zawęża odpowiedź i listę kolumn w SELECT."""
+
+    def test_task_list_with_assignee_names(self):
+        with recorded_statements() as statements:
+            results = self.get('/api/tasks/', fields="id,title,status,assigned_to.first_name,assigned_to.last_name").json['results']
+        self.assertEqual(set(results[0]), {'id', 'title', 'status', 'assigned_to'})
+        self.assertEqual(set(results[0]['assigned_to'][0]), {'first_name', 'last_name'})
+        task_query = next(statement for statement, _ in statements if "FROM task" in statement)
+        self.assertNotIn("description", task_query)
+        self.assertFalse(any("JOIN role" in statement for statement, _ in statements))
+
+    def test_stream_and_users(self):
+        rows = self.get('/api/tasks/', stream='json', fields="id,assigned_to.username").json
+        self.assertEqual(set(rows[0]['assigned_to'][0]), {'username'})
+        self.assertEqual(set(self.get('/api/users/', fields='username').json['results'][0]), {'username'})
+
+    def test_unknown_field(self):
+        for fields in ("id,secret", "title.x", "assigned_to.password"):
+            response = self.client.get('/api/tasks/', query_string={'fields': fields}, headers=self.headers)
+            self.assertEqual(response.status_code, 400, fields)
+
+
+class SpendingAnalyticsTests(ApiTestCase):
+    """/api/bills/analytics/ - wyniki NumPy zgodne z prostym liczeniem, cache per wersja kolekcji."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.bills = [(f"Kategoria {i % 2}", f"{2024 + i % 3}-{i % 12 + 1:02d}-15", 10 + i * 7 % 50) for i in range(144)]
+        with connect() as conn:
+            conn.execute("DELETE FROM bill")
+            conn.executemany("INSERT INTO bill (category, date, amount) VALUES (?, ?, ?)", cls.bills)
+
+    def test_matches_plain_computation(self):
+        data = self.get('/api/bills/analytics/', start='2025-01', end='2026-12', percentiles='0,50,90,100').json
+        monthly = {}
+        for category, day, amount in self.bills:
+            monthly[category, day[:7]] = monthly.get((category, day[:7]), 0) + amount
+        self.assertEqual([c['category'] for c in data['categories']], ["Kategoria 0", "Kategoria 1"])
+        for row in data['categories']:
+            amounts = [a for c, day, a in self.bills if c == row['category'] and "2025" <= day[:4] <= "2026"]
+            self.assertEqual(row['count'], len(amounts))
+            # jsonify sortuje klucze - percentyle po nazwie, nie po kolejności
+            self.assertEqual([row['percentiles'][f"p{q}"] for q in (0, 50, 90, 100)],
+                             [round(float(np.percentile(amounts, q)), 2) for q in (0, 50, 90, 100)])
+            for month in row['months']:
+                year, number = map(int, month['month'].split('-'))
+                earlier = [f"{(year * 12 + number - 1 - i) // 12}-{(number - 1 - i) % 12 + 1:02d}" for i in range(3)]
+                self.assertAlmostEqual(month['total'], monthly.get((row['category'], month['month']), 0), places=2)
+                self.assertAlmostEqual(month['rolling_mean'],
+                                       sum(monthly.get((row['category'], m), 0) for m in earlier) / 3, places=2)
+                previous = monthly.get((row['category'], f"{year - 1}-{number:02d}"))
+                self.assertEqual(month['yoy_delta'], None if previous is None else round(month['total'] - previous, 2))
+
+    def test_cached_per_collection_version(self):
+        self.assertEqual(self.get('/api/bills/analytics/').json['end'], "2026-12")
+        frame = analytics._cached_frame[1]
+        self.get('/api/bills/analytics/', window=6)
+        self.assertIs(analytics._cached_frame[1], frame)
+        with connect() as conn:
+            conn.execute("INSERT INTO bill (category, date, amount) VALUES ('Nowa', '2030-05-01', 5)")
+        data = self.get('/api/bills/analytics/').json
+        self.assertEqual((data['end'], data['categories'][-1]['category']), ("2030-05", "Nowa"))
+        self.assertIsNot(analytics._cached_frame[1], frame)
+        with connect() as conn:
+            conn.execute("DELETE FROM bill WHERE category = 'Nowa'")
+
+    def test_invalid_params(self):
+        for params in ({'start': '2025-13'}, {'percentiles': '50,x'}, {'start': '2026-01', 'end': '2025-01'}):
+            response = self.client.get('/api/bills/analytics/', query_string=params, headers=self.headers)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class StreamedExportTests(ApiTestCase):
+    """/api/bills/export/ i /api/tasks/export/ - CSV/NDJSON z kursora, filtry i gzip w trakcie wysyłania."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connect() as conn:
+            conn.executemany("INSERT INTO bill (category, date, amount) VALUES ('Eksport', ?, ?)",
+                             [(f"{2040 + i // 12}-{i % 12 + 1:02d}-15", i + 0.5) for i in range(24)])
+
+    def export(self, path, headers=None, **params):
+        response = self.client.get(path, query_string=params, headers={**self.headers, **(headers or {})})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def test_bills_csv_month_range(self):
+        response = self.export('/api/bills/export/', start='2040-11', end='2041-02')
+        self.assertEqual(response.headers['Content-Disposition'], 'attachment; filename="bills.csv"')
+        rows = list(csv.reader(response.text.splitlines()))
+        self.assertEqual(rows[0], ['id', 'category', 'amount', 'date', 'description'])
+        self.assertEqual([row[2:4] for row in rows[1:]], [['10.5', '2040-11-15'], ['11.5', '2040-12-15'],
+                                                          ['12.5', '2041-01-15'], ['13.5', '2041-02-15']])
+
+    def test_tasks_ndjson_gzip(self):
+        done = self.tasks[:2]
+        self.client.post('/api/tasks/bulk/', json=[{'id': pk, 'status': 'done'} for pk in done], headers=self.headers)
+        with mock.patch('export.EXPORT_CHUNK_ROWS', 1):
+            response = self.export('/api/tasks/export/', {'Accept-Encoding': 'gzip'}, output='ndjson',
+                                   ids=",".join(map(str, self.tasks)), status='done')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        items = ndjson(gzip.decompress(response.data))
+        self.assertEqual([item['id'] for item in items], done)
+        self.assertEqual((items[0]['status'], sorted(items[0]['assigned_to_ids'])), ('done', sorted(self.users)))
+
+    def test_invalid_params(self):
+        for path, params in (('/api/bills/export/', {'start': '2040-13'}), ('/api/tasks/export/', {'status': 'lost'}),
+                             ('/api/tasks/export/', {'output': 'xml'})):
+            response = self.client.get(path, query_string=params, headers=self.headers)
+            self.assertEqual(response.status_code, 400, (path, params))
+        self.assertEqual(self.client.get('/api/bills/export/').status_code, 401)
+
+
+class StreamedListTests(ApiTestCase):
+    """?stream=ndjson|json na /api/tasks/ - wszystkie wiersze, paczkami po STREAM_BATCH_SIZE."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connect() as conn:
+            conn.executemany("INSERT INTO task (title, description, status) VALUES (?, 'Opis', 'not_started')",
+                             [(f"Strumień {i}",) for i in range(STREAM_BATCH_SIZE * 2 + 100)])
+            cls.all_ids = [row[0] for row in conn.execute("SELECT id FROM task ORDER BY id")]
+
+    @classmethod
+    def tearDownClass(cls):
+        with connect() as conn:
+            conn.execute("DELETE FROM task WHERE title LIKE 'Strumień %'")
+
+    def stream(self, fmt):
+        with recorded_statements() as statements:
+            response = self.get('/api/tasks/', stream=fmt)
+            data = response.data
+        batches = [statement for statement, _ in statements if statement.startswith("SELECT task.id") and "LIMIT" in statement]
+        # Paczki po 500 aż do pustej
+        self.assertEqual(len(batches), -(-len(self.all_ids) // STREAM_BATCH_SIZE) + 1)
+        self.assertEqual(response.mimetype, STREAM_MIMETYPES[fmt])
+        return data
+
+    def test_ndjson(self):
+        items = ndjson(self.stream('ndjson'))
+        self.assertEqual([item['id'] for item in items], self.all_ids)
+
+    def test_json(self):
+        items = json.loads(self.stream('json'))
+        self.assertEqual([item['id'] for item in items], self.all_ids)
+        own = next(item for item in items if item['id'] == self.tasks[0])
+        self.assertEqual(len(own['assigned_to']), len(self.users))
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/tasks/', query_string={'stream': 'xml'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskBulkTests(ApiTestCase):
+    """POST /api/tasks/bulk/ - walidacja całej paczki (400), rola Manager i różnica przypisań."""
+
+    def bulk(self, items, headers=None):
+        return self.client.post('/api/tasks/bulk/', json=items, headers=headers or self.headers)
+
+    def assignments(self, task_id):
+        with connect() as conn:
+            return {row[0] for row in conn.execute("SELECT user_id FROM task_assignments WHERE task_id = ?", (task_id,))}
+
+    def statuses(self):
+        with connect() as conn:
+            placeholders = ", ".join("?" * len(self.tasks))
+            return [row[0] for row in conn.execute(f"SELECT status FROM task WHERE id IN ({placeholders}) ORDER BY id", self.tasks)]
+
+    def test_assignment_diff(self):
+        admin, adam = self.users
+        with recorded_statements() as statements:
+            response = self.bulk([
+                {'id': self.tasks[0], 'assigned_to_ids': [adam]},
+                {'id': self.tasks[1], 'assigned_to_ids': []},
+                {'id': self.tasks[2], 'status': 'done', 'title': "Zbiorczo"},
+            ])
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json['results'][2], {'id': self.tasks[2], 'fields': ['status', 'title']})
+        # Jeden DELETE tylko usuwanych par, bez INSERT - pozostający przypisany nie jest ruszany
+        writes = [(statement.split()[0], parameters) for statement, parameters in statements
+                  if "task_assignments" in statement and not statement.startswith("SELECT")]
+        self.assertEqual([kind for kind, _ in writes], ['DELETE'])
+        self.assertEqual(sorted(writes[0][1]), sorted((self.tasks[0], admin, self.tasks[1], admin, self.tasks[1], adam)))
+        self.assertEqual((self.assignments(self.tasks[0]), self.assignments(self.tasks[1])), ({adam}, set()))
+        self.assertEqual(self.assignments(self.tasks[2]), {admin, adam})
+        self.assertEqual(self.statuses()[2], 'done')
+
+        self.assertEqual(self.bulk([{'id': self.tasks[1], 'assigned_to_ids': [admin, adam]}]).status_code, 200)
+        self.assertEqual(self.assignments(self.tasks[1]), {admin, adam})
+
+    def test_invalid_items_reject_whole_batch(self):
+        before = self.statuses()
+        response = self.bulk([
+            {'id': self.tasks[3], 'status': 'in_process'},
+            {'id': 999999, 'status': 'done'},
+            {'id': self.tasks[4], 'status': 'done'},
+            {'id': self.tasks[4], 'assigned_to_ids': [999999]},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['errors'], [
+            {'index': 1, 'id': 999999, 'error': "Zadanie nie istnieje"},
+            {'index': 2, 'id': self.tasks[4], 'error': "Zadanie występuje więcej niż raz"},
+            {'index': 3, 'id': self.tasks[4], 'error': "Zadanie występuje więcej niż raz"},
+            {'index': 3, 'id': self.tasks[4], 'error': "Nieistniejący użytkownicy: [999999]"},
+        ])
+        self.assertEqual(self.statuses(), before)
+        with mock.patch('bulk.MAX_BULK_ITEMS', 1):
+            response = self.bulk([{'id': self.tasks[3], 'status': 'done'}, {'id': self.tasks[4], 'status': 'done'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.bulk([{'status': 'done'}]).status_code, 400)
+        self.assertEqual(self.bulk([{'id': self.tasks[3], 'due_date': '2030-02-30'}]).status_code, 400)
+        self.assertEqual(self.statuses(), before)
+
+    def test_only_manager_assigns(self):
+        employee = self.login('adam', 'password')
+        response = self.bulk([{'id': self.tasks[3], 'status': 'done'}, {'id': self.tasks[4], 'assigned_to_ids': []}], employee)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.assignments(self.tasks[4]), set(self.users))
+        self.assertEqual(self.bulk([{'id': self.tasks[3], 'status': 'done'}], employee).status_code, 200)
+
+class TaskChangesTests(ApiTestCase):
+    """Delta sync: /api/tasks/changes/ zwraca tylko zmiany od tokenu, z tombstone'ami usuniętych."""
+
+    def sync(self, token=None, **params):
+        if token:
+            params['since'] = token
+        return self.get('/api/tasks/changes/', **params).json
+
+    def latest_token(self):
+        page = self.sync(limit=MAX_PAGE_SIZE)
+        while page['has_more']:
+            page = self.sync(page['next_token'], limit=MAX_PAGE_SIZE)
+        return page['next_token']
+
+    def test_only_changes_since_token(self):
+        token = self.latest_token()
+        self.assertEqual(self.sync(token), {'upserted': [], 'deleted': [], 'next_token': token, 'has_more': False})
+
+        self.client.patch(f'/api/tasks/{self.tasks[0]}/', json={'status': 'done'}, headers=self.headers)
+        with connect() as conn:
+            # Przypisanie i usunięcie z pominięciem API - dziennik prowadzą triggery
+            conn.execute("DELETE FROM task_assignments WHERE task_id = ? AND user_id = ?", (self.tasks[1], self.users[0]))
+            deleted_id = conn.execute("INSERT INTO task (title, description) VALUES ('Do usunięcia', '')").lastrowid
+            conn.execute("DELETE FROM task WHERE id = ?", (deleted_id,))
+
+        delta = self.sync(token)
+        self.assertEqual([t['id'] for t in delta['upserted']], self.tasks[:2])
+        self.assertEqual([u['id'] for u in delta['upserted'][1]['assigned_to']], self.users[1:])
+        self.assertEqual(delta['deleted'], [deleted_id])
+        self.assertEqual(self.sync(delta['next_token'])['upserted'], [])
+
+    def test_pages(self):
+        token = self.latest_token()
+        for task_id in self.tasks[2:]:
+            self.client.patch(f'/api/tasks/{task_id}/', json={'status': 'in_process'}, headers=self.headers)
+        first = self.sync(token, limit=2)
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['next_token'], limit=2)
+        self.assertFalse(second['has_more'])
+        self.assertEqual([t['id'] for t in first['upserted'] + second['upserted']], self.tasks[2:])
+
+    def test_invalid_tokens(self):
+        latest = decode_cursor(self.latest_token(), 'changes')
+        tokens = ['zly-token', encode_cursor('tasks', latest),
+                  *(encode_cursor('changes', values) for values in ([1], ['1', 2], None, [1, 2, 3])),
+                  encode_cursor('changes', [latest[0] + 1, 0])]
+        for token in tokens:
+            response = self.client.get('/api/tasks/changes/', query_string={'since': token}, headers=self.headers)
+            self.assertEqual(response.status_code, 400, token)
+
+
+class PaginationTests(ApiTestCase):
+    """Kursor keyset: kolejne strony bez pominięć i powtórzeń, 400 dla kursora spoza API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        changes = [{'id': task_id, 'due_date': "2030-05-01" if i % 2 else None} for i, task_id in enumerate(cls.tasks)]
+        cls.client.post('/api/tasks/bulk/', json=changes, headers=cls.headers)
+
+    def test_pages(self):
+        for ordering in ('id', 'due_date'):
+            params, ids = {'ids': ",".join(map(str, self.tasks)), 'ordering': ordering, 'limit': 2}, []
+            while True:
+                page = self.get('/api/tasks/', **params).json
+                ids += [t['id'] for t in page['results']]
+                if not page['next_cursor']:
+                    break
+                params['cursor'] = page['next_cursor']
+            expected = self.tasks if ordering == 'id' else self.tasks[1::2] + self.tasks[::2]
+            self.assertEqual(ids, expected, ordering)
+
+    def test_invalid_cursors(self):
+        cursors = [('id', 'zly-kursor'), ('id', encode_cursor('due_date', [None, 1])),
+                   *(('id', encode_cursor('id', values)) for values in ([], ['x'], None, [1, 2], [[1]])),
+                   *(('due_date', encode_cursor('due_date', values))
+                     for values in (['2030-13-01', 1], [5, 1], [None], [None, 'x'], "2030-05-01"))]
+        for ordering, cursor in cursors:
+            for path in ('/api/tasks/', '/api/users/'):
+                response = self.client.get(path, query_string={'ordering': ordering, 'cursor': cursor},
+                                           headers=self.headers)
+                self.assertEqual(response.status_code, 400, (path, ordering, cursor))
+
+class RollupTriggerTests(ApiTestCase):
+    """Triggery bill_monthly_rollup po zapisach z pominięciem API, /api/bills/summary/ i indeks dokładany do starej bazy."""
+
+    def execute(self, *statements):
+        with connect() as conn:
+            for statement in statements:
+                conn.execute(statement)
+
+    def assertRollupMatches(self):
+        with app.app_context():
+            self.assertEqual(check_bill_rollup(), [])
+
+    def test_insert_update_delete(self):
+        self.execute("INSERT INTO bill (category, amount, date) VALUES " + ", ".join(
+            f"('Rollup {i % 3}', {10 + i * 7 % 20}, '2032-0{i % 2 + 1}-{i + 1:02d}')" for i in range(24)))
+        self.assertRollupMatches()
+        group = "category = 'Rollup 0' AND date LIKE '2032-01-%'"
+        self.execute(f"UPDATE bill SET amount = 0 WHERE {group} AND amount = (SELECT MAX(amount) FROM bill WHERE {group})")
+        self.assertRollupMatches()
+        self.execute(f"UPDATE bill SET date = '2032-12-01', category = 'Rollup 2' WHERE id = "
+                     f"(SELECT id FROM bill WHERE {group} ORDER BY amount LIMIT 1)")
+        self.assertRollupMatches()
+        group = "category = 'Rollup 1' AND date LIKE '2032-02-%'"
+        for order in ("amount DESC", "amount"):
+            self.execute(f"DELETE FROM bill WHERE id = (SELECT id FROM bill WHERE {group} ORDER BY {order}, id LIMIT 1)")
+            self.assertRollupMatches()
+        self.execute(f"DELETE FROM bill WHERE {group}")
+        self.assertRollupMatches()
+
+    def test_summary_matches_group_by(self):
+        self.execute("INSERT INTO bill (category, amount, date) VALUES " + ", ".join(
+            f"('Suma {i % 2}', {5 + i % 9}.25, '{2025 + i % 2}-{i % 12 + 1:02d}-0{i % 9 + 1}')" for i in range(40)))
+        with connect() as conn:
+            expected = [list(row) for row in conn.execute(
+                "SELECT category, CAST(strftime('%Y', date) AS INTEGER) AS year, CAST(strftime('%m', date) AS INTEGER) AS month, "
+                "SUM(amount), COUNT(*), MIN(amount), MAX(amount) FROM bill WHERE date BETWEEN '2025-01-01' AND '2026-12-31' "
+                "GROUP BY category, year, month ORDER BY category, year, month")]
+        summary = self.get('/api/bills/summary/').json
+        self.assertEqual([[r['category'], r['year'], r['month'], r['total'], r['count'], r['min_amount'], r['max_amount']]
+                          for r in summary], expected)
+
+    def test_bill_index_added_to_existing_database(self):
+        self.execute("DROP INDEX ix_bill_category_date")
+        with app.app_context():
+            db.create_all()
+        with connect() as conn:
+            self.assertTrue(conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_bill_category_date'").fetchone())
+
+class SearchTests(ApiTestCase):
+    """/api/search/ - ranking bm25 z SEARCH_CANDIDATES najnowszych trafień, flaga truncated."""
+
+    def test_candidates_cap_is_reported(self):
+        create = lambda title, description: self.client.post('/api/tasks/', json={
+            'title': title, 'description': description}, headers=self.headers).json['id']
+        old = create("Rozliczenie kwartalne", "")
+        newer = [create(f"Spotkanie {i}", "Omówić rozliczenie") for i in range(3)]
+
+        response = self.get('/api/search/', q='rozliczenie').json
+        ids = [r['id'] for r in response['results']]
+        self.assertEqual((ids[0], sorted(ids[1:]), response['truncated']), (old, newer, False))
+        # Stary, najlepiej pasujący dokument spoza kandydatów wypada z rankingu - odpowiedź to zgłasza
+        with mock.patch('search.SEARCH_CANDIDATES', 2):
+            response = self.get('/api/search/', q='rozliczenie').json
+        self.assertEqual((sorted(r['id'] for r in response['results']), response['truncated']), (newer[1:], True))
+
+class TaskFilterTests(ApiTestCase):
+    """Filtry listy zadań i plan zapytania (EXPLAIN QUERY PLAN) - każdy filtr korzysta z indeksu."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        changes = [{'id': task_id, 'status': 'done' if i < 2 else 'in_process', 'due_date': f"2025-03-0{i + 1}"}
+                   for i, task_id in enumerate(cls.tasks)]
+        changes[0]['assigned_to_ids'] = cls.users[:1]
+        cls.client.post('/api/tasks/bulk/', json=changes, headers=cls.headers)
+
+    def list_ids(self, **params):
+        return [t['id'] for t in self.get('/api/tasks/', ids=",".join(map(str, self.tasks)), **params).json['results']]
+
+    def plan(self, **params):
+        with recorded_statements() as statements:
+            self.get('/api/tasks/', **params)
+        statement, parameters = next(s for s in statements if s[0].startswith("SELECT task.id"))
+        with connect() as conn:
+            return "\n".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + statement, parameters))
+
+    def test_filters(self):
+        self.assertEqual(self.list_ids(status='done'), self.tasks[:2])
+        self.assertEqual(self.list_ids(status='done,in_process'), self.tasks)
+        self.assertEqual(self.list_ids(assigned_to=str(self.users[1])), self.tasks[1:])
+        self.assertEqual(self.list_ids(due_after='2025-03-02', due_before='2025-03-03'), self.tasks[1:3])
+
+    def test_invalid_filters(self):
+        for params in ({'status': 'lost'}, {'assigned_to': 'x'}, {'ids': '1,a'}, {'due_after': '2025-02-30'}):
+            self.assertEqual(self.client.get('/api/tasks/', query_string=params, headers=self.headers).status_code, 400)
+
+    def test_filters_use_indexes(self):
+        self.assertIn("USING INDEX ix_task_status", self.plan(status='done'))
+        # Zakres jednostronny przy sortowaniu po id: SQLite woli przejść tabelę w kolejności id (LIMIT)
+        self.assertIn("USING INDEX ix_task_due_date", self.plan(due_after='2025-03-02', due_before='2025-03-03'))
+        self.assertIn("USING INDEX ix_task_due_date", self.plan(due_before='2025-03-03', ordering='due_date'))
+        self.assertRegex(self.plan(assigned_to='1'), r"task_assignments USING (COVERING )?INDEX")
+        self.assertIn("USING INTEGER PRIMARY KEY", self.plan(ids='1,2'))
+
+class TaskListParityTests(ApiTestCase):
+    """Szybka ścieżka /api/tasks/ (fast_lists.py) - bajt w bajt to samo co TaskSchema."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        titles = ['Cytat "x" i \\ukośnik', "Zażółć gęślą jaźń 🚀", "Linia\u2028separator\u2029\x01\n\t", "</script>"]
+        cls.special = [
+            cls.client.post('/api/tasks/', json={
+                'title': title, 'description': title[::-1], 'due_date': f"2030-01-0{i + 1}" if i % 2 else None,
+                'assigned_to_ids': cls.users[::-1][:i + 1],
+            }, headers=cls.headers).json['id']
+            for i, title in enumerate(titles)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        with connect() as conn:
+            placeholders = ", ".join("?" * len(cls.special))
+            conn.execute(f"DELETE FROM task_assignments WHERE task_id IN ({placeholders})", cls.special)
+            conn.execute(f"DELETE FROM task WHERE id IN ({placeholders})", cls.special)
+
+    def both(self, **params):
+        fast = self.get('/api/tasks/', **params)
+        with mock.patch.dict(app.config, FAST_LIST_RESPONSES=False):
+            slow = self.get('/api/tasks/', **params)
+        return fast, slow
+
+    def test_same_bytes(self):
+        for params in ({}, {'limit': 3}, {'ordering': 'due_date', 'limit': 4}, {'status': 'not_started'}):
+            fast, slow = self.both(**params)
+            self.assertEqual(fast.data, slow.data, params)
+            self.assertEqual((fast.content_type, fast.headers['ETag']), (slow.content_type, slow.headers['ETag']))
+            cursor = fast.json['next_cursor']
+            while cursor:
+                fast, slow = self.both(**params, cursor=cursor)
+                self.assertEqual(fast.data, slow.data, params)
+                cursor = fast.json['next_cursor']
+        self.assertIn(b'Linia\\u2028separator\\u2029\\u0001', fast.data)
+
+    def test_assignees_and_sparse_fields(self):
+        results = self.get('/api/tasks/', ids=",".join(map(str, self.special))).json['results']
+        self.assertEqual([[u['id'] for u in task['assigned_to']] for task in results],
+                         [sorted(self.users[::-1][:i + 1]) for i in range(len(self.special))])
+        self.assertEqual({u['id']: u['is_admin'] for u in results[-1]['assigned_to']},
+                         {self.users[0]: True, self.users[1]: False})
+        # ?fields= idzie przez Marshmallow (sparse_fields.py)
+        response = self.get('/api/tasks/', fields='id,assigned_to.username', ids=self.special[0])
+        self.assertEqual(response.json['results'], [{'id': self.special[0], 'assigned_to': [{'username': 'adam'}]}])
+
+class UploadImportTests(ApiTestCase):
+    """POST /api/bills/import/ - import paczkami, błędne wiersze odrzucane bez przerywania importu."""
+
+    def upload(self, name, content, headers=None):
+        return self.client.post('/api/bills/import/', data={'file': (io.BytesIO(content), name)},
+                                headers=headers or self.headers)
+
+    def test_csv_in_batches(self):
+        rows = [f"Import CSV,{10 + i}.50,2031-0{i % 3 + 1}-10" for i in range(7)]
+        bad = ["Import CSV,abc,2031-01-10", ",5,2031-01-10", "Import CSV,1.005,2031-01-10", "Import CSV,5,2031-02-30"]
+        content = "\ufeffcategory,amount,date\n" + "\n".join(rows + bad) + "\n"
+        with mock.patch('importer.IMPORT_BATCH', 3):
+            report = self.upload('rachunki.csv', content.encode()).json
+        self.assertEqual((report['imported'], report['rejected'], report['batches']), (7, 4, 3))
+        self.assertEqual([e['line'] for e in report['errors']], [9, 10, 11, 12])
+        with connect() as conn:
+            stored = conn.execute("SELECT count(*), sum(amount) FROM bill WHERE category = 'Import CSV'").fetchone()
+            rollup = conn.execute("SELECT sum(count), sum(total) FROM bill_monthly_rollup "
+                                  "WHERE category = 'Import CSV'").fetchone()
+        self.assertEqual(stored, (7, sum(10.5 + i for i in range(7))))
+        self.assertEqual(rollup, stored)
+
+    def test_ndjson(self):
+        content = ('{"category": "Import NDJSON", "amount": 12, "date": "2031-05-01", "description": "Prąd"}\n'
+                   '\n[1, 2]\n{"category": "Import NDJSON", "amount": "x", "date": "2031-05-01"}\n')
+        report = self.upload('rachunki.ndjson', content.encode()).json
+        self.assertEqual((report['imported'], report['rejected']), (1, 2))
+        self.assertEqual([e['line'] for e in report['errors']], [3, 4])
+
+    def test_rejected_requests(self):
+        employee = self.login('adam', 'password')
+        self.assertEqual(self.upload('rachunki.csv', b"category,amount,date\n", employee).status_code, 403)
+        self.assertEqual(self.upload('rachunki.txt', b"category,amount,date\n").status_code, 400)
+        self.assertEqual(self.upload('rachunki.csv', b"category,amount\nA,1\n").status_code, 400)
+        self.assertEqual(self.client.post('/api/bills/import/', headers=self.headers).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Bill analytics benchmark: /api/bills/analytics/ latency on a large FastAPI data set.
+
+Seeds --size bills into a fresh SQLite file, then measures the first request
+(which loads the bills into NumPy arrays) and --repeat further requests per
+parameter set, answered from the arrays cached for the bills collection version:
+
+    python -m benchmark.analytics --size 2000000 --repeat 20 --output analytics.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from benchmark.backends import FastAPIBackend
+from benchmark.seed import seed_database
+from benchmark.workload import BASE_URL
+
+# (nazwa, parametry) - cały zakres danych, jeden rok, długie okno i wiele percentyli
+REQUESTS = [
+    ("full_range", {}),
+    ("one_year", {"start": "2026-01", "end": "2026-12"}),
+    ("window_12", {"window": 12}),
+    ("percentiles", {"percentiles": "1,5,10,25,50,75,90,95,99,99.9"}),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2000000, help="number of seeded bills")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per parameter set")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="optional JSON report path")
+    return parser.parse_args(argv)
+
+
+async def measure(backend, args):
+    await backend.main.startup()
+    await asyncio.to_thread(seed_database, "fastapi", backend.db_path, users=10, tasks=0, bills=args.size,
+                            definitions=0, employees=0, seed=args.seed)
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url=BASE_URL) as client:
+        method, path, kwargs = backend.login_request()
+        token = backend.token_from((await client.request(method, path, **kwargs)).json())
+        headers = {"Authorization": f"Bearer {token}"}
+        started = perf_counter()
+        (await client.get("/api/bills/analytics/", headers=headers)).raise_for_status()
+        load_seconds = perf_counter() - started
+        for name, params in REQUESTS:
+            latencies = []
+            for _ in range(args.repeat):
+                started = perf_counter()
+                response = await client.get("/api/bills/analytics/", params=params, headers=headers)
+                latencies.append(perf_counter() - started)
+                response.raise_for_status()
+            results.append({
+                "request": name,
+                "bills": response.json()["count"],
+                "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                "max_ms": round(max(latencies) * 1000, 3),
+            })
+    await backend.main.engine.dispose()
+    return {"size": args.size, "load_seconds": round(load_seconds, 2), "requests": results}
+
+
+def print_summary(report):
+    print(f"{report['size']} bills, first request (load into NumPy) {report['load_seconds']} s")
+    print(f"{'request':<12} {'bills':>9} {'p50 ms':>9} {'max ms':>9}")
+    for row in report["requests"]:
+        print(f"{row['request']:<12} {row['bills']:>9} {row['p50_ms']:>9} {row['max_ms']:>9}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="bench-analytics-") as workdir:
+        backend = FastAPIBackend(Path(workdir) / "fastapi.db")
+        backend.prepare()
+        report = asyncio.run(measure(backend, args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    print_summary(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""In-process adapters for the three backends.
+
+Each adapter points its framework at a throwaway SQLite file, creates the
+schema and login accounts through the framework itself, bulk-seeds the data
+set with benchmark.seed and then drives the real ASGI/WSGI application
+through httpx transports, so no server process or network socket is involved.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from benchmark.seed import seed_database
+from benchmark.workload import BASE_URL, Worker, build_schedule, split_schedule, summarize
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class Backend:
+    name = None
+    directory = None
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.app = None
+
+    def prepare(self):
+        path = str(ROOT / self.directory)
+        sys.path.insert(0, path)
+        os.chdir(path)
+
+    def login_request(self):
+        body = {"username": "admin", "password": "adminpassword"}
+        return "POST", "/api/token/", {"json": body}
+
+    def token_from(self, payload):
+        return payload["access_token"]
+
+    def seed_volume(self, size, seed):
+        """Bulk rows for a data set of `size` tasks and bills; returns the task ids."""
+        ranges = seed_database(self.name, self.db_path, users=max(2, size // 50), tasks=size, bills=size,
+                               definitions=0, employees=0, seed=seed)
+        return list(range(*ranges["tasks"]))
+
+    def workers(self, level, requests, seed, task_ids):
+        chunks = split_schedule(build_schedule(requests, seed), level)
+        return [Worker(self, ops, task_ids, seed + i) for i, ops in enumerate(chunks)]
+
+
+class WSGIBackend(Backend):
+    """Concurrency = N threads, each with its own httpx client."""
+
+    def run(self, size, levels, requests, seed):
+        self.prepare()
+        task_ids = self.seed(size, seed)
+        results = []
+        for level in levels:
+            workers = self.workers(level, requests, seed, task_ids)
+            started = perf_counter()
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                samples = [s for chunk in pool.map(self._drive, workers) for s in chunk]
+            results.append({"concurrency": level, **summarize(samples, perf_counter() - started)})
+        return results
+
+    def _drive(self, worker):
+        transport = httpx.WSGITransport(app=self.app)
+        with httpx.Client(transport=transport, base_url=BASE_URL) as client:
+            return worker.run_sync(client)
+
+
+class FlaskBackend(WSGIBackend):
+    name = "flask"
+    directory = "Flask"
+
+    def prepare(self):
+        os.environ["FLASK_DATABASE_URL"] = f"sqlite:///{self.db_path}"
+        super().prepare()
+        from app import app
+        self.app = app
+
+    def create_schema(self):
+        from models import db
+        with self.app.app_context():
+            db.create_all()
+
+    def seed(self, size, seed):
+        from models import db, Role, User
+        self.create_schema()
+        with self.app.app_context():
+            manager = Role(name="Manager", description="Pełny dostęp")
+            admin = User(username="admin", password="adminpassword", first_name="Szef", last_name="Systemu")
+            admin.roles.append(manager)
+            db.session.add_all([manager, admin, User(username="adam", password="password")])
+            db.session.commit()
+        return self.seed_volume(size, seed)
+
+
+class DjangoBackend(WSGIBackend):
+    name = "django"
+    directory = "Django/projekt_firmowy"
+
+    def prepare(self):
+        os.environ["DJANGO_DB_PATH"] = str(self.db_path)
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "projekt_firmowy.settings")
+        super().prepare()
+        from django.core.wsgi import get_wsgi_application
+        self.app = get_wsgi_application()
+
+    def token_from(self, payload):
+        return payload["access"]
+
+    def create_schema(self):
+        from django.core.management import call_command
+        call_command("migrate", verbosity=0)
+
+    def seed(self, size, seed):
+        from django.contrib.auth.models import Group, User
+        self.create_schema()
+        managers = Group.objects.create(name="Managerowie")
+        admin = User.objects.create_user("admin", password="adminpassword", first_name="Admin", last_name="System")
+        admin.groups.add(managers)
+        User.objects.create_user("adam", password="password", first_name="Adam", last_name="Worker")
+        return self.seed_volume(size, seed)
+
+
+class FastAPIBackend(Backend):
+    """Concurrency = N coroutines sharing one event loop, like a single uvicorn worker."""
+
+    name = "fastapi"
+    directory = "FastAPI"
+
+    def prepare(self):
+        os.environ["FASTAPI_DATABASE_URL"] = f"sqlite+aiosqlite:///{self.db_path}"
+        super().prepare()
+        import main
+        self.main = main
+        self.app = main.app
+
+    def login_request(self):
+        form = {"username": "admin", "password": "adminpassword"}
+        return "POST", "/api/token", {"data": form}
+
+    def run(self, size, levels, requests, seed):
+        self.prepare()
+        return asyncio.run(self._run(size, levels, requests, seed))
+
+    async def _run(self, size, levels, requests, seed):
+        task_ids = await self.seed(size, seed)
+        transport = httpx.ASGITransport(app=self.app)
+        results = []
+        async with httpx.AsyncClient(transport=transport, base_url=BASE_URL) as client:
+            for level in levels:
+                workers = self.workers(level, requests, seed, task_ids)
+                started = perf_counter()
+                chunks = await asyncio.gather(*(w.run_async(client) for w in workers))
+                samples = [s for chunk in chunks for s in chunk]
+                results.append({"concurrency": level, **summarize(samples, perf_counter() - started)})
+        await self.main.engine.dispose()
+        return results
+
+    def create_schema(self):
+        asyncio.run(self._create_schema())
+
+    async def _create_schema(self):
+        async with self.main.engine.begin() as conn:
+            await conn.run_sync(self.main.Base.metadata.create_all)
+        await self.main.engine.dispose()
+
+    async def seed(self, size, seed):
+        # startup() tworzy tabele, rolę Manager oraz użytkowników admin i adam
+        await self.main.startup()
+        return await asyncio.to_thread(self.seed_volume, size, seed)
+
+
+BACKENDS = {cls.name: cls for cls in (FastAPIBackend, FlaskBackend, DjangoBackend)}
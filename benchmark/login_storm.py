@@ -0,0 +1,133 @@
+"""Login storm: latency of ordinary FastAPI requests while clients keep logging in.
+
+Every login costs one bcrypt verification. The storm runs once per hashing
+mode, each in its own subprocess on a fresh SQLite file:
+
+    FASTAPI_HASH_CONCURRENCY=0   bcrypt on the event loop (the old behaviour)
+    FASTAPI_HASH_CONCURRENCY=N   bcrypt in a pool of N threads
+
+and reports p50/p95/p99 of the ordinary reads (/api/me/, /api/tasks/) next
+to the login latency and the hashing queue metrics.
+
+    python -m benchmark.login_storm --hash-concurrency 0,2 --logins 8 --readers 8 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from benchmark.backends import ROOT, FastAPIBackend
+from benchmark.run import _ints
+from benchmark.workload import BASE_URL, summarize
+
+READS = [("me", "/api/me/"), ("tasks_list", "/api/tasks/")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hash-concurrency", type=_ints, default=[0, 2],
+                        help="FASTAPI_HASH_CONCURRENCY values to compare (0 = on the event loop)")
+    parser.add_argument("--logins", type=int, default=8, help="clients logging in back to back")
+    parser.add_argument("--readers", type=int, default=8, help="clients issuing ordinary reads")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per storm")
+    parser.add_argument("--size", type=int, default=100, help="number of seeded tasks and bills")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="optional JSON report path")
+    # Tryb wewnętrzny: jeden tryb hashowania w osobnym procesie
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+async def storm(backend, args):
+    await backend.seed(args.size, args.seed)
+    method, path, kwargs = backend.login_request()
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url=BASE_URL) as client:
+        token = backend.token_from((await client.request(method, path, **kwargs)).json())
+        headers = {"Authorization": f"Bearer {token}"}
+        deadline = perf_counter() + args.duration
+
+        async def login_loop():
+            while perf_counter() < deadline:
+                started = perf_counter()
+                response = await client.request(method, path, **kwargs)
+                samples.append(("login", perf_counter() - started, response.status_code < 400))
+
+        async def read_loop(offset):
+            i = offset
+            while perf_counter() < deadline:
+                endpoint, url = READS[i % len(READS)]
+                started = perf_counter()
+                response = await client.get(url, headers=headers)
+                samples.append((endpoint, perf_counter() - started, response.status_code < 400))
+                i += 1
+
+        started = perf_counter()
+        await asyncio.gather(*(login_loop() for _ in range(args.logins)),
+                             *(read_loop(i) for i in range(args.readers)))
+        wall = perf_counter() - started
+    await backend.main.engine.dispose()
+
+    reads = [s for s in samples if s[0] != "login"]
+    report = summarize(samples, wall)
+    return {
+        "reads": summarize(reads, wall)["total"],
+        "endpoints": report["endpoints"],
+        "hashing": backend.main.hash_metrics.stats(),
+    }
+
+
+def run_worker(args):
+    backend = FastAPIBackend(Path(args.workdir) / "fastapi.db")
+    backend.prepare()
+    result = asyncio.run(storm(backend, args))
+    Path(args.result).write_text(json.dumps(result))
+
+
+def run_subprocess(hash_concurrency, args):
+    with tempfile.TemporaryDirectory(prefix="bench-login-storm-") as workdir:
+        result = Path(workdir) / "result.json"
+        cmd = [
+            sys.executable, "-m", "benchmark.login_storm", "--worker", "--workdir", workdir, "--result", str(result),
+            "--logins", str(args.logins), "--readers", str(args.readers), "--duration", str(args.duration),
+            "--size", str(args.size), "--seed", str(args.seed),
+        ]
+        env = dict(os.environ, PYTHONPATH=str(ROOT), FASTAPI_HASH_CONCURRENCY=str(hash_concurrency))
+        completed = subprocess.run(cmd, env=env, cwd=ROOT, stdout=subprocess.DEVNULL)
+        if completed.returncode != 0:
+            raise RuntimeError(f"login storm (hash concurrency {hash_concurrency}) exited with code {completed.returncode}")
+        return json.loads(result.read_text())
+
+
+def print_summary(results):
+    print(f"{'hashing':<10} {'reads':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'logins':>7} {'login p99':>10} {'queue avg':>10}")
+    for row in results:
+        reads, login = row["reads"], row["endpoints"].get("login", {})
+        mode = "event loop" if row["hash_concurrency"] == 0 else f"pool x{row['hash_concurrency']}"
+        print(f"{mode:<10} {reads['requests']:>6} {reads['p50_ms']:>9} {reads['p95_ms']:>9} {reads['p99_ms']:>9} "
+              f"{login.get('requests', 0):>7} {login.get('p99_ms'):>10} {row['hashing']['queue_ms_avg']:>10}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        return run_worker(args)
+
+    results = [{"hash_concurrency": level, **run_subprocess(level, args)} for level in args.hash_concurrency]
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main()
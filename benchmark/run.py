@@ -0,0 +1,111 @@
+"""Cross-framework load benchmark.
+
+Runs the same workload mix (see benchmark/workload.py) against the FastAPI,
+Flask and Django backends in-process and writes a JSON report with
+requests/sec and p50/p95/p99 latency per endpoint, framework, concurrency
+level and data size.
+
+    python -m benchmark.run --sizes 100,1000 --concurrency 1,4,16 --requests 300
+
+Every (framework, size) pair runs in its own subprocess on a fresh SQLite file,
+so the frameworks never share memory, import state or data.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from benchmark.backends import BACKENDS, ROOT
+from benchmark.workload import MIX
+
+
+def _ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frameworks", default=",".join(BACKENDS), help="comma separated: fastapi,flask,django")
+    parser.add_argument("--sizes", type=_ints, default=[100, 1000], help="number of seeded tasks and bills")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 4, 16], help="concurrent clients per run")
+    parser.add_argument("--requests", type=int, default=300, help="requests per concurrency level")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_report.json")
+    # Tryb wewnętrzny: jeden framework i jeden rozmiar danych w osobnym procesie
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_worker(args):
+    backend = BACKENDS[args.worker](Path(args.workdir) / f"{args.worker}.db")
+    results = backend.run(args.sizes[0], args.concurrency, args.requests, args.seed)
+    Path(args.result).write_text(json.dumps(results))
+
+
+def run_subprocess(framework, size, args):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{framework}-") as workdir:
+        result = Path(workdir) / "result.json"
+        cmd = [
+            sys.executable, "-m", "benchmark.run",
+            "--worker", framework, "--workdir", workdir, "--result", str(result),
+            "--sizes", str(size),
+            "--concurrency", ",".join(map(str, args.concurrency)),
+            "--requests", str(args.requests),
+            "--seed", str(args.seed),
+        ]
+        env = dict(os.environ, PYTHONPATH=str(ROOT))
+        completed = subprocess.run(cmd, env=env, cwd=ROOT, stdout=subprocess.DEVNULL)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{framework} (size={size}) exited with code {completed.returncode}")
+        return json.loads(result.read_text())
+
+
+def print_summary(results):
+    print(f"{'framework':<9} {'size':>7} {'conc':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>5}")
+    for row in results:
+        total = row["total"]
+        print(
+            f"{row['framework']:<9} {row['size']:>7} {row['concurrency']:>5} {total['rps']:>9} "
+            f"{total['p50_ms']:>9} {total['p95_ms']:>9} {total['p99_ms']:>9} {total['errors']:>5}"
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        return run_worker(args)
+
+    frameworks = [f for f in args.frameworks.split(",") if f]
+    results = []
+    for framework in frameworks:
+        for size in args.sizes:
+            for row in run_subprocess(framework, size, args):
+                results.append({"framework": framework, "size": size, **row})
+
+    report = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mix": dict(MIX),
+            "sizes": args.sizes,
+            "concurrency": args.concurrency,
+            "requests_per_level": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print_summary(results)
+    print(f"Report: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Full-text search benchmark: /api/search/ latency on a large FastAPI data set.
+
+Seeds --size tasks (and --size / 100 glossary definitions) into a fresh SQLite
+file, so the FTS5 indexes are filled by the sync triggers, then repeats each
+query --repeat times in process and reports p50/max latency and hit counts:
+
+    python -m benchmark.search --size 300000 --repeat 20 --output search.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from benchmark.backends import FastAPIBackend
+from benchmark.seed import seed_database
+from benchmark.workload import BASE_URL
+
+# (nazwa, zapytanie) - od rzadkich słów po słowo występujące w każdym zadaniu
+QUERIES = [
+    ("rare_word", "12345"),
+    ("two_words", "opis 1234"),
+    ("glossary", "ebitda"),
+    ("common_prefix", "zad"),
+    ("every_document", "zadanie"),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=300000, help="number of seeded tasks")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per query")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="optional JSON report path")
+    return parser.parse_args(argv)
+
+
+async def measure(backend, args):
+    await backend.main.startup()
+    started = perf_counter()
+    await asyncio.to_thread(seed_database, "fastapi", backend.db_path, users=10, tasks=args.size, bills=0,
+                            definitions=max(1, args.size // 100), employees=0, seed=args.seed)
+    seed_seconds = perf_counter() - started
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url=BASE_URL) as client:
+        method, path, kwargs = backend.login_request()
+        token = backend.token_from((await client.request(method, path, **kwargs)).json())
+        headers = {"Authorization": f"Bearer {token}"}
+        for name, query in QUERIES:
+            latencies = []
+            for _ in range(args.repeat):
+                started = perf_counter()
+                response = await client.get("/api/search/", params={"q": query}, headers=headers)
+                latencies.append(perf_counter() - started)
+                response.raise_for_status()
+            results.append({
+                "query": name,
+                "q": query,
+                "hits": len(response.json()["results"]),
+                "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                "max_ms": round(max(latencies) * 1000, 3),
+            })
+    await backend.main.engine.dispose()
+    return {"size": args.size, "seed_seconds": round(seed_seconds, 1), "queries": results}
+
+
+def print_summary(report):
+    print(f"{report['size']} tasks seeded (with FTS5 triggers) in {report['seed_seconds']} s")
+    print(f"{'query':<16} {'q':<12} {'hits':>5} {'p50 ms':>9} {'max ms':>9}")
+    for row in report["queries"]:
+        print(f"{row['query']:<16} {row['q']:<12} {row['hits']:>5} {row['p50_ms']:>9} {row['max_ms']:>9}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="bench-search-") as workdir:
+        backend = FastAPIBackend(Path(workdir) / "fastapi.db")
+        backend.prepare()
+        report = asyncio.run(measure(backend, args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    print_summary(report)
+
+
+if __name__ == "__main__":
+    main()
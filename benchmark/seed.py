@@ -0,0 +1,289 @@
+"""Bulk synthetic data generator for the three backends.
+
+Fills the shared schema (users, roles, tasks, task_assignments, bills,
+business definitions, employees) of an existing SQLite database with
+deterministic data, using batched ``executemany`` inserts instead of the
+one-row-one-commit seeding in FastAPI ``startup()`` and Flask ``__main__``.
+
+    python -m benchmark.seed flask Flask/instance/projekt_firmowy.db --users 10000 --tasks 1000000 --bills 1000000
+    python -m benchmark.seed fastapi bench.db --create-schema --tasks 100000 --assignees 0:1,1:5,2:3,3:1 --statuses not_started:5,in_process:3,done:2
+
+The schema must already exist (start the backend once or pass --create-schema).
+Rows are appended after the current maximum ids, so existing data is kept.
+"""
+import argparse
+import base64
+import hashlib
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+
+CATEGORIES = ["Prąd", "Internet", "Biuro", "Woda", "Ogrzewanie", "Telefon", "Sprzątanie"]
+FIRST_NAMES = ["Anna", "Jan", "Piotr", "Maria", "Katarzyna", "Tomasz", "Agnieszka", "Paweł", "Ewa", "Adam"]
+LAST_NAMES = ["Kowalski", "Nowak", "Wiśniewski", "Wójcik", "Kamiński", "Lewandowski", "Zieliński", "Szymański"]
+TERMS = ["KPI", "ROI", "EBITDA", "SLA", "OKR", "CAPEX", "OPEX", "B2B", "MRR", "CHURN"]
+
+# Domyślne rozkłady: liczba osób przypisanych do zadania oraz status zadania
+DEFAULT_ASSIGNEES = {0: 2, 1: 5, 2: 2, 3: 1}
+DEFAULT_STATUSES = {"not_started": 5, "in_process": 3, "done": 2}
+
+START_DATE = date(2025, 1, 1)
+DATE_SPAN_DAYS = 730
+DEFAULT_PASSWORD = "password"
+
+
+# --- MAPOWANIE SCHEMATÓW ---
+# Każdy backend nazywa tabele i kolumny inaczej; target tłumaczy neutralne wiersze.
+class FastAPITarget:
+    manager_role = "Manager"
+    roles = ("roles", ("id", "name", "description"))
+    users = ("users", ("id", "username", "first_name", "last_name", "hashed_password"))
+    user_roles = ("user_roles", ("user_id", "role_id"))
+    tasks = ("tasks", ("id", "title", "description", "due_date", "status"))
+    assignments = ("task_assignments", ("user_id", "task_id"))
+    bills = ("bills", ("id", "category", "amount", "date", "description"))
+    definitions = ("definitions", ("id", "term", "definition"))
+    employees = ("employees", ("id", "first_name", "last_name", "email"))
+
+    def password_hash(self, password):
+        from passlib.context import CryptContext
+        return CryptContext(schemes=["bcrypt"], deprecated="auto").hash(password)
+
+    def role_row(self, role_id, name):
+        return role_id, name, "Full Access"
+
+    def user_row(self, user_id, username, first_name, last_name, password_hash):
+        return user_id, username, first_name, last_name, password_hash
+
+    def bill_row(self, bill_id, category, amount, day):
+        return bill_id, category, amount, day.isoformat(), None
+
+
+class FlaskTarget(FastAPITarget):
+    roles = ("role", ("id", "name", "description"))
+    users = ("user", ("id", "username", "first_name", "last_name", "password"))
+    tasks = ("task", ("id", "title", "description", "due_date", "status"))
+    bills = ("bill", ("id", "category", "amount", "date", "year", "description"))
+    definitions = ("business_definition", ("id", "term", "definition"))
+    employees = ("employee", ("id", "first_name", "last_name", "email"))
+
+    def password_hash(self, password):
+        # Flask przechowuje hasła jawnym tekstem (patrz models.User.password)
+        return password
+
+    def bill_row(self, bill_id, category, amount, day):
+        return bill_id, category, amount, day.isoformat(), day.year, None
+
+
+class DjangoTarget(FastAPITarget):
+    manager_role = "Managerowie"
+    roles = ("auth_group", ("id", "name"))
+    users = ("auth_user", (
+        "id", "username", "first_name", "last_name", "password",
+        "email", "is_superuser", "is_staff", "is_active", "date_joined",
+    ))
+    user_roles = ("auth_user_groups", ("user_id", "group_id"))
+    tasks = ("bbb_task", ("id", "title", "description", "due_date", "status"))
+    assignments = ("bbb_task_assigned_to", ("user_id", "task_id"))
+    bills = ("rachunki_bill", ("id", "year", "month", "category", "amount"))
+    definitions = ("bbb_businessdefinition", ("id", "term", "definition"))
+    employees = ("bbb_employee", ("id", "first_name", "last_name", "email"))
+
+    def __init__(self):
+        self.joined = datetime(2025, 1, 1).isoformat(sep=" ")
+
+    def password_hash(self, password, iterations=600000):
+        # Ten sam format co django.contrib.auth.hashers.PBKDF2PasswordHasher,
+        # liczony raz dla wszystkich wygenerowanych kont
+        salt = "benchseed" + "0" * 13
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations)
+        return f"pbkdf2_sha256${iterations}${salt}${base64.b64encode(digest).decode()}"
+
+    def role_row(self, role_id, name):
+        return role_id, name
+
+    def user_row(self, user_id, username, first_name, last_name, password_hash):
+        return user_id, username, first_name, last_name, password_hash, "", False, False, True, self.joined
+
+    def bill_row(self, bill_id, category, amount, day):
+        return bill_id, day.year, day.month, category, f"{amount:.2f}"
+
+
+TARGETS = {"fastapi": FastAPITarget, "flask": FlaskTarget, "django": DjangoTarget}
+
+
+# --- POMOCNICZE ---
+def parse_distribution(value, key=str):
+    """'0:2,1:5,2:2' -> {0: 2.0, 1: 5.0, 2: 2.0}"""
+    result = {}
+    for part in value.split(","):
+        name, _, weight = part.partition(":")
+        result[key(name.strip())] = float(weight)
+    return result
+
+
+def _weighted(rng, distribution):
+    population = list(distribution)
+    weights = list(distribution.values())
+    return lambda: rng.choices(population, weights=weights)[0]
+
+
+def _insert(conn, spec, rows, batch_size):
+    table, columns = spec
+    sql = f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    rows = iter(rows)
+    total = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return total
+        conn.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+
+
+def _next_id(conn, spec):
+    table, _ = spec
+    return conn.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{table}"').fetchone()[0]
+
+
+def _manager_role_id(conn, target):
+    table, _ = target.roles
+    row = conn.execute(f'SELECT id FROM "{table}" WHERE name = ?', (target.manager_role,)).fetchone()
+    if row:
+        return row[0]
+    role_id = _next_id(conn, target.roles)
+    _insert(conn, target.roles, [target.role_row(role_id, target.manager_role)], 1)
+    return role_id
+
+
+# --- GENERATORY WIERSZY ---
+def _users(target, first_id, count, password_hash):
+    for user_id in range(first_id, first_id + count):
+        first = FIRST_NAMES[user_id % len(FIRST_NAMES)]
+        last = LAST_NAMES[user_id % len(LAST_NAMES)]
+        yield target.user_row(user_id, f"user{user_id}", first, last, password_hash)
+
+
+def _manager_links(rng, first_id, count, role_id, ratio):
+    for user_id in range(first_id, first_id + count):
+        if rng.random() < ratio:
+            yield user_id, role_id
+
+
+def _tasks(rng, first_id, count, statuses):
+    pick_status = _weighted(rng, statuses)
+    for task_id in range(first_id, first_id + count):
+        due = START_DATE + timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+        yield task_id, f"Zadanie {task_id}", f"Opis zadania numer {task_id}.", due.isoformat(), pick_status()
+
+
+def _assignments(rng, first_task, tasks, user_ids, assignees):
+    pick_count = _weighted(rng, assignees)
+    if not len(user_ids):
+        return
+    for task_id in range(first_task, first_task + tasks):
+        for user_id in rng.sample(user_ids, min(pick_count(), len(user_ids))):
+            yield user_id, task_id
+
+
+def _bills(target, rng, first_id, count):
+    for bill_id in range(first_id, first_id + count):
+        day = START_DATE + timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+        yield target.bill_row(bill_id, rng.choice(CATEGORIES), round(rng.uniform(10, 5000), 2), day)
+
+
+def _definitions(first_id, count):
+    for def_id in range(first_id, first_id + count):
+        term = f"{TERMS[def_id % len(TERMS)]}-{def_id}"
+        yield def_id, term, f"Definicja pojęcia {term} używana w raportach."
+
+
+def _employees(first_id, count):
+    for emp_id in range(first_id, first_id + count):
+        first = FIRST_NAMES[emp_id % len(FIRST_NAMES)]
+        last = LAST_NAMES[emp_id % len(LAST_NAMES)]
+        yield emp_id, first, last, f"{first.lower()}.{last.lower()}{emp_id}@firma.pl"
+
+
+def seed_database(framework, db_path, users=1000, tasks=10000, bills=10000, definitions=100, employees=100,
+                  assignees=None, statuses=None, manager_ratio=0.05, seed=42, batch_size=10000):
+    """Append synthetic rows to `db_path` and return the inserted id ranges per table."""
+    target = TARGETS[framework]()
+    assignees = assignees or DEFAULT_ASSIGNEES
+    statuses = statuses or DEFAULT_STATUSES
+    conn = sqlite3.connect(db_path)
+    # Seed to jednorazowy import - nie potrzebujemy fsync po każdym batchu
+    conn.execute("PRAGMA synchronous = OFF")
+    ranges = {}
+    try:
+        def fill(name, spec, rows_for, count):
+            first_id = _next_id(conn, spec)
+            _insert(conn, spec, rows_for(first_id, count), batch_size)
+            ranges[name] = (first_id, first_id + count)
+            return first_id
+
+        first_user = fill("users", target.users,
+                          lambda first, n: _users(target, first, n, target.password_hash(DEFAULT_PASSWORD)), users)
+        role_id = _manager_role_id(conn, target)
+        _insert(conn, target.user_roles,
+                _manager_links(random.Random(seed), first_user, users, role_id, manager_ratio), batch_size)
+
+        first_task = fill("tasks", target.tasks, lambda first, n: _tasks(random.Random(seed + 1), first, n, statuses), tasks)
+        user_ids = range(first_user, first_user + users)
+        ranges["task_assignments"] = _insert(
+            conn, target.assignments, _assignments(random.Random(seed + 2), first_task, tasks, user_ids, assignees),
+            batch_size,
+        )
+        fill("bills", target.bills, lambda first, n: _bills(target, random.Random(seed + 3), first, n), bills)
+        fill("definitions", target.definitions, _definitions, definitions)
+        fill("employees", target.employees, _employees, employees)
+    finally:
+        conn.close()
+    return ranges
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("framework", choices=sorted(TARGETS))
+    parser.add_argument("database", help="path to the backend's SQLite file")
+    parser.add_argument("--create-schema", action="store_true", help="create tables through the backend first")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--bills", type=int, default=10000)
+    parser.add_argument("--definitions", type=int, default=100)
+    parser.add_argument("--employees", type=int, default=100)
+    parser.add_argument("--assignees", type=lambda v: parse_distribution(v, int), default=DEFAULT_ASSIGNEES,
+                        help="assignees-per-task weights, e.g. 0:2,1:5,2:2,3:1")
+    parser.add_argument("--statuses", type=parse_distribution, default=DEFAULT_STATUSES,
+                        help="status weights, e.g. not_started:5,in_process:3,done:2")
+    parser.add_argument("--manager-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.database).resolve()
+    if args.create_schema:
+        from benchmark.backends import BACKENDS
+        backend = BACKENDS[args.framework](db_path)
+        backend.prepare()
+        backend.create_schema()
+
+    started = perf_counter()
+    ranges = seed_database(
+        args.framework, db_path, users=args.users, tasks=args.tasks, bills=args.bills,
+        definitions=args.definitions, employees=args.employees, assignees=args.assignees,
+        statuses=args.statuses, manager_ratio=args.manager_ratio, seed=args.seed, batch_size=args.batch_size,
+    )
+    elapsed = perf_counter() - started
+    for name, value in ranges.items():
+        count = value if isinstance(value, int) else value[1] - value[0]
+        print(f"{name:<18} {count:>10}")
+    print(f"Done in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
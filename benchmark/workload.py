@@ -0,0 +1,132 @@
+"""Workload mix and statistics shared by every backend in the benchmark."""
+import math
+import random
+from time import perf_counter
+
+BASE_URL = "http://127.0.0.1"
+
+# --- MIX ---
+# (endpoint, weight) - ten sam rozkład zapytań dla Django, Flask i FastAPI
+MIX = [
+    ("login", 1),
+    ("me", 3),
+    ("tasks_list", 3),
+    ("tasks_create", 1),
+    ("tasks_patch", 2),
+    ("users_list", 2),
+    ("bills_list", 2),
+]
+
+STATUSES = ["not_started", "in_process", "done"]
+
+
+def build_schedule(count, seed):
+    """Deterministic list of endpoint names drawn from MIX."""
+    rng = random.Random(seed)
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    return rng.choices(names, weights=weights, k=count)
+
+
+def split_schedule(schedule, workers):
+    return [schedule[i::workers] for i in range(workers)]
+
+
+class Worker:
+    """One simulated client: keeps its token and records a sample per request."""
+
+    def __init__(self, backend, ops, task_ids, seed):
+        self.backend = backend
+        self.ops = ops
+        self.task_ids = task_ids
+        self.rng = random.Random(seed)
+        self.token = None
+        self.samples = []
+
+    def login_request(self):
+        return ("login",) + self.backend.login_request()
+
+    def request_for(self, endpoint):
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if endpoint == "login":
+            return self.login_request()
+        if endpoint == "me":
+            return endpoint, "GET", "/api/me/", {"headers": headers}
+        if endpoint == "tasks_list":
+            return endpoint, "GET", "/api/tasks/", {"headers": headers}
+        if endpoint == "users_list":
+            return endpoint, "GET", "/api/users/", {"headers": headers}
+        if endpoint == "bills_list":
+            return endpoint, "GET", "/api/bills/", {"headers": headers}
+        if endpoint == "tasks_create":
+            body = {
+                "title": f"Bench task {self.rng.randrange(10**6)}",
+                "description": "Created by the benchmark harness.",
+                "due_date": "2026-06-30",
+            }
+            return endpoint, "POST", "/api/tasks/", {"headers": headers, "json": body}
+        if endpoint == "tasks_patch":
+            task_id = self.rng.choice(self.task_ids)
+            body = {"status": self.rng.choice(STATUSES)}
+            return endpoint, "PATCH", f"/api/tasks/{task_id}/", {"headers": headers, "json": body}
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    def record(self, endpoint, started, response):
+        elapsed = perf_counter() - started
+        ok = response.status_code < 400
+        self.samples.append((endpoint, elapsed, ok))
+        if not ok:
+            return
+        if endpoint == "login":
+            self.token = self.backend.token_from(response.json())
+        elif endpoint == "tasks_create":
+            self.task_ids.append(response.json()["id"])
+
+    def run_sync(self, client):
+        for endpoint in ["login"] + self.ops:
+            endpoint, method, path, kwargs = self.request_for(endpoint)
+            started = perf_counter()
+            self.record(endpoint, started, client.request(method, path, **kwargs))
+        return self.samples
+
+    async def run_async(self, client):
+        for endpoint in ["login"] + self.ops:
+            endpoint, method, path, kwargs = self.request_for(endpoint)
+            started = perf_counter()
+            self.record(endpoint, started, await client.request(method, path, **kwargs))
+        return self.samples
+
+
+# --- STATYSTYKI ---
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def _stats(samples, wall):
+    latencies = sorted(elapsed for _, elapsed, _ in samples)
+    errors = sum(1 for _, _, ok in samples if not ok)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / wall, 2) if wall else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+    }
+
+
+def summarize(samples, wall):
+    endpoints = {}
+    for name, _ in MIX:
+        selected = [s for s in samples if s[0] == name]
+        if selected:
+            endpoints[name] = _stats(selected, wall)
+    return {"wall_s": round(wall, 4), "total": _stats(samples, wall), "endpoints": endpoints}
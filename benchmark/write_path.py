@@ -0,0 +1,103 @@
+"""Write path micro-benchmark: SQL statements and latency per FastAPI task write.
+
+Each write (create with/without assignees, PATCH of status, fields and
+assignees) is repeated --repeat times in process against a fresh SQLite file.
+Statements are counted on the engine (before_cursor_execute), so the report
+shows exactly how many round trips one request costs:
+
+    python -m benchmark.write_path --repeat 50 --size 100 --output write_path.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+from sqlalchemy import event
+
+from benchmark.backends import FastAPIBackend
+from benchmark.workload import BASE_URL
+
+STATUSES = ("not_started", "in_process", "done")
+
+# (nazwa, metoda, ścieżka, body(i, task_id, user_ids))
+WRITES = [
+    ("create", "POST", "/api/tasks/", lambda i, task_id, users: {"title": f"Nowe {i}", "description": "Opis"}),
+    ("create_assigned", "POST", "/api/tasks/",
+     lambda i, task_id, users: {"title": f"Nowe {i}", "description": "Opis", "assigned_to_ids": users[:2]}),
+    ("patch_status", "PATCH", "/api/tasks/{id}/", lambda i, task_id, users: {"status": STATUSES[i % 3]}),
+    ("patch_fields", "PATCH", "/api/tasks/{id}/",
+     lambda i, task_id, users: {"title": f"Zmiana {i}", "description": "Nowy opis"}),
+    ("patch_assignees", "PATCH", "/api/tasks/{id}/",
+     lambda i, task_id, users: {"assigned_to_ids": [users[i % len(users)], users[(i + 1) % len(users)]]}),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="requests per write type")
+    parser.add_argument("--size", type=int, default=100, help="number of seeded tasks and bills")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="optional JSON report path")
+    return parser.parse_args(argv)
+
+
+async def measure(backend, args):
+    task_ids = await backend.seed(args.size, args.seed)
+    statements = []
+    event.listen(backend.main.engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *rest: statements.append(statement))
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url=BASE_URL) as client:
+        method, path, kwargs = backend.login_request()
+        token = backend.token_from((await client.request(method, path, **kwargs)).json())
+        headers = {"Authorization": f"Bearer {token}"}
+        users = [u["id"] for u in (await client.get("/api/users/", params={"limit": 10}, headers=headers)).json()["results"]]
+
+        for name, method, path, body in WRITES:
+            counts, latencies = [], []
+            for i in range(args.repeat):
+                task_id = task_ids[i % len(task_ids)]
+                statements.clear()
+                started = perf_counter()
+                response = await client.request(method, path.format(id=task_id), json=body(i, task_id, users),
+                                                headers=headers)
+                latencies.append(perf_counter() - started)
+                response.raise_for_status()
+                counts.append(len(statements))
+            results.append({
+                "write": name,
+                "statements_min": min(counts),
+                "statements_max": max(counts),
+                "statements_avg": round(statistics.mean(counts), 2),
+                "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                "max_ms": round(max(latencies) * 1000, 3),
+            })
+    await backend.main.engine.dispose()
+    return results
+
+
+def print_summary(results):
+    print(f"{'write':<16} {'stmts':>7} {'min':>5} {'max':>5} {'p50 ms':>9} {'max ms':>9}")
+    for row in results:
+        print(f"{row['write']:<16} {row['statements_avg']:>7} {row['statements_min']:>5} {row['statements_max']:>5} "
+              f"{row['p50_ms']:>9} {row['max_ms']:>9}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="bench-write-path-") as workdir:
+        backend = FastAPIBackend(Path(workdir) / "fastapi.db")
+        backend.prepare()
+        results = asyncio.run(measure(backend, args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main()